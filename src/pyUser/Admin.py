@@ -1,21 +1,158 @@
-import libuser
+import os
+import threading
 
 class Admin:
     """
     @brief Admin The base class for all libuser implementations.
 
-    This handles the access to the libuser.admin instance utilized to
-    modify the system entries for user and group.
+    This handles the access to the backend utilized to modify the system
+    entries for user and group. Unless another backend is set, the
+    libuser.admin instance is used.
+
+    libuser.admin instances must not be shared between threads, so every
+    thread gets its own instance from the backend factory. Writes are
+    serialized with a library wide lock, reads run concurrently.
+
+    With metrics set, the backend is wrapped once in a proxy timing its
+    calls, otherwise it is returned as is.
     """
-    __ADMIN = libuser.admin()
+    __ADMIN = None
+    __SHARED = None
+    __FACTORY = None
+    __METRICS = None
+    __GENERATION = 0
+    __LOCAL = threading.local()
+    __WRITE = threading.RLock()
 
     @classmethod
     def _get_admin(cls):
         """
-        @brief _get_admin Returns the instance of the libuser admin
+        @brief _get_admin Returns the instance of the backend
         used in this library.
 
-        @return Returns the libuser admin
+        Returns the backend set with set_backend or the instance of the
+        calling thread created by the backend factory on first use.
+
+        @return Returns the backend
+        """
+        admin = Admin.__SHARED
+        if admin is not None:
+            return admin
+        local = Admin.__LOCAL
+        if getattr(local, "generation", None) != Admin.__GENERATION:
+            factory = Admin.__FACTORY or Admin._libuser_admin
+            local.admin = Admin._instrumented(factory())
+            local.generation = Admin.__GENERATION
+        return local.admin
+
+    @staticmethod
+    def _instrumented(backend):
+        """
+        @brief _instrumented Returns the backend wrapped by the metrics, if set.
+
+        @param backend The backend
+        @return Returns the proxy or the backend
+        """
+        if backend is None or Admin.__METRICS is None:
+            return backend
+        return Admin.__METRICS.wrap(backend)
+
+    @staticmethod
+    def _forked():
+        """
+        @brief _forked Drops the per-thread backends and the write lock inherited
+        by a forked child process, they are recreated on first use.
+        """
+        Admin.__GENERATION += 1
+        Admin.__WRITE = threading.RLock()
+
+    @staticmethod
+    def _libuser_admin():
+        """
+        @brief _libuser_admin The default backend factory creating a libuser admin.
+
+        @return Returns the libuser.admin instance
+        """
+        import libuser
+        return libuser.admin()
+
+    @classmethod
+    def set_backend(cls, backend):
+        """
+        @brief set_backend Sets the backend shared by all threads.
+
+        @param backend The Backend implementation, e.g. a FilesBackend or
+        a libuser.admin instance. None resets to a libuser admin per thread
+        """
+        with Admin.__WRITE:
+            Admin.__ADMIN = backend
+            Admin.__SHARED = Admin._instrumented(backend)
+            Admin.__FACTORY = None
+            Admin.__GENERATION += 1
+
+    @classmethod
+    def set_backend_factory(cls, factory):
+        """
+        @brief set_backend_factory Sets the factory creating a backend per thread.
+
+        @param factory Callable returning a new Backend, None for libuser.admin
+        """
+        with Admin.__WRITE:
+            Admin.__ADMIN = None
+            Admin.__SHARED = None
+            Admin.__FACTORY = factory
+            Admin.__GENERATION += 1
+
+    @classmethod
+    def set_metrics(cls, metrics):
+        """
+        @brief set_metrics Sets the metrics recording the backend calls.
+
+        @param metrics The Metrics instance, None to stop recording
+        """
+        with Admin.__WRITE:
+            Admin.__METRICS = metrics
+            Admin.__SHARED = Admin._instrumented(Admin.__ADMIN)
+            Admin.__GENERATION += 1
+
+    @classmethod
+    def get_metrics(cls):
+        """
+        @brief get_metrics Returns the metrics recording the backend calls.
+
+        @return Returns the Metrics instance or None
+        """
+        return Admin.__METRICS
+
+    @staticmethod
+    def _generation():
+        """
+        @brief _generation Returns a number changing whenever the backend is set.
+
+        @return Returns the generation of the backend
+        """
+        return Admin.__GENERATION
+
+    @classmethod
+    def _writing(cls):
+        """
+        @brief _writing Returns the lock serializing the writes of this library.
+
+        @return Returns the reentrant lock to be used as context manager
+        """
+        return Admin.__WRITE
+
+    @classmethod
+    def _host_path(cls, path):
+        """
+        @brief _host_path Returns the path on the host for a path of the account database.
+
+        @param path The path as stored in the account database, e.g. the home folder
+        @return Returns the path on the host
         """
-        return cls.__ADMIN
+        admin = cls._get_admin()
+        if path is None or not hasattr(admin, "hostPath"):
+            return path
+        return admin.hostPath(path)
 
+os.register_at_fork(after_in_child = Admin._forked)
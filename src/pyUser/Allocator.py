@@ -0,0 +1,293 @@
+import random
+import threading
+
+class _Range:
+    """
+    @brief _Range A free range of ids, a node of the treap of free ranges.
+    """
+
+    __slots__ = ("start", "end", "priority", "left", "right")
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+class Allocator:
+    """
+    @brief Allocator Hands out free uids or gids from a range.
+
+    The free ids are kept as disjoint ranges in a treap, a binary search tree
+    ordered by the first id of the ranges and balanced by random priorities.
+    It is built once from the ids in use in linear time, finding the lowest
+    free id, reserving and releasing an id take O(log n) steps for n free
+    ranges.
+    """
+
+    def __init__(self, used = (), minimum = 1000, maximum = 60000, reserved = ()):
+        """
+        @brief __init__ Constructor taking the ids in use.
+
+        @param used The ids in use
+        @param minimum The smallest id to hand out
+        @param maximum The largest id to hand out
+        @param reserved Tuples of the first and last id of blocks never handed out
+        """
+        if minimum > maximum:
+            raise Exception("The minimum id {minimum} is larger than the maximum {maximum}"
+                    .format(minimum = minimum, maximum = maximum))
+        self._minimum = minimum
+        self._maximum = maximum
+        self._reserved = [(max(first, minimum), min(last, maximum))
+                for first, last in sorted(reserved)]
+        self._lock = threading.Lock()
+        self._free = 0
+        ranges = []
+        start = minimum
+        for first, last in self._blocks(sorted({int(id) for id in used if id is not None})):
+            if first > start:
+                ranges.append((start, min(first - 1, maximum)))
+            start = max(start, last + 1)
+            if start > maximum:
+                break
+        if start <= maximum:
+            ranges.append((start, maximum))
+        self._root = self._build(ranges)
+
+    def _blocks(self, used):
+        """
+        @brief _blocks Returns the used ids and the reserved blocks in the range,
+        sorted by their first id.
+
+        @param used The sorted ids in use
+        @return Returns a list of tuples of the first and last id of the blocks
+        """
+        blocks = [(id, id) for id in used if self._minimum <= id <= self._maximum]
+        blocks += [(first, last) for first, last in self._reserved if first <= last]
+        blocks.sort()
+        return blocks
+
+    def _build(self, ranges):
+        """
+        @brief _build Returns the treap of the sorted free ranges.
+
+        @param ranges The sorted tuples of the first and last id of the free ranges
+        @return Returns the root _Range or None
+        """
+        stack = []
+        for start, end in ranges:
+            node = _Range(start, end)
+            self._free += end - start + 1
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+        return stack[0] if stack else None
+
+    def next(self):
+        """
+        @brief next Returns the lowest free id without reserving it.
+
+        @return Returns the id
+        """
+        with self._lock:
+            return self._lowest().start
+
+    def allocate(self):
+        """
+        @brief allocate Reserves and returns the lowest free id.
+
+        @return Returns the id
+        """
+        with self._lock:
+            node = self._lowest()
+            id = node.start
+            self._take(node, id)
+            return id
+
+    def is_free(self, id):
+        """
+        @brief is_free Returns True if the id is free.
+
+        @param id The id to check
+        """
+        with self._lock:
+            return self._find(id) is not None
+
+    def reserve(self, id):
+        """
+        @brief reserve Marks the id as used, e.g. after it was added.
+
+        @param id The id in use
+        @return Returns True if the id was free
+        """
+        with self._lock:
+            node = self._find(id)
+            if node is None:
+                return False
+            self._take(node, id)
+            return True
+
+    def release(self, id):
+        """
+        @brief release Marks the id as free, e.g. after it was deleted.
+
+        Ids outside of the range or in a reserved block are ignored.
+
+        @param id The id no longer in use
+        @return Returns True if the id was used
+        """
+        with self._lock:
+            if not self._minimum <= id <= self._maximum or self._find(id) is not None:
+                return False
+            for first, last in self._reserved:
+                if first <= id <= last:
+                    return False
+            before, after = self._neighbours(id)
+            before = before if before is not None and before.end == id - 1 else None
+            after = after if after is not None and after.start == id + 1 else None
+            if before is not None and after is not None:
+                before.end = after.end
+                self._remove(after.start)
+            elif before is not None:
+                before.end = id
+            elif after is not None:
+                after.start = id
+            else:
+                self._insert(_Range(id, id))
+            self._free += 1
+            return True
+
+    def free_count(self):
+        """
+        @brief free_count Returns the number of free ids.
+        """
+        with self._lock:
+            return self._free
+
+    def _lowest(self):
+        """
+        @brief _lowest Returns the free range with the lowest ids, the lock must be held.
+
+        @return Returns the _Range
+        """
+        node = self._root
+        if node is None:
+            raise Exception("No free id left between {minimum} and {maximum}"
+                    .format(minimum = self._minimum, maximum = self._maximum))
+        while node.left is not None:
+            node = node.left
+        return node
+
+    def _find(self, id):
+        """
+        @brief _find Returns the free range holding the id, the lock must be held.
+
+        @param id The id to find
+        @return Returns the _Range or None if the id is not free
+        """
+        before, _ = self._neighbours(id + 1)
+        if before is not None and id <= before.end:
+            return before
+        return None
+
+    def _neighbours(self, id):
+        """
+        @brief _neighbours Returns the free ranges next to the id, the lock must be held.
+
+        @param id The id
+        @return Returns a tuple of the last _Range starting before the id and
+        the first _Range starting after it, each or None
+        """
+        before = after = None
+        node = self._root
+        while node is not None:
+            if node.start < id:
+                before, node = node, node.right
+            elif node.start > id:
+                after, node = node, node.left
+            else:
+                break
+        return before, after
+
+    def _take(self, node, id):
+        """
+        @brief _take Removes the id from the free range, the lock must be held.
+
+        @param node The _Range holding the id
+        @param id The id to remove
+        """
+        if node.start == node.end:
+            self._remove(node.start)
+        elif id == node.start:
+            node.start = id + 1
+        elif id == node.end:
+            node.end = id - 1
+        else:
+            end = node.end
+            node.end = id - 1
+            self._insert(_Range(id + 1, end))
+        self._free -= 1
+
+    def _insert(self, node):
+        """
+        @brief _insert Adds a free range to the treap, the lock must be held.
+
+        @param node The _Range
+        """
+        left, right = self._split(self._root, node.start)
+        self._root = self._merge(self._merge(left, node), right)
+
+    def _remove(self, start):
+        """
+        @brief _remove Drops the free range starting at the id from the treap,
+        the lock must be held.
+
+        @param start The first id of the _Range
+        """
+        left, right = self._split(self._root, start)
+        _, right = self._split(right, start + 1)
+        self._root = self._merge(left, right)
+
+    @classmethod
+    def _split(cls, node, start):
+        """
+        @brief _split Splits a treap by the first id of the ranges.
+
+        @param node The root of the treap or None
+        @param start The first id of the ranges of the second treap
+        @return Returns a tuple of the roots of the ranges starting before and
+        the ranges starting at or after the id
+        """
+        if node is None:
+            return None, None
+        if node.start < start:
+            node.right, right = cls._split(node.right, start)
+            return node, right
+        left, node.left = cls._split(node.left, start)
+        return left, node
+
+    @classmethod
+    def _merge(cls, left, right):
+        """
+        @brief _merge Joins two treaps, all ranges of the first starting before
+        the ranges of the second.
+
+        @param left The root of the first treap or None
+        @param right The root of the second treap or None
+        @return Returns the root of the joined treap
+        """
+        if left is None:
+            return right
+        if right is None:
+            return left
+        if left.priority > right.priority:
+            left.right = cls._merge(left.right, right)
+            return left
+        right.left = cls._merge(left, right.left)
+        return right
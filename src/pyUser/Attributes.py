@@ -0,0 +1,29 @@
+"""
+@brief Attributes The names of the attributes of user and group entities.
+
+The values match the attribute names used by libuser, so entities of libuser
+and of the native backends can be used interchangeably.
+"""
+
+USERNAME = "pw_name"
+USERPASSWORD = "pw_passwd"
+UIDNUMBER = "pw_uid"
+GIDNUMBER = "pw_gid"
+GECOS = "pw_gecos"
+HOMEDIRECTORY = "pw_dir"
+LOGINSHELL = "pw_shell"
+
+GROUPNAME = "gr_name"
+GROUPPASSWORD = "gr_passwd"
+MEMBERNAME = "gr_mem"
+ADMINISTRATORNAME = "gr_adm"
+
+SHADOWNAME = USERNAME
+SHADOWPASSWORD = "sp_pwdp"
+SHADOWLASTCHANGE = "sp_lstchg"
+SHADOWMIN = "sp_min"
+SHADOWMAX = "sp_max"
+SHADOWWARNING = "sp_warn"
+SHADOWINACTIVE = "sp_inact"
+SHADOWEXPIRE = "sp_expire"
+SHADOWFLAG = "sp_flag"
@@ -0,0 +1,277 @@
+class Backend:
+    """
+    @brief Backend Interface of the account database used by this library.
+
+    Mirrors the subset of the libuser .admin API used by this library, so the
+    libuser .admin instance itself is a valid backend. Errors are raised as
+    RuntimeError, like libuser does.
+
+    Backends able to stream entities may add iterateUsersFull and
+    iterateGroupsFull, returning generators instead of the lists of
+    enumerateUsersFull and enumerateGroupsFull.
+
+    Backends able to lock several entries with a single write may add
+    lockUsers, unlockUsers, lockGroups and unlockGroups taking a list of
+    entities, and addUsers taking a list of entities and the flags of
+    addUser. These must write all entities or, raising, none of them.
+    """
+
+    def lookupUserByName(self, name):
+        """
+        @brief lookupUserByName Returns the user entity with the given name.
+
+        @param name The name of the user
+        @return Returns the Entity or None
+        """
+        raise Exception("Child class must override")
+
+    def lookupUserById(self, id):
+        """
+        @brief lookupUserById Returns the user entity with the given uid.
+
+        @param id The uid of the user
+        @return Returns the Entity or None
+        """
+        raise Exception("Child class must override")
+
+    def lookupGroupByName(self, name):
+        """
+        @brief lookupGroupByName Returns the group entity with the given name.
+
+        @param name The name of the group
+        @return Returns the Entity or None
+        """
+        raise Exception("Child class must override")
+
+    def lookupGroupById(self, id):
+        """
+        @brief lookupGroupById Returns the group entity with the given gid.
+
+        @param id The gid of the group
+        @return Returns the Entity or None
+        """
+        raise Exception("Child class must override")
+
+    def initUser(self, name):
+        """
+        @brief initUser Returns a new user entity filled with the defaults.
+
+        @param name The name of the user
+        @return Returns the Entity
+        """
+        raise Exception("Child class must override")
+
+    def initGroup(self, name):
+        """
+        @brief initGroup Returns a new group entity filled with the defaults.
+
+        @param name The name of the group
+        @return Returns the Entity
+        """
+        raise Exception("Child class must override")
+
+    def addUser(self, entity, mkhomedir = True, mkmailspool = True):
+        """
+        @brief addUser Adds the user to the system.
+
+        @param entity The Entity of the user
+        @param mkhomedir True if the home folder shall be created
+        @param mkmailspool True if the mail spool shall be created
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def deleteUser(self, entity):
+        """
+        @brief deleteUser Deletes the user from the system.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def modifyUser(self, entity):
+        """
+        @brief modifyUser Writes the changed attributes of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def modifyUsers(self, entities):
+        """
+        @brief modifyUsers Writes the changed attributes of several users.
+
+        Backends able to write all users at once should override this, the
+        default writes them one by one.
+
+        @param entities The Entity objects of the users
+        @return Returns the number of written users
+        """
+        return sum(1 for entity in entities if self.modifyUser(entity) > 0)
+
+    def lockUser(self, entity):
+        """
+        @brief lockUser Locks the password of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def unlockUser(self, entity):
+        """
+        @brief unlockUser Unlocks the password of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def addGroup(self, entity):
+        """
+        @brief addGroup Adds the group to the system.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def deleteGroup(self, entity):
+        """
+        @brief deleteGroup Deletes the group from the system.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def modifyGroup(self, entity):
+        """
+        @brief modifyGroup Writes the changed attributes of the group.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def modifyGroups(self, entities):
+        """
+        @brief modifyGroups Writes the changed attributes of several groups.
+
+        Backends able to write all groups at once should override this, the
+        default writes them one by one.
+
+        @param entities The Entity objects of the groups
+        @return Returns the number of written groups
+        """
+        return sum(1 for entity in entities if self.modifyGroup(entity) > 0)
+
+    def lockGroup(self, entity):
+        """
+        @brief lockGroup Locks the password of the group.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def unlockGroup(self, entity):
+        """
+        @brief unlockGroup Unlocks the password of the group.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def enumerateUsers(self, pattern = None):
+        """
+        @brief enumerateUsers Returns the names of the users matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of user names
+        """
+        raise Exception("Child class must override")
+
+    def enumerateGroups(self, pattern = None):
+        """
+        @brief enumerateGroups Returns the names of the groups matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of group names
+        """
+        raise Exception("Child class must override")
+
+    def enumerateUsersFull(self, pattern = None):
+        """
+        @brief enumerateUsersFull Returns the entities of the users matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of Entity objects
+        """
+        raise Exception("Child class must override")
+
+    def enumerateGroupsFull(self, pattern = None):
+        """
+        @brief enumerateGroupsFull Returns the entities of the groups matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of Entity objects
+        """
+        raise Exception("Child class must override")
+
+    def enumerateUsersByGroup(self, name):
+        """
+        @brief enumerateUsersByGroup Returns the names of the users in the group.
+
+        @param name The name of the group
+        @return Returns a list of user names
+        """
+        raise Exception("Child class must override")
+
+    def enumerateGroupsByUser(self, name):
+        """
+        @brief enumerateGroupsByUser Returns the names of the groups of the user.
+
+        @param name The name of the user
+        @return Returns a list of group names
+        """
+        raise Exception("Child class must override")
+
+    def createHome(self, entity):
+        """
+        @brief createHome Creates the home folder of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def removeHome(self, entity):
+        """
+        @brief removeHome Removes the home folder of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def removeMail(self, entity):
+        """
+        @brief removeMail Removes the mail spool of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        raise Exception("Child class must override")
+
+    def hostPath(self, path):
+        """
+        @brief hostPath Returns the path on the host for a path of the account database.
+
+        @param path The path as stored in the account database, e.g. the home folder
+        @return Returns the path on the host
+        """
+        return path
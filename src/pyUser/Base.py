@@ -1,10 +1,44 @@
+import os
+import logging
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
 from .Admin import Admin
+from .Cache import Cache
+from .Allocator import Allocator
+
+_LOG = logging.getLogger(__name__)
+
+def _hydrate(cls, names):
+    """
+    @brief _hydrate Looks up the names and returns their compact records.
+
+    Runs in the worker processes of Base.parallel_enumerate.
+
+    @param cls The implementation type
+    @param names The names to look up
+    @return Returns a list of records
+    """
+    result = []
+    for name in names:
+        result.append(cls._RECORD.from_entity(cls._by_name(name)))
+    return result
 
 class Base(Admin):
     """
     @brief Base Basic implementation for libuser .Entry instance handling.
     """
 
+    _CACHE = None
+    _RECORD = None
+    _ALLOCATOR = None
+    _ID = None
+    _TABLE = None
+    _TABLE_TYPE = None
+    _FILES = ()
+    _CHANGES = 0
+
     def get_name(self):
         """
         @brief get_name Returns the name of the libuser .Entiry instance.
@@ -41,6 +75,26 @@ class Base(Admin):
         """
         raise Exception("Child class must override")
 
+    @classmethod
+    def _lookup(cls, name):
+        """
+        @brief _lookup Looks up the libuser .Entity matching the name, bypassing the cache.
+
+        @param name The name of the libuser .Entity
+        @return Returns the libuser .Entity or None
+        """
+        raise Exception("Child class must override")
+
+    @classmethod
+    def _lookup_id(cls, id):
+        """
+        @brief _lookup_id Looks up the libuser .Entity matching the id, bypassing the cache.
+
+        @param id The id of the libuser .Entity
+        @return Returns the libuser .Entity or None
+        """
+        raise Exception("Child class must override")
+
     @classmethod
     def _init(cls, name):
         """
@@ -81,6 +135,74 @@ class Base(Admin):
         """
         raise Exception("Child class must override")
 
+    @classmethod
+    def _lock_many(cls, values, locked):
+        """
+        @brief _lock_many Locks or unlocks several libuser .Entity objects at once.
+
+        @param values The libuser .Entity objects
+        @param locked True to lock, False to unlock
+        @return Returns a list with True or the raised exception per entity
+        """
+        raise Exception("Child class must override")
+
+    @classmethod
+    def _call_many(cls, many, single, values, *args, writes = None):
+        """
+        @brief _call_many Calls a backend method taking several entities, or
+        the method taking a single entity for each if the backend lacks it.
+
+        The method taking several entities writes all or none of them. If it
+        raises, the error is logged and every entity is tried on its own to
+        find the failing ones. If it reports fewer written entities than
+        passed, which entities were written is unknown, so the error is
+        reported for all of them instead of writing them again.
+
+        @param many The name of the method taking several entities
+        @param single The name of the method taking a single entity
+        @param values The libuser .Entity objects
+        @param args The further arguments of both methods
+        @param writes A list the number of backend calls made is appended to
+        @return Returns a list with True or the raised exception per entity
+        """
+        admin = cls._get_admin()
+        calls = 0
+        try:
+            if hasattr(admin, many):
+                calls += 1
+                try:
+                    count = getattr(admin, many)(values, *args)
+                except Exception as exception:
+                    _LOG.warning("%s failed, retrying entry by entry: %s", many, exception)
+                else:
+                    if count == len(values):
+                        return [True] * len(values)
+                    error = RuntimeError("{many} wrote {count} of {total} entries"
+                            .format(many = many, count = count, total = len(values)))
+                    _LOG.warning("%s", error)
+                    return [error] * len(values)
+            outcomes = []
+            for value in values:
+                calls += 1
+                try:
+                    outcomes.append(getattr(admin, single)(value, *args) > 0)
+                except Exception as exception:
+                    outcomes.append(exception)
+            return outcomes
+        finally:
+            if writes is not None:
+                writes.append(calls)
+
+    @classmethod
+    def _modify_many(cls, values):
+        """
+        @brief _modify_many Modifies several system libuser .Entity objects at once.
+
+        @param values The libuser .Entity objects to be modified
+        @return Returns True if success
+        """
+        raise Exception("Child class must override")
+
     @classmethod
     def _lock(cls, value):
         """
@@ -111,6 +233,247 @@ class Base(Admin):
         """
         raise Exception("Child class must override")
 
+    @classmethod
+    def _enumerate_full(cls, expr):
+        """
+        @brief _enumerate_full Enumerates the libuser .Entity objects matching the given
+        expression and returns the complete entities in a single pass.
+
+        @param expr The expression to be matched
+        @return Returns the libuser .Entity objects matching the expression
+        """
+        raise Exception("Child class must override")
+
+    @classmethod
+    def _iter_full(cls, expr):
+        """
+        @brief _iter_full Lazily enumerates the complete libuser .Entity objects
+        matching the given expression.
+
+        @param expr The expression to be matched
+        @return Returns an iterator of libuser .Entity objects
+        """
+        raise Exception("Child class must override")
+
+    @classmethod
+    def _entity_keys(cls, value):
+        """
+        @brief _entity_keys Returns the name and the id of the libuser .Entity.
+
+        @param value The libuser .Entity object
+        @return Returns a tuple of name and id
+        """
+        raise Exception("Child class must override")
+
+    @classmethod
+    def enable_cache(cls, size = 4096, ttl = 300, negative = True):
+        """
+        @brief enable_cache Enables caching of the lookups by name and by id.
+
+        Entries are dropped when they are added, deleted, modified, locked or
+        unlocked through this library. Changes made outside of this library are
+        only picked up once the entries expire.
+
+        @param size The maximum number of cached entries
+        @param ttl The time in seconds an entry stays valid, None for no expiry
+        @param negative Set to True to cache lookups of missing entries as well
+        """
+        cls._CACHE = Cache(size, ttl, negative)
+
+    @classmethod
+    def disable_cache(cls):
+        """
+        @brief disable_cache Disables caching of the lookups by name and by id.
+        """
+        cls._CACHE = None
+
+    @classmethod
+    def cache_stats(cls):
+        """
+        @brief cache_stats Returns the counters of the lookup cache.
+
+        @return Returns a dict with hits, misses, evictions and size or None
+        """
+        if cls._CACHE is None:
+            return None
+        return cls._CACHE.stats()
+
+    @classmethod
+    def _cached(cls, key, lookup):
+        """
+        @brief _cached Returns the cached libuser .Entity for the key or looks it up.
+
+        The cache holds its own copy and returns a new copy on every hit, so
+        callers never share an entity. libuser .Entity objects cannot be
+        copied and are shared, they are copied by _writable before a write.
+
+        @param key The key of the lookup, e.g. ("name", name)
+        @param lookup The function looking up the libuser .Entity
+        @return Returns the libuser .Entity or None
+        """
+        cache = cls._CACHE
+        if cache is None:
+            return lookup()
+        value = cache.get(key)
+        if value is not Cache.MISS:
+            return cls._copy(value)
+        value = lookup()
+        cache.put(key, cls._copy(value), None if value is None else cls._entity_keys(value)[1])
+        return value
+
+    @staticmethod
+    def _copy(value):
+        """
+        @brief _copy Returns a copy of the entity if it can be copied.
+
+        @param value The libuser .Entity or None
+        @return Returns the copy, or the entity itself if it has no copy method
+        """
+        copy = getattr(value, "copy", None)
+        return value if copy is None else copy()
+
+    def _writable(self):
+        """
+        @brief _writable Returns an entity of the instance to be changed and written.
+
+        The entity the instance was built from stays untouched, so other
+        instances and threads never see values that were not written. Take
+        it over with _written once the write succeeded.
+
+        @return Returns the libuser .Entity or None
+        """
+        entity = self._get_entity()
+        if entity is None or hasattr(entity, "copy") or self._CACHE is None:
+            return self._copy(entity)
+        return self._lookup(self._entity_keys(entity)[0])
+
+    def _written(self, entity, result):
+        """
+        @brief _written Takes over the written entity if the write succeeded.
+
+        @param entity The entity returned by _writable and written
+        @param result The result of the write
+        @return Returns the result
+        """
+        if result:
+            self._entity = entity
+        return result
+
+    @classmethod
+    def _invalidate(cls, value):
+        """
+        @brief _invalidate Drops the cached lookups for the given libuser .Entity.
+
+        @param value The libuser .Entity that changed
+        """
+        Base._CHANGES += 1
+        if cls._CACHE is None or value is None:
+            return
+        cls._forget(*cls._entity_keys(value))
+
+    @classmethod
+    def enable_allocator(cls, minimum = 1000, maximum = 60000, reserved = ()):
+        """
+        @brief enable_allocator Assigns the lowest free id to new entries.
+
+        The ids in use are read once, the allocator is kept up to date by the
+        add, delete and modify calls of this library.
+
+        @param minimum The smallest id to assign
+        @param maximum The largest id to assign
+        @param reserved Tuples of the first and last id of blocks never assigned
+        """
+        used = (cls._entity_keys(value)[1] for value in cls._enumerate_full('*'))
+        cls._ALLOCATOR = Allocator(used, minimum, maximum, reserved)
+
+    @classmethod
+    def disable_allocator(cls):
+        """
+        @brief disable_allocator Leaves assigning ids to the backend again.
+        """
+        cls._ALLOCATOR = None
+
+    @classmethod
+    def _assign_id(cls, value, id):
+        """
+        @brief _assign_id Sets the id of a new libuser .Entity.
+
+        @param value The libuser .Entity
+        @param id The id to assign
+        """
+        value[cls._ID] = id
+
+    @classmethod
+    def _allocated(cls, value, used):
+        """
+        @brief _allocated Updates the id allocator after a successful write.
+
+        @param value The libuser .Entity written
+        @param used True if the id is in use now, False if it was freed
+        """
+        allocator = cls._ALLOCATOR
+        if allocator is None:
+            return
+        id = cls._entity_keys(value)[1]
+        if id is None:
+            return
+        if used:
+            allocator.reserve(int(id))
+        else:
+            allocator.release(int(id))
+
+    @classmethod
+    def _stored_ids(cls, values):
+        """
+        @brief _stored_ids Returns the ids stored for the libuser .Entity
+        objects before they are modified, if the id allocator is enabled.
+
+        @param values The libuser .Entity objects to be modified
+        @return Returns a list of the stored ids or None per entity
+        """
+        if cls._ALLOCATOR is None:
+            return [None] * len(values)
+        ids = []
+        for value in values:
+            stored = cls._lookup(cls._entity_keys(value)[0])
+            ids.append(None if stored is None else cls._entity_keys(stored)[1])
+        return ids
+
+    @classmethod
+    def _modified(cls, value, previous):
+        """
+        @brief _modified Updates the id allocator after a successful modify,
+        releasing the previous id if no other entry uses it any more.
+
+        @param value The libuser .Entity written
+        @param previous The id stored before the write or None
+        """
+        allocator = cls._ALLOCATOR
+        if allocator is None:
+            return
+        cls._allocated(value, True)
+        id = cls._entity_keys(value)[1]
+        if previous is None or (id is not None and int(id) == int(previous)):
+            return
+        if cls._lookup_id(int(previous)) is None:
+            allocator.release(int(previous))
+
+    @classmethod
+    def _forget(cls, name, id):
+        """
+        @brief _forget Drops the cached lookups for the given name and id.
+
+        @param name The name of the libuser .Entity
+        @param id The id of the libuser .Entity
+        """
+        cache = cls._CACHE
+        if cache is None:
+            return
+        cache.invalidate(("name", name))
+        cache.invalidate(("id", id))
+        if id is not None:
+            cache.invalidate_tag(id)
+
     @classmethod
     def by_id(cls, id):
         """
@@ -137,9 +500,15 @@ class Base(Admin):
         @brief init Initializes a new libuser .Entity with the given name.
 
         @param name The name of the libuser .Entity
+        If the id allocator is enabled, the lowest free id is assigned.
+
         @return Returns the libuser .Entity
         """
-        return cls._init(name)
+        value = cls._init(name)
+        allocator = cls._ALLOCATOR
+        if allocator is not None:
+            cls._assign_id(value, allocator.next())
+        return value
 
     @classmethod
     def add(cls, value):
@@ -149,7 +518,14 @@ class Base(Admin):
         @param value The libuser .Entity to be added to the system
         @return Returns True if success
         """
-        return cls._add(value)
+        with cls._writing():
+            try:
+                result = cls._add(value)
+                if result:
+                    cls._allocated(value, True)
+                return result
+            finally:
+                cls._invalidate(value)
 
     @classmethod
     def delete(cls, value):
@@ -159,7 +535,14 @@ class Base(Admin):
         @param value The libuser .Entity to be deleted from the system
         @return Returns True if success
         """
-        return cls._delete(value)
+        with cls._writing():
+            try:
+                result = cls._delete(value)
+                if result:
+                    cls._allocated(value, False)
+                return result
+            finally:
+                cls._invalidate(value)
 
     @classmethod
     def modify(cls, value):
@@ -169,7 +552,39 @@ class Base(Admin):
         @param value The libuser .Entity to be modified
         @return Returns True if success
         """
-        return cls._modify(value)
+        with cls._writing():
+            try:
+                previous = cls._stored_ids([value])[0]
+                result = cls._modify(value)
+                if result:
+                    cls._modified(value, previous)
+                return result
+            finally:
+                cls._invalidate(value)
+
+    @classmethod
+    def modify_many(cls, values):
+        """
+        @brief modify_many Modifies several libuser .Entity instances with a
+        single write, if the backend supports it.
+
+        @param values The libuser .Entity objects to be modified
+        @return Returns True if success
+        """
+        values = list(values)
+        if not values:
+            return True
+        with cls._writing():
+            try:
+                previous = cls._stored_ids(values)
+                result = cls._modify_many(values)
+                if result:
+                    for value, id in zip(values, previous):
+                        cls._modified(value, id)
+                return result
+            finally:
+                for value in values:
+                    cls._invalidate(value)
 
     @classmethod
     def lock(cls, value):
@@ -179,7 +594,11 @@ class Base(Admin):
         @param value The libuser .Entity to be locked
         @return Returns True if success
         """
-        return cls._lock(value)
+        with cls._writing():
+            try:
+                return cls._lock(value)
+            finally:
+                cls._invalidate(value)
 
     @classmethod
     def unlock(cls, value):
@@ -189,21 +608,123 @@ class Base(Admin):
         @param value The libuser .Entity to be unlocked
         @return Returns True if success
         """
-        return cls._unlock(value)
+        with cls._writing():
+            try:
+                return cls._unlock(value)
+            finally:
+                cls._invalidate(value)
+
+    @classmethod
+    def lock_many(cls, values):
+        """
+        @brief lock_many Locks several libuser .Entity instances with a single
+        write, if the backend supports it.
+
+        @param values The names, implementation instances or libuser .Entity objects
+        @return Returns a dict mapping the names to True if locked, False if
+        not found or the raised exception
+        """
+        return cls._set_locks(values, True)
+
+    @classmethod
+    def unlock_many(cls, values):
+        """
+        @brief unlock_many Unlocks several libuser .Entity instances with a
+        single write, if the backend supports it.
+
+        @param values The names, implementation instances or libuser .Entity objects
+        @return Returns a dict mapping the names to True if unlocked, False if
+        not found or the raised exception
+        """
+        return cls._set_locks(values, False)
 
     @classmethod
-    def enumerate(cls, expr):
+    def _set_locks(cls, values, locked):
+        """
+        @brief _set_locks Locks or unlocks the given entries.
+
+        @param values The names, implementation instances or libuser .Entity objects
+        @param locked True to lock, False to unlock
+        @return Returns a dict mapping the names to the outcome, the stored
+        names for the entries found
+        """
+        result = {}
+        entities = []
+        for value in values:
+            if isinstance(value, str):
+                name, entity = value, cls._by_name(value)
+            elif isinstance(value, Base):
+                name, entity = value.get_name(), value._get_entity()
+            else:
+                name, entity = None, value
+            if entity is None:
+                result[name] = False
+                continue
+            name = cls._entity_keys(entity)[0]
+            if name not in result:
+                result[name] = None
+                entities.append(entity)
+        if not entities:
+            return result
+        with cls._writing():
+            try:
+                outcomes = cls._lock_many(entities, locked)
+            finally:
+                for entity in entities:
+                    cls._invalidate(entity)
+        for entity, outcome in zip(entities, outcomes):
+            result[cls._entity_keys(entity)[0]] = outcome
+        return result
+
+    @classmethod
+    def enumerate(cls, expr, full = True):
         """
         @brief enumerate enumerates all libuser .Entity instances matching 
         the given expression.
 
+        By default the complete entities are fetched from libuser in one pass.
+        If full is False only the names are enumerated and every entry is looked
+        up separately, which costs one backend round-trip per entry.
+
         @param expr The expression to match
+        @param full Set to False to look up every matching name separately
         @return Returns a list of matching libuser .Entity instances
         """
-        result = []
-        for entry in cls._enumerate(expr):
-            result.append(cls.by_name(entry))
-        return result
+        return list(cls.iter_enumerate(expr, full = full))
+
+    @classmethod
+    def iter_enumerate(cls, expr, chunk_size = None, full = True):
+        """
+        @brief iter_enumerate Lazily enumerates all libuser .Entity instances
+        matching the given expression.
+
+        The implementation instances are created as they are consumed. Backends
+        streaming their entities, like the files backend, read them as they
+        are reached, so only the entries currently processed are held in
+        memory. libuser returns all entities at once, there full False keeps
+        the memory flat instead: only the names are fetched up front and every
+        entry is looked up when it is reached.
+
+        @param expr The expression to match
+        @param chunk_size If set, yield lists of up to chunk_size instances
+        @param full Set to False to look up every matching name separately
+        @return Returns a generator of matching implementation instances
+        """
+        if full:
+            entries = (cls(entry) for entry in cls._iter_full(expr))
+        else:
+            entries = (cls.by_name(entry) for entry in cls._enumerate(expr))
+        if not chunk_size:
+            yield from entries
+            return
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
     @classmethod
     def list(cls):
@@ -214,12 +735,156 @@ class Base(Admin):
         """
         return cls.enumerate('*')
 
+    @classmethod
+    def records(cls, expr = '*'):
+        """
+        @brief records Returns compact records of all libuser .Entity instances
+        matching the given expression.
+
+        The records hold the same attributes with the same getters, but no
+        reference to the libuser .Entity, see Record.
+
+        @param expr The expression to match
+        @return Returns a list of records
+        """
+        result = []
+        for entry in cls._enumerate_full(expr):
+            result.append(cls._RECORD.from_entity(entry))
+        return result
+
+    @classmethod
+    def query(cls, records = False, **predicates):
+        """
+        @brief query Returns the entries matching all given predicates.
+
+        The predicates are evaluated against a columnar index of all entries,
+        see Query. The index is built on first use and rebuilt after the
+        account file changed or an entry was written by this library.
+
+        @param records Set to True to return records instead of instances
+        @param predicates The predicates, see UserTable.select and GroupTable.select
+        @return Returns the list of matching implementation instances or records
+        """
+        table = cls._table()
+        rows = table.select(**predicates)
+        if records:
+            return [table.record(row) for row in rows]
+        return [cls.by_name(table.name(row)) for row in rows]
+
+    @classmethod
+    def _table(cls):
+        """
+        @brief _table Returns the current columnar index of all entries.
+
+        @return Returns the Table
+        """
+        key = [Base._CHANGES] + cls._files_key()
+        current = cls._TABLE
+        if current is not None and current[0] == key:
+            return current[1]
+        table = cls._TABLE_TYPE(cls.records())
+        cls._TABLE = (key, table)
+        return table
+
+    @classmethod
+    def _files_key(cls):
+        """
+        @brief _files_key Returns the state of the account files, changing
+        whenever one of them is written.
+
+        @return Returns a list with a stat tuple or None per file
+        """
+        key = []
+        for path in cls._FILES:
+            try:
+                stat = os.stat(cls._host_path(path))
+                key.append((stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                key.append(None)
+        return key
+
+    @classmethod
+    def parallel_enumerate(cls, expr, workers = None, chunk_size = None):
+        """
+        @brief parallel_enumerate Enumerates the records of all libuser .Entity
+        instances matching the expression using a pool of processes.
+
+        The names are partitioned into chunks, which are looked up and turned
+        into compact records in forked worker processes, see records. The
+        result is in the order of the enumeration.
+
+        @param expr The expression to match
+        @param workers The number of worker processes, defaults to the CPU count
+        @param chunk_size The number of names per task, defaults to a quarter
+        of the names per worker
+        @return Returns a list of records
+        """
+        names = list(cls._enumerate(expr))
+        workers = workers or os.cpu_count() or 1
+        if not chunk_size:
+            chunk_size = max(1, -(-len(names) // (workers * 4)))
+        chunks = [names[index:index + chunk_size]
+                for index in range(0, len(names), chunk_size)]
+        result = []
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers = workers, mp_context = context) as executor:
+            for records in executor.map(_hydrate, [cls] * len(chunks), chunks):
+                result.extend(records)
+        return result
+
+    def to_record(self):
+        """
+        @brief to_record Returns the compact record of the instance.
+
+        @return Returns the record
+        """
+        return self._RECORD(*[getattr(self, slot) for slot in self._RECORD.__slots__])
+
+    @classmethod
+    def iter_list(cls, chunk_size = None, full = True):
+        """
+        @brief iter_list Lazily returns all libuser .Entity instances.
+
+        @param chunk_size If set, yield lists of up to chunk_size instances
+        @param full Set to False to look up every entry separately
+        @return Returns a generator of implementation instances
+        """
+        return cls.iter_enumerate('*', chunk_size, full)
+
+    def _get_entity(self):
+        """
+        @brief _get_entity Returns the libuser .Entity the instance was built from.
+
+        The entity is only looked up if the instance was not created from one.
+
+        @return Returns the libuser .Entity or None
+        """
+        if self._entity is None and self.get_id() is not None:
+            self._entity = self._by_id(self.get_id())
+        return self._entity
+
+    def refresh(self):
+        """
+        @brief refresh Reloads the instance from the system.
+
+        Discards local changes that were not written with update.
+
+        @return Returns True if the entry still exists
+        """
+        if self._entity is not None:
+            self._invalidate(self._entity)
+        id = self.get_id()
+        self.__init__(None if id is None else self._by_id(id))
+        return self.is_valid()
+
     def print(self):
         """
         @biref print Print the content of the instance
         """
         result = {}
         for entry in self.__dict__:
+            if entry == "_entity":
+                continue
             if entry.startswith("_"):
                 result[entry.replace("_", "", 1)] = self.__dict__[entry]
             else:
@@ -1,4 +1,10 @@
+import threading
+
+from . import Attributes
 from .Base import Base
+from .Record import GroupRecord
+from .Query import GroupTable
+from .Membership import Membership
 
 class BaseGroup(Base):
     """
@@ -7,12 +13,20 @@ class BaseGroup(Base):
     This handles the direct interaction with the python3 libuser implementation.
     """
 
+    _RECORD = GroupRecord
+    _TABLE_TYPE = GroupTable
+    _FILES = ("/etc/group",)
+    _ID = Attributes.GIDNUMBER
+    _MEMBERSHIP = None
+    _MEMBERSHIP_LOCK = threading.Lock()
+
     def __init__(self, name, gid):
         """
         @brief __init__ Constructor taking the name and of of the group.
         """
         self._name = name
         self._gid = gid
+        self._entity = None
 
     def get_name(self): # @Override
         """
@@ -38,18 +52,50 @@ class BaseGroup(Base):
         @param id The id of the group
         @return Returns the libuser .Entity or None
         """
-        return cls._get_admin().lookupGroupById(id)
+        return cls._cached(("id", id), lambda: cls._lookup_id(id))
 
     @classmethod
     def _by_name(cls, name):
         """
         @brief _by_name Returns the libuser .Entitiy representing the Group.
 
+        @param name The name of the group
+        @return Returns the libuser .Entity or None
+        """
+        return cls._cached(("name", name), lambda: cls._lookup(name))
+
+    @classmethod
+    def _lookup(cls, name):
+        """
+        @brief _lookup Looks up the libuser .Entity of the group, bypassing the cache.
+
         @param name The name of the group
         @return Returns the libuser .Entity or None
         """
         return cls._get_admin().lookupGroupByName(name)
 
+    @classmethod
+    def _lookup_id(cls, id):
+        """
+        @brief _lookup_id Looks up the libuser .Entity of the gid, bypassing the cache.
+
+        @param id The gid of the group
+        @return Returns the libuser .Entity or None
+        """
+        return cls._get_admin().lookupGroupById(id)
+
+    @classmethod
+    def _entity_keys(cls, value):
+        """
+        @brief _entity_keys Returns the name and the id of the group.
+
+        @param value The libuser .Entity object representing the group
+        @return Returns a tuple of name and id
+        """
+        name = value.get(Attributes.GROUPNAME)
+        id = value.get(Attributes.GIDNUMBER)
+        return (name[0] if name else None, id[0] if id else None)
+
     @classmethod
     def _init(cls, name):
         """
@@ -90,6 +136,34 @@ class BaseGroup(Base):
         """
         return cls._get_admin().modifyGroup(value) > 0
 
+    @classmethod
+    def _lock_many(cls, values, locked): # @Override
+        """
+        @brief _lock_many Locks or unlocks several system libuser .Entity objects at once.
+
+        @param values The libuser .Entity objects
+        @param locked True to lock, False to unlock
+        @return Returns a list with True or the raised exception per entity
+        """
+        if locked:
+            return cls._call_many("lockGroups", "lockGroup", values)
+        return cls._call_many("unlockGroups", "unlockGroup", values)
+
+    @classmethod
+    def _modify_many(cls, values): # @Override
+        """
+        @brief _modify_many Modifies several system libuser .Entity objects at once.
+
+        Backends without modifyGroups, like libuser, write them one by one.
+
+        @param values The libuser .Entity objects to be modified
+        @return Returns True if success
+        """
+        admin = cls._get_admin()
+        if hasattr(admin, "modifyGroups"):
+            return admin.modifyGroups(values) == len(values)
+        return all([admin.modifyGroup(value) > 0 for value in values])
+
     @classmethod
     def _lock(cls, value):
         """
@@ -120,6 +194,33 @@ class BaseGroup(Base):
         """
         return cls._get_admin().enumerateGroups(expr)
 
+    @classmethod
+    def _enumerate_full(cls, expr):
+        """
+        @brief _enumerate_full Enumerates the complete libuser .Entity objects matching
+        the given expression.
+
+        @param expr The expression to be matched
+        @return Returns the libuser .Entity objects matching the expression
+        """
+        return cls._get_admin().enumerateGroupsFull(expr)
+
+    @classmethod
+    def _iter_full(cls, expr):
+        """
+        @brief _iter_full Lazily enumerates the complete libuser .Entity objects
+        matching the given expression.
+
+        Backends without iterateGroupsFull, like libuser, return all entities at once.
+
+        @param expr The expression to be matched
+        @return Returns an iterator of libuser .Entity objects
+        """
+        admin = cls._get_admin()
+        if hasattr(admin, "iterateGroupsFull"):
+            return admin.iterateGroupsFull(expr)
+        return iter(admin.enumerateGroupsFull(expr))
+
     @classmethod
     def _get_users(cls, name):
         """
@@ -130,3 +231,142 @@ class BaseGroup(Base):
         """
         return cls._get_admin().enumerateUsersByGroup(name)
 
+
+    @classmethod
+    def add(cls, value): # @Override
+        """
+        @brief add Add a Group to the system and to the membership index.
+
+        @param value The libuser .Entity to be added to the system
+        @return Returns True if success
+        """
+        key = cls._membership_key()
+        result = super().add(value)
+        if result:
+            cls._update_membership(value, key, added = True)
+        return result
+
+    @classmethod
+    def delete(cls, value): # @Override
+        """
+        @brief delete Deletes a Group from the system and the membership index.
+
+        @param value The libuser .Entity to be deleted from the system
+        @return Returns True if success
+        """
+        key = cls._membership_key()
+        result = super().delete(value)
+        if result:
+            cls._update_membership(value, key, deleted = True)
+        return result
+
+    @classmethod
+    def modify_many(cls, values): # @Override
+        """
+        @brief modify_many Modifies several Groups and updates the membership index.
+
+        @param values The libuser .Entity objects to be modified
+        @return Returns True if success
+        """
+        values = list(values)
+        key = cls._membership_key()
+        result = super().modify_many(values)
+        if result:
+            for value in values:
+                cls._update_membership(value, key)
+        return result
+
+    @classmethod
+    def modify(cls, value): # @Override
+        """
+        @brief modify Modifies a Group and updates the membership index.
+
+        @param value The libuser .Entity to be modified
+        @return Returns True if success
+        """
+        key = cls._membership_key()
+        result = super().modify(value)
+        if result:
+            cls._update_membership(value, key)
+        return result
+
+    @classmethod
+    def _membership(cls):
+        """
+        @brief _membership Returns the index of the group memberships of users.
+
+        The index is built from all groups on first use and afterwards kept
+        up to date with the changes made through this library. It is rebuilt
+        after another backend was set or the group file was changed by other
+        tools. Use reset_membership for backends without group file.
+
+        @return Returns the Membership index
+        """
+        key = cls._membership_key()
+        with BaseGroup._MEMBERSHIP_LOCK:
+            current = BaseGroup._MEMBERSHIP
+            if current is None or current[0] != key:
+                membership = Membership()
+                for group in cls._enumerate_full('*'):
+                    membership.set_group(group.get(Attributes.GROUPNAME)[0],
+                            group.get(Attributes.GIDNUMBER)[0],
+                            group.get(Attributes.MEMBERNAME))
+                current = BaseGroup._MEMBERSHIP = (key, membership)
+            return current[1]
+
+    @classmethod
+    def reset_membership(cls):
+        """
+        @brief reset_membership Drops the membership index, it is rebuilt on next use.
+        """
+        with BaseGroup._MEMBERSHIP_LOCK:
+            BaseGroup._MEMBERSHIP = None
+
+    @classmethod
+    def _membership_key(cls):
+        """
+        @brief _membership_key Returns the state the membership index is valid for.
+
+        @return Returns a list of the backend generation and the state of the group file
+        """
+        return [cls._generation()] + cls._files_key()
+
+    @classmethod
+    def _update_membership(cls, value, key, added = False, deleted = False):
+        """
+        @brief _update_membership Applies the change of the group to the membership index.
+
+        The index is dropped instead if it was stale before the write or the
+        group was renamed.
+
+        @param value The libuser .Entity of the changed group
+        @param key The membership key taken before the write
+        @param added True if the group was added
+        @param deleted True if the group was deleted
+        """
+        with BaseGroup._MEMBERSHIP_LOCK:
+            current = BaseGroup._MEMBERSHIP
+            if current is None:
+                return
+            membership = current[1]
+            name = value.get(Attributes.GROUPNAME)[0]
+            if current[0] != key or not (added or membership.has_group(name)):
+                BaseGroup._MEMBERSHIP = None
+                return
+            if deleted:
+                membership.remove_group(name)
+            else:
+                membership.set_group(name, value.get(Attributes.GIDNUMBER)[0],
+                        value.get(Attributes.MEMBERNAME))
+            BaseGroup._MEMBERSHIP = (cls._membership_key(), membership)
+
+    @classmethod
+    def get_group_names_of(cls, name, gid = None):
+        """
+        @brief get_group_names_of Returns the names of the groups of the user.
+
+        @param name The name of the user
+        @param gid The primary group id of the user
+        @return Returns the group names, the primary group first
+        """
+        return cls._membership().group_names(name, gid)
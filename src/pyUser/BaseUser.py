@@ -1,4 +1,7 @@
+from . import Attributes
 from .Base import Base
+from .Record import UserRecord
+from .Query import UserTable
 
 class BaseUser(Base):
     """
@@ -7,12 +10,18 @@ class BaseUser(Base):
     This handles the direct interaction with the python3 libuser implementation.
     """
 
+    _RECORD = UserRecord
+    _TABLE_TYPE = UserTable
+    _FILES = ("/etc/passwd",)
+    _ID = Attributes.UIDNUMBER
+
     def __init__(self, name, uid):
         """
         @brief __init__ Constructor taking the name and of of the user.
         """
         self._name = name
         self._uid = uid
+        self._entity = None
 
     def get_name(self): # @Override
         """
@@ -39,18 +48,64 @@ class BaseUser(Base):
         @param name The name of the user
         @return Returns the libuser .Entity or None
         """
-        return cls._get_admin().lookupUserById(id)
+        return cls._cached(("id", id), lambda: cls._lookup_id(id))
 
     @classmethod
     def _by_name(cls, name): # @Override
         """
         @brief _by_name Returns the libuser .Entitiy representing the User.
 
+        @param name The name of the user
+        @return Returns the libuser .Entity or None
+        """
+        return cls._cached(("name", name), lambda: cls._lookup(name))
+
+    @classmethod
+    def _lookup(cls, name): # @Override
+        """
+        @brief _lookup Looks up the libuser .Entity of the user, bypassing the cache.
+
         @param name The name of the user
         @return Returns the libuser .Entity or None
         """
         return cls._get_admin().lookupUserByName(name)
 
+    @classmethod
+    def _lookup_id(cls, id): # @Override
+        """
+        @brief _lookup_id Looks up the libuser .Entity of the uid, bypassing the cache.
+
+        @param id The uid of the user
+        @return Returns the libuser .Entity or None
+        """
+        return cls._get_admin().lookupUserById(id)
+
+    @classmethod
+    def _entity_keys(cls, value): # @Override
+        """
+        @brief _entity_keys Returns the name and the id of the user.
+
+        @param value The libuser .Entity object representing the user
+        @return Returns a tuple of name and id
+        """
+        name = value.get(Attributes.USERNAME)
+        id = value.get(Attributes.UIDNUMBER)
+        return (name[0] if name else None, id[0] if id else None)
+
+    @classmethod
+    def _assign_id(cls, value, id): # @Override
+        """
+        @brief _assign_id Sets the uid of a new user, and the gid if it
+        followed the uid.
+
+        @param value The libuser .Entity object representing the user
+        @param id The uid to assign
+        """
+        uid = value.get(Attributes.UIDNUMBER)
+        if uid and value.get(Attributes.GIDNUMBER) == uid:
+            value[Attributes.GIDNUMBER] = id
+        value[Attributes.UIDNUMBER] = id
+
     @classmethod
     def _init(cls, name): # @Override
         """
@@ -83,8 +138,41 @@ class BaseUser(Base):
         @param create_mail True if the mail spool for the user shall be created
         @return Returns True if success
         """
-        return cls._add(name, create_home, create_mail)
+        with cls._writing():
+            try:
+                result = cls._add(name, create_home, create_mail)
+                if result:
+                    cls._allocated(name, True)
+                return result
+            finally:
+                cls._invalidate(name)
 
+    @classmethod
+    def add_many(cls, values, create_home = True, create_mail = True, writes = None):
+        """
+        @brief add_many Adds several new users with a single write, if the
+        backend supports it.
+
+        @param values The libuser .Entity objects to be added to the system
+        @param create_home True if the home folders shall be created
+        @param create_mail True if the mail spools shall be created
+        @param writes A list the number of backend writes made is appended to
+        @return Returns a list with True or the raised exception per entity
+        """
+        values = list(values)
+        if not values:
+            return []
+        with cls._writing():
+            try:
+                outcomes = cls._call_many("addUsers", "addUser", values,
+                        create_home, create_mail, writes = writes)
+                for value, outcome in zip(values, outcomes):
+                    if outcome is True:
+                        cls._allocated(value, True)
+                return outcomes
+            finally:
+                for value in values:
+                    cls._invalidate(value)
 
     @classmethod
     def _delete(cls, value): # @Override
@@ -106,6 +194,34 @@ class BaseUser(Base):
         """
         return cls._get_admin().modifyUser(value) > 0
 
+    @classmethod
+    def _lock_many(cls, values, locked): # @Override
+        """
+        @brief _lock_many Locks or unlocks several system libuser .Entity objects at once.
+
+        @param values The libuser .Entity objects
+        @param locked True to lock, False to unlock
+        @return Returns a list with True or the raised exception per entity
+        """
+        if locked:
+            return cls._call_many("lockUsers", "lockUser", values)
+        return cls._call_many("unlockUsers", "unlockUser", values)
+
+    @classmethod
+    def _modify_many(cls, values): # @Override
+        """
+        @brief _modify_many Modifies several system libuser .Entity objects at once.
+
+        Backends without modifyUsers, like libuser, write them one by one.
+
+        @param values The libuser .Entity objects to be modified
+        @return Returns True if success
+        """
+        admin = cls._get_admin()
+        if hasattr(admin, "modifyUsers"):
+            return admin.modifyUsers(values) == len(values)
+        return all([admin.modifyUser(value) > 0 for value in values])
+
     @classmethod
     def _lock(cls, value): # @Override
         """
@@ -136,6 +252,33 @@ class BaseUser(Base):
         """
         return cls._get_admin().enumerateUsers(expr)
 
+    @classmethod
+    def _enumerate_full(cls, expr): # @Override
+        """
+        @brief _enumerate_full Enumerates the complete libuser .Entity objects matching
+        the given expression.
+
+        @param expr The expression to be matched
+        @return Returns the libuser .Entity objects matching the expression
+        """
+        return cls._get_admin().enumerateUsersFull(expr)
+
+    @classmethod
+    def _iter_full(cls, expr): # @Override
+        """
+        @brief _iter_full Lazily enumerates the complete libuser .Entity objects
+        matching the given expression.
+
+        Backends without iterateUsersFull, like libuser, return all entities at once.
+
+        @param expr The expression to be matched
+        @return Returns an iterator of libuser .Entity objects
+        """
+        admin = cls._get_admin()
+        if hasattr(admin, "iterateUsersFull"):
+            return admin.iterateUsersFull(expr)
+        return iter(admin.enumerateUsersFull(expr))
+
     @classmethod
     def _remove_mail(cls, user):
         """
@@ -144,7 +287,8 @@ class BaseUser(Base):
         @param user The libuser .Entity object representing the user
         @return Returns True if success
         """
-        return cls._get_admin().removeMail(user) > 0
+        with cls._writing():
+            return cls._get_admin().removeMail(user) > 0
 
     @classmethod
     def _remove_home(cls, user):
@@ -154,7 +298,8 @@ class BaseUser(Base):
         @param user The libuser .Entity object representing the user
         @return Returns True if success
         """
-        return cls._get_admin().removeHome(user) > 0
+        with cls._writing():
+            return cls._get_admin().removeHome(user) > 0
 
     @classmethod
     def _create_home(cls, user):
@@ -164,5 +309,6 @@ class BaseUser(Base):
         @param user The user to create the home folder for
         @return Returns True if success
         """
-        return cls._get_admin().createHome(user) > 0
+        with cls._writing():
+            return cls._get_admin().createHome(user) > 0
 
@@ -0,0 +1,289 @@
+from collections import OrderedDict
+
+from .BaseUser import BaseUser
+from .User import User
+from .Group import Group
+
+class BatchResult:
+    """
+    @brief BatchResult The outcome of a single item of a Batch.
+    """
+
+    def __init__(self, action, name, success, error = None):
+        """
+        @brief __init__ Constructor taking the outcome of the item.
+
+        @param action The action of the item, e.g. "create_user"
+        @param name The name of the user or group the item applies to
+        @param success True if the item was written successfully
+        @param error The exception raised while writing the item
+        """
+        self.action = action
+        self.name = name
+        self.success = success
+        self.error = error
+
+    def __repr__(self):
+        return "BatchResult({action}, {name}, {success})".format(
+                action = self.action, name = self.name, success = self.success)
+
+class Batch:
+    """
+    @brief Batch Collects changes to users and groups and writes them at once.
+
+    Changes are coalesced before they are written, e.g. all members added to
+    one group result in a single modification of the group, members added
+    to a group created in the same batch are written with the group itself
+    and all new users are added with a single write if the backend supports
+    it. The writes attribute counts the backend calls writing the account
+    database. Used as a context manager the batch is committed when the
+    block is left without an exception.
+    """
+
+    def __init__(self, provisioner = None):
+        """
+        @brief __init__ Constructor creating an empty batch.
+
+        @param provisioner The Provisioner creating the home folders of new
+        users after the commit, None to create them with each user
+        """
+        self.provisioner = provisioner
+        self._create_groups = OrderedDict()
+        self._create_users = OrderedDict()
+        self._updates = OrderedDict()
+        self._members = OrderedDict()
+        self._deletes = OrderedDict()
+        self.results = []
+        self.writes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.commit()
+        return False
+
+    def create_user(self, name, home = None, loginshell = None, create_home = True):
+        """
+        @brief create_user Queues the creation of a user.
+
+        @param name The name of the user to be created
+        @param home The home folder path for the user
+        @param loginshell The loginshell for the user
+        @param create_home Set to True if a home folder should be created
+        """
+        self._create_users[name] = (home, loginshell, create_home)
+
+    def create_group(self, name, members = None):
+        """
+        @brief create_group Queues the creation of a group.
+
+        @param name The name of the group to be created
+        @param members The user names or User instances to add to the group
+        """
+        self._create_groups[name] = OrderedDict()
+        for member in members or []:
+            self._add_name(self._create_groups[name], member)
+
+    def update(self, entry):
+        """
+        @brief update Queues writing the changed properties of a User or Group.
+
+        @param entry The User or Group instance to be written
+        """
+        self._updates[self._key(entry)] = entry
+
+    def add_member(self, group, user):
+        """
+        @brief add_member Queues adding a member to a group.
+
+        @param group The Group instance or the name of the group
+        @param user The User instance or the name of the user
+        """
+        name = group.get_name() if isinstance(group, Group) else group
+        if name in self._create_groups:
+            self._add_name(self._create_groups[name], user)
+            return
+        if name not in self._members:
+            self._members[name] = (group, OrderedDict())
+        elif isinstance(group, Group):
+            self._members[name] = (group, self._members[name][1])
+        self._add_name(self._members[name][1], user)
+
+    def delete(self, entry):
+        """
+        @brief delete Queues the deletion of a User or Group.
+
+        Pending updates and membership changes of the entry are dropped.
+
+        @param entry The User or Group instance to be deleted
+        """
+        key = self._key(entry)
+        self._updates.pop(key, None)
+        if isinstance(entry, Group):
+            self._members.pop(entry.get_name(), None)
+        self._deletes[key] = entry
+
+    def commit(self):
+        """
+        @brief commit Writes all queued changes.
+
+        Groups are created first, then users, then updates and membership
+        changes are written and finally the deletions are applied. A failing
+        item does not stop the remaining items from being written. The write
+        lock of this library is held for the whole commit.
+
+        @return Returns the list of BatchResult instances
+        """
+        homes = []
+        with User._writing():
+            for name, members in self._create_groups.items():
+                self._write([("create_group", name)],
+                        lambda: Group.create(name, list(members)) is not None)
+            if self._create_users:
+                provision = self.provisioner is not None
+                writes = []
+                outcomes = User.create_many([(name, home, loginshell, create_home and not provision)
+                        for name, (home, loginshell, create_home) in self._create_users.items()],
+                        writes)
+                users = self._write_many("create_user", outcomes, sum(writes))
+                homes = [user for user in users if provision
+                        and self._create_users[user.get_name()][2]]
+            for key, entry in self._updates.items():
+                items = [("update", entry.get_name())]
+                if isinstance(entry, Group) and entry.get_name() in self._members:
+                    members = list(self._members.pop(entry.get_name())[1])
+                    self._merge(entry, members)
+                    items += [("add_member", member) for member in members]
+                self._write(items, entry.update)
+            for name, (group, members) in self._members.items():
+                members = list(members)
+                self._write([("add_member", member) for member in members],
+                        lambda: self._add_members(group, members))
+            for key, entry in self._deletes.items():
+                self._write([("delete", entry.get_name())], entry.delete)
+        if homes:
+            self.provisioner.provision(homes)
+        self._create_groups.clear()
+        self._create_users.clear()
+        self._updates.clear()
+        self._members.clear()
+        self._deletes.clear()
+        return self.results
+
+    @property
+    def succeeded(self):
+        """
+        @brief succeeded Returns the results of the items written successfully.
+        """
+        return [result for result in self.results if result.success]
+
+    @property
+    def failed(self):
+        """
+        @brief failed Returns the results of the items that failed.
+        """
+        return [result for result in self.results if not result.success]
+
+    def _write(self, items, write):
+        """
+        @brief _write Performs a single backend write and records the outcome
+        for every item coalesced into it.
+
+        @param items The list of action and name tuples coalesced into the write
+        @param write The function performing the write
+        @return Returns the result of the write or None if it failed
+        """
+        result = None
+        error = None
+        try:
+            result = write()
+            success = bool(result)
+        except Exception as exception:
+            success = False
+            error = exception
+        self.writes += 1
+        for action, name in items:
+            self.results.append(BatchResult(action, name, success, error))
+        return result if success else None
+
+    def _write_many(self, action, outcomes, writes):
+        """
+        @brief _write_many Records the outcome of the backend writes of
+        several items.
+
+        @param action The action of the items, e.g. "create_user"
+        @param outcomes A dict mapping the names to the written instance or
+        the raised exception
+        @param writes The number of backend writes made for the items
+        @return Returns the list of written instances
+        """
+        self.writes += writes
+        written = []
+        for name, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                self.results.append(BatchResult(action, name, False, outcome))
+            else:
+                self.results.append(BatchResult(action, name, True))
+                written.append(outcome)
+        return written
+
+    def _add_members(self, group, members):
+        """
+        @brief _add_members Adds the members to the group with a single write.
+
+        @param group The Group instance or the name of the group
+        @param members The names of the users to add
+        @return Returns True if success
+        """
+        if not isinstance(group, Group):
+            group = Group.by_name(group)
+        if not group.is_valid():
+            return False
+        return group.add_members(members)
+
+    @staticmethod
+    def _merge(group, members):
+        """
+        @brief _merge Adds the member names to the group not already in it.
+
+        @param group The Group instance
+        @param members The names of the users to add
+        """
+        known = set(group._members)
+        for member in members:
+            if member not in known:
+                known.add(member)
+                group._members.append(member)
+
+    @staticmethod
+    def _add_name(names, user):
+        """
+        @brief _add_name Appends the user name to the ordered set of names.
+
+        @param names The OrderedDict holding the user names as keys
+        @param user The User instance or the name of the user
+        """
+        if isinstance(user, BaseUser):
+            user = user.get_name()
+        names[user] = None
+
+    @staticmethod
+    def _key(entry):
+        """
+        @brief _key Returns the key identifying the User or Group instance.
+
+        @param entry The User or Group instance
+        @return Returns a tuple of the type and the id
+        """
+        return (type(entry), entry.get_id())
+
+def batch(provisioner = None):
+    """
+    @brief batch Returns a new Batch to collect changes to users and groups.
+
+    @param provisioner The Provisioner creating the home folders of new users
+    @return Returns the Batch instance
+    """
+    return Batch(provisioner)
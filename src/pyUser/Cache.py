@@ -0,0 +1,131 @@
+import time
+import threading
+
+from collections import OrderedDict
+
+class Cache:
+    """
+    @brief Cache Bounded least recently used cache with a per-entry time to live.
+
+    Entries may carry a tag, which allows to drop every entry belonging to the
+    same libuser .Entity at once, e.g. the lookups by name and by id.
+    """
+
+    MISS = object()
+
+    def __init__(self, size = 4096, ttl = 300, negative = True):
+        """
+        @brief __init__ Constructor taking the limits of the cache.
+
+        @param size The maximum number of entries held in the cache
+        @param ttl The time in seconds an entry stays valid, None for no expiry
+        @param negative Set to True to cache failed lookups as well
+        """
+        self._size = size
+        self._ttl = ttl
+        self._negative = negative
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key):
+        """
+        @brief get Returns the cached value for the given key.
+
+        @param key The key to look up
+        @return Returns the cached value or Cache.MISS
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return Cache.MISS
+            value, tag, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self._misses += 1
+                return Cache.MISS
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value, tag = None):
+        """
+        @brief put Stores the value for the given key.
+
+        A value of None is only stored if negative caching is enabled.
+
+        @param key The key to store the value for
+        @param value The value to be stored
+        @param tag The tag to group the entry with
+        """
+        if value is None and not self._negative:
+            return
+        expires = None if self._ttl is None else time.monotonic() + self._ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tag, expires)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self._size:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate(self, key):
+        """
+        @brief invalidate Drops the entry for the given key.
+
+        @param key The key to be dropped
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tag(self, tag):
+        """
+        @brief invalidate_tag Drops all entries stored with the given tag.
+
+        @param tag The tag of the entries to be dropped
+        """
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        """
+        @brief clear Drops all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        """
+        @brief stats Returns the counters of the cache.
+
+        @return Returns a dict with hits, misses, evictions and size
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+            }
+
+    def _remove(self, key):
+        """
+        @brief _remove Removes the entry for the given key, the lock must be held.
+
+        @param key The key to be removed
+        """
+        value, tag, expires = self._entries.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
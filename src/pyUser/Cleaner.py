@@ -0,0 +1,278 @@
+import os
+import time
+import stat
+import queue
+import threading
+
+from . import Attributes
+from .BaseUser import BaseUser
+
+TRASH = ".pyUser-trash"
+
+class Cleaner:
+    """
+    @brief Cleaner Removes the home folders and mail spools of deleted users
+    in a background thread.
+
+    The home folder is renamed into a trash folder next to it, which is
+    atomic and fast, and then removed file by file by the worker thread.
+    The worker can be throttled to a number of files and bytes per second,
+    so removing large home folders does not starve other I/O.
+    """
+
+    __DEFAULT = None
+    __DEFAULT_LOCK = threading.Lock()
+
+    def __init__(self, files_per_second = None, bytes_per_second = None):
+        """
+        @brief __init__ Constructor starting the worker thread.
+
+        @param files_per_second The maximum number of files removed per second
+        @param bytes_per_second The maximum number of bytes removed per second
+        """
+        self._files_per_second = files_per_second
+        self._bytes_per_second = bytes_per_second
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = None
+        self._removed = 0
+        self._failed = []
+        self._files = 0
+        self._bytes = 0
+        self._thread = threading.Thread(target = self._run, name = "pyUser-cleaner",
+                daemon = True)
+        self._thread.start()
+
+    @classmethod
+    def default(cls):
+        """
+        @brief default Returns the cleaner used by User.delete(deferred = True).
+
+        @return Returns the Cleaner, created on first use
+        """
+        with Cleaner.__DEFAULT_LOCK:
+            if Cleaner.__DEFAULT is None:
+                Cleaner.__DEFAULT = cls()
+            return Cleaner.__DEFAULT
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+        return False
+
+    def remove(self, user, home = None):
+        """
+        @brief remove Moves the home folder to the trash and queues the removal
+        of the home folder and the mail spool.
+
+        @param user The libuser .Entity of the deleted user
+        @param home The path of the home folder on the host, None to skip it
+        @return Returns the queued path of the home folder or None
+        """
+        path = self.move(user.get(Attributes.USERNAME)[0], home)
+        self.queue(user, path)
+        return path
+
+    def move(self, name, home):
+        """
+        @brief move Moves the home folder into the trash folder next to it.
+
+        If the home folder cannot be renamed, e.g. because it is a mount point
+        or busy, it is left in place to be removed there.
+
+        @param name The name of the user
+        @param home The path of the home folder on the host or None
+        @return Returns the path in the trash, the home folder if it could not
+        be moved or None if there is no home folder
+        """
+        if home is None or not os.path.isdir(home) or os.path.islink(home):
+            return None
+        folder = os.path.join(os.path.dirname(os.path.abspath(home)), TRASH)
+        trash = os.path.join(folder, "{name}.{time}".format(name = name,
+                time = time.time_ns()))
+        try:
+            os.makedirs(folder, mode = 0o700, exist_ok = True)
+            os.rename(home, trash)
+        except OSError:
+            return home
+        return trash
+
+    def restore(self, path, home):
+        """
+        @brief restore Moves a home folder moved to the trash back, e.g. if
+        deleting the user failed.
+
+        @param path The path returned by move
+        @param home The path of the home folder on the host
+        """
+        if path is not None and path != home:
+            os.rename(path, home)
+
+    def queue(self, user, path):
+        """
+        @brief queue Queues the removal of the home folder and the mail spool.
+
+        @param user The libuser .Entity of the deleted user
+        @param path The path returned by move
+        """
+        if path is not None:
+            self._put(("home", path))
+        self._put(("mail", user))
+
+    def collect(self, folder):
+        """
+        @brief collect Queues the removal of everything left in a trash folder,
+        e.g. after the process was stopped before the worker finished.
+
+        @param folder The folder holding the trash folder, e.g. the host path of /home
+        @return Returns the number of queued paths
+        """
+        trash = os.path.join(str(folder), TRASH)
+        try:
+            names = sorted(os.listdir(trash))
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            self._put(("home", os.path.join(trash, name)))
+        return len(names)
+
+    def status(self):
+        """
+        @brief status Returns the state of the removal queue.
+
+        @return Returns a dict with the pending paths, the path being removed,
+        the number of removed and the list of failed items with their error and
+        the number of files and bytes removed
+        """
+        with self._lock:
+            return {
+                "pending": list(self._pending),
+                "running": self._running,
+                "removed": self._removed,
+                "failed": list(self._failed),
+                "files": self._files,
+                "bytes": self._bytes,
+            }
+
+    def wait(self):
+        """
+        @brief wait Waits until all queued removals are finished.
+
+        @return Returns True if none failed
+        """
+        self._queue.join()
+        with self._lock:
+            return not self._failed
+
+    def stop(self, wait = True):
+        """
+        @brief stop Stops the worker thread.
+
+        Removals not finished stay in the trash folder, see collect.
+
+        @param wait Set to True to finish the queued removals first
+        """
+        if wait:
+            self._queue.join()
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _put(self, item):
+        """
+        @brief _put Queues a removal.
+
+        @param item A tuple of the kind, "home" or "mail", and the path or entity
+        """
+        with self._lock:
+            self._pending.append(self._describe(item))
+        self._queue.put(item)
+
+    @staticmethod
+    def _describe(item):
+        kind, value = item
+        if kind == "home":
+            return value
+        return "mail:" + value.get(Attributes.USERNAME)[0]
+
+    def _run(self):
+        """
+        @brief _run Body of the worker thread.
+        """
+        while True:
+            item = self._queue.get()
+            if item is None or self._stopped.is_set():
+                self._queue.task_done()
+                return
+            description = self._describe(item)
+            with self._lock:
+                self._pending.remove(description)
+                self._running = description
+            error = None
+            finished = True
+            try:
+                kind, value = item
+                if kind == "home":
+                    finished = self._remove_tree(value)
+                else:
+                    BaseUser._remove_mail(value)
+            except Exception as exception:
+                error = exception
+            with self._lock:
+                self._running = None
+                if error is not None:
+                    self._failed.append((description, error))
+                elif finished:
+                    self._removed += 1
+                else:
+                    self._pending.append(description)
+            self._queue.task_done()
+
+    def _remove_tree(self, path):
+        """
+        @brief _remove_tree Removes the folder file by file, throttled.
+
+        @param path The folder to remove
+        @return Returns False if the cleaner was stopped before the folder was removed
+        """
+        start = time.monotonic()
+        files, size = 0, 0
+        for folder, folders, names in os.walk(path, topdown = False):
+            for name in names + folders:
+                entry = os.path.join(folder, name)
+                info = os.lstat(entry)
+                if stat.S_ISDIR(info.st_mode):
+                    os.rmdir(entry)
+                else:
+                    os.unlink(entry)
+                    size += info.st_size
+                files += 1
+                with self._lock:
+                    self._files += 1
+                    self._bytes += 0 if stat.S_ISDIR(info.st_mode) else info.st_size
+                self._throttle(start, files, size)
+                if self._stopped.is_set():
+                    return False
+        os.rmdir(path)
+        return True
+
+    def _throttle(self, start, files, size):
+        """
+        @brief _throttle Sleeps until the removal is within the rate limits.
+
+        @param start The time the removal started
+        @param files The number of files removed so far
+        @param size The number of bytes removed so far
+        """
+        delay = 0
+        if self._files_per_second:
+            delay = max(delay, files / self._files_per_second)
+        if self._bytes_per_second:
+            delay = max(delay, size / self._bytes_per_second)
+        delay -= time.monotonic() - start
+        if delay > 0:
+            self._stopped.wait(delay)
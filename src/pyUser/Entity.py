@@ -0,0 +1,83 @@
+class Entity:
+    """
+    @brief Entity Native implementation of a libuser .Entity.
+
+    Holds the attributes of a user or group as lists of values, like libuser.
+    """
+
+    def __init__(self, values = None, key = None):
+        """
+        @brief __init__ Constructor taking the initial attribute values.
+
+        @param values A dict mapping the attribute names to their values
+        @param key The name the entity is stored under in the backend
+        """
+        self._values = {}
+        self._key = key
+        for attribute, value in (values or {}).items():
+            self[attribute] = value
+
+    def get(self, attribute, default = None):
+        """
+        @brief get Returns the values of the attribute.
+
+        @param attribute The name of the attribute
+        @param default Returned if the attribute is not set, defaults to []
+        @return Returns a list of the values of the attribute
+        """
+        if attribute not in self._values:
+            return [] if default is None else default
+        return list(self._values[attribute])
+
+    def __getitem__(self, attribute):
+        return self.get(attribute)
+
+    def __setitem__(self, attribute, value):
+        if isinstance(value, (list, tuple)):
+            self._values[attribute] = list(value)
+        elif value is None:
+            self._values[attribute] = []
+        else:
+            self._values[attribute] = [value]
+
+    def __delitem__(self, attribute):
+        self._values.pop(attribute, None)
+
+    def __contains__(self, attribute):
+        return attribute in self._values
+
+    def has_key(self, attribute):
+        """
+        @brief has_key Returns True if the attribute is set.
+
+        @param attribute The name of the attribute
+        @return Returns True if the attribute is set
+        """
+        return attribute in self._values
+
+    def keys(self):
+        """
+        @brief keys Returns the names of all set attributes.
+
+        @return Returns a list of attribute names
+        """
+        return list(self._values.keys())
+
+    def clear(self, attribute):
+        """
+        @brief clear Removes all values of the attribute.
+
+        @param attribute The name of the attribute
+        """
+        del self[attribute]
+
+    def copy(self):
+        """
+        @brief copy Returns a copy of the entity.
+
+        @return Returns the copied Entity
+        """
+        return Entity(self._values, self._key)
+
+    def __repr__(self):
+        return "Entity({values})".format(values = self._values)
@@ -0,0 +1,994 @@
+import os
+import time
+import fcntl
+import shutil
+import fnmatch
+import tempfile
+import threading
+
+from pathlib import Path
+from contextlib import contextmanager
+
+from . import Attributes
+from .Backend import Backend
+from .Entity import Entity
+from .Index import Index
+
+PASSWD = (Attributes.USERNAME, Attributes.USERPASSWORD, Attributes.UIDNUMBER,
+        Attributes.GIDNUMBER, Attributes.GECOS, Attributes.HOMEDIRECTORY,
+        Attributes.LOGINSHELL)
+SHADOW = (Attributes.USERNAME, Attributes.SHADOWPASSWORD, Attributes.SHADOWLASTCHANGE,
+        Attributes.SHADOWMIN, Attributes.SHADOWMAX, Attributes.SHADOWWARNING,
+        Attributes.SHADOWINACTIVE, Attributes.SHADOWEXPIRE, Attributes.SHADOWFLAG)
+GROUP = (Attributes.GROUPNAME, Attributes.GROUPPASSWORD, Attributes.GIDNUMBER,
+        Attributes.MEMBERNAME)
+GSHADOW = (Attributes.GROUPNAME, Attributes.SHADOWPASSWORD,
+        Attributes.ADMINISTRATORNAME, Attributes.MEMBERNAME)
+
+NUMERIC = {Attributes.UIDNUMBER, Attributes.GIDNUMBER, Attributes.SHADOWLASTCHANGE,
+        Attributes.SHADOWMIN, Attributes.SHADOWMAX, Attributes.SHADOWWARNING,
+        Attributes.SHADOWINACTIVE, Attributes.SHADOWEXPIRE, Attributes.SHADOWFLAG}
+LISTS = {Attributes.MEMBERNAME, Attributes.ADMINISTRATORNAME}
+
+def parse_line(line, fields, entity, skip = ()):
+    """
+    @brief parse_line Parses a line of an account file into the entity.
+
+    @param line The line to parse
+    @param fields The attribute names of the fields of the line
+    @param entity The Entity to store the values in
+    @param skip The attribute names to be ignored
+    """
+    for attribute, value in zip(fields, line.split(":")):
+        if attribute in skip:
+            continue
+        if attribute in LISTS:
+            entity[attribute] = [member for member in value.split(",") if member]
+        elif attribute in NUMERIC:
+            if value:
+                entity[attribute] = int(value)
+            else:
+                del entity[attribute]
+        else:
+            entity[attribute] = value
+
+def format_line(entity, fields):
+    """
+    @brief format_line Formats the entity as a line of an account file.
+
+    @param entity The Entity to format
+    @param fields The attribute names of the fields of the line
+    @return Returns the line without the line break
+    """
+    values = []
+    for attribute in fields:
+        value = entity.get(attribute)
+        if attribute in LISTS:
+            values.append(",".join(value))
+        else:
+            values.append("" if not value else str(value[0]))
+    return ":".join(values)
+
+def line_key(line):
+    """
+    @brief line_key Returns the name of the entry of an account file line.
+
+    @param line The line of the account file
+    @return Returns the name
+    """
+    return line.split(":", 1)[0]
+
+class FilesBackend(Backend):
+    """
+    @brief FilesBackend Native backend reading and writing the account files.
+
+    Handles passwd, shadow, group and gshadow below the etc folder of the
+    given root directory without libuser. The files are parsed in a single
+    pass, written atomically by renaming a temporary file over the original
+    and locked with the same lock file as lckpwdf(3). Lookups by name and id
+    are served from memory mapped indexes of the files, see Index.
+    Home folders and mail spools are resolved below the root as well.
+    """
+
+    def __init__(self, root = "/", skeleton = "/etc/skel", home = "/home",
+            loginshell = "/bin/bash", mail_spool = "/var/spool/mail",
+            uid_min = 1000, gid_min = 1000, uid_max = 60000, gid_max = 60000,
+            index = True):
+        """
+        @brief __init__ Constructor taking the root and the defaults for new entries.
+
+        @param root The root directory holding etc/passwd and friends
+        @param skeleton The skeleton folder copied to new home folders
+        @param home The folder new home folders are created in
+        @param loginshell The loginshell of new users
+        @param mail_spool The folder holding the mail spools
+        @param uid_min The smallest uid assigned to new users
+        @param gid_min The smallest gid assigned to new groups
+        @param uid_max The largest uid assigned to new users
+        @param gid_max The largest gid assigned to new groups
+        @param index Set to False to scan the files on every lookup
+        """
+        self._root = Path(root)
+        self._etc = self._root / "etc"
+        self._skeleton = skeleton
+        self._home = home
+        self._loginshell = loginshell
+        self._mail_spool = mail_spool
+        self._uid_min = uid_min
+        self._gid_min = gid_min
+        self._uid_max = uid_max
+        self._gid_max = gid_max
+        self._mutex = threading.RLock()
+        self._indexed = index
+        self._indexes = {}
+
+    def hostPath(self, path): # @Override
+        """
+        @brief hostPath Returns the path below the root for the given path.
+
+        @param path The path as stored in the account database
+        @return Returns the path on the host
+        """
+        if path is None or str(self._root) == "/":
+            return path
+        return str(self._root / str(path).lstrip("/"))
+
+    def _path(self, name):
+        """
+        @brief _path Returns the path of the account file.
+
+        @param name The name of the file, e.g. "passwd"
+        @return Returns the Path of the file
+        """
+        return self._etc / name
+
+    def _read(self, name):
+        """
+        @brief _read Reads the lines of the account file.
+
+        @param name The name of the file, e.g. "passwd"
+        @return Returns the list of non-empty lines without line breaks
+        """
+        try:
+            with self._path(name).open("r") as file:
+                return [line.rstrip("\n") for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _write(self, name, lines):
+        """
+        @brief _write Atomically replaces the account file with the given lines.
+
+        The lines are written to a temporary file in the same folder, which
+        then is renamed over the original, keeping its mode and owner.
+
+        @param name The name of the file, e.g. "passwd"
+        @param lines The lines to write without line breaks
+        """
+        path = self._path(name)
+        mode = 0o600 if name in ("shadow", "gshadow") else 0o644
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        descriptor, temporary = tempfile.mkstemp(prefix = "." + name + ".",
+                dir = str(self._etc))
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                for line in lines:
+                    file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            if stat is not None:
+                os.chmod(temporary, stat.st_mode & 0o7777)
+                if os.geteuid() == 0:
+                    os.chown(temporary, stat.st_uid, stat.st_gid)
+            else:
+                os.chmod(temporary, mode)
+            os.replace(temporary, str(path))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+
+    @contextmanager
+    def _lock(self):
+        """
+        @brief _lock Locks the account files for writing.
+
+        Uses the lock file of lckpwdf(3), so other tools honouring it are
+        excluded as well.
+        """
+        with self._mutex:
+            self._etc.mkdir(parents = True, exist_ok = True)
+            descriptor = os.open(str(self._path(".pwd.lock")),
+                    os.O_WRONLY | os.O_CREAT, 0o600)
+            try:
+                fcntl.lockf(descriptor, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(descriptor)
+
+    def _index(self, name):
+        """
+        @brief _index Returns the lookup index of the account file.
+
+        @param name The name of the file, e.g. "passwd"
+        @return Returns the Index
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes.setdefault(name, Index(self._path(name)))
+        return index
+
+    def _find(self, name, match, index = 0):
+        """
+        @brief _find Returns the first line of the account file matching the value.
+
+        Matches on the name and the id are served from the index of the file.
+
+        @param name The name of the file, e.g. "passwd"
+        @param match The value of the field to match as string
+        @param index The index of the field to compare
+        @return Returns the line or None
+        """
+        if self._indexed and index == 0:
+            return self._index(name).by_name(match)
+        if self._indexed and index == 2:
+            return self._index(name).by_id(match)
+        try:
+            with self._path(name).open("r") as file:
+                for line in file:
+                    fields = line.rstrip("\n").split(":")
+                    if len(fields) > index and fields[index] == match:
+                        return line.rstrip("\n")
+        except FileNotFoundError:
+            pass
+        return None
+
+    def _user(self, line, shadow = None):
+        """
+        @brief _user Creates the user entity from the passwd and shadow lines.
+
+        @param line The line of the passwd file
+        @param shadow The line of the shadow file or None
+        @return Returns the Entity
+        """
+        entity = Entity(key = line_key(line))
+        parse_line(line, PASSWD, entity)
+        if shadow is not None:
+            parse_line(shadow, SHADOW, entity, (Attributes.USERNAME,))
+        return entity
+
+    def _group(self, line, gshadow = None):
+        """
+        @brief _group Creates the group entity from the group and gshadow lines.
+
+        @param line The line of the group file
+        @param gshadow The line of the gshadow file or None
+        @return Returns the Entity
+        """
+        entity = Entity(key = line_key(line))
+        parse_line(line, GROUP, entity)
+        if gshadow is not None:
+            parse_line(gshadow, GSHADOW, entity, (Attributes.GROUPNAME, Attributes.MEMBERNAME))
+        return entity
+
+    def lookupUserByName(self, name): # @Override
+        """
+        @brief lookupUserByName Returns the user entity with the given name.
+
+        @param name The name of the user
+        @return Returns the Entity or None
+        """
+        line = self._find("passwd", name)
+        if line is None:
+            return None
+        return self._user(line, self._find("shadow", name))
+
+    def lookupUserById(self, id): # @Override
+        """
+        @brief lookupUserById Returns the user entity with the given uid.
+
+        @param id The uid of the user
+        @return Returns the Entity or None
+        """
+        line = self._find("passwd", str(id), 2)
+        if line is None:
+            return None
+        return self._user(line, self._find("shadow", line_key(line)))
+
+    def lookupGroupByName(self, name): # @Override
+        """
+        @brief lookupGroupByName Returns the group entity with the given name.
+
+        @param name The name of the group
+        @return Returns the Entity or None
+        """
+        line = self._find("group", name)
+        if line is None:
+            return None
+        return self._group(line, self._find("gshadow", name))
+
+    def lookupGroupById(self, id): # @Override
+        """
+        @brief lookupGroupById Returns the group entity with the given gid.
+
+        @param id The gid of the group
+        @return Returns the Entity or None
+        """
+        line = self._find("group", str(id), 2)
+        if line is None:
+            return None
+        return self._group(line, self._find("gshadow", line_key(line)))
+
+    def _next_id(self, name, minimum, maximum):
+        """
+        @brief _next_id Returns the id following the highest id in use.
+
+        Like useradd, ids above the maximum, e.g. of nobody, are ignored and
+        the lowest free id is returned once the maximum is reached.
+
+        @param name The name of the file, e.g. "passwd"
+        @param minimum The smallest id to be returned
+        @param maximum The largest id to be returned
+        @return Returns the next free id
+        """
+        if self._indexed:
+            index = self._index(name)
+            highest = index.max_id(maximum)
+            used = lambda id: index.by_id(id) is not None
+        else:
+            ids = set()
+            for line in self._read(name):
+                fields = line.split(":")
+                if len(fields) > 2 and fields[2].isdigit():
+                    ids.add(int(fields[2]))
+            highest = max((id for id in ids if id <= maximum), default = None)
+            used = ids.__contains__
+        if highest is None or highest < minimum:
+            return minimum
+        if highest < maximum:
+            return highest + 1
+        for id in range(minimum, maximum + 1):
+            if not used(id):
+                return id
+        raise RuntimeError("no free id left between {minimum} and {maximum}"
+                .format(minimum = minimum, maximum = maximum))
+
+    def initUser(self, name): # @Override
+        """
+        @brief initUser Returns a new user entity filled with the defaults.
+
+        @param name The name of the user
+        @return Returns the Entity
+        """
+        uid = self._next_id("passwd", self._uid_min, self._uid_max)
+        return Entity({
+            Attributes.USERNAME: name,
+            Attributes.USERPASSWORD: "x",
+            Attributes.UIDNUMBER: uid,
+            Attributes.GIDNUMBER: uid,
+            Attributes.GECOS: "",
+            Attributes.HOMEDIRECTORY: self._home.rstrip("/") + "/" + name,
+            Attributes.LOGINSHELL: self._loginshell,
+            Attributes.SHADOWPASSWORD: "!!",
+            Attributes.SHADOWLASTCHANGE: int(time.time() // 86400),
+            Attributes.SHADOWMIN: 0,
+            Attributes.SHADOWMAX: 99999,
+            Attributes.SHADOWWARNING: 7,
+        })
+
+    def initGroup(self, name): # @Override
+        """
+        @brief initGroup Returns a new group entity filled with the defaults.
+
+        @param name The name of the group
+        @return Returns the Entity
+        """
+        return Entity({
+            Attributes.GROUPNAME: name,
+            Attributes.GROUPPASSWORD: "x",
+            Attributes.GIDNUMBER: self._next_id("group", self._gid_min, self._gid_max),
+            Attributes.SHADOWPASSWORD: "!!",
+        })
+
+    def _add(self, entities, primary, shadow, primary_fields, shadow_fields, id):
+        """
+        @brief _add Appends the entities to the primary and shadow file with
+        a single rewrite of each, writing none of them if one is invalid.
+
+        @param entities The Entity objects to add
+        @param primary The name of the primary file, e.g. "passwd"
+        @param shadow The name of the shadow file, e.g. "shadow"
+        @param primary_fields The attribute names of the primary file
+        @param shadow_fields The attribute names of the shadow file
+        @param id The attribute name of the id
+        """
+        names = {}
+        ids = {}
+        for entity in entities:
+            name = entity.get(primary_fields[0])[0]
+            if name in names:
+                raise RuntimeError("entry {name} already exists".format(name = name))
+            if str(entity.get(id)[0]) in ids:
+                raise RuntimeError("id {id} already in use".format(id = entity.get(id)[0]))
+            names[name] = entity
+            ids[str(entity.get(id)[0])] = entity
+        if self._indexed:
+            for name, entity in names.items():
+                if self._index(primary).by_name(name) is not None:
+                    raise RuntimeError("entry {name} already exists".format(name = name))
+                if self._index(primary).by_id(entity.get(id)[0]) is not None:
+                    raise RuntimeError("id {id} already in use".format(id = entity.get(id)[0]))
+        lines = self._read(primary)
+        for line in lines if not self._indexed else ():
+            fields = line.split(":")
+            if fields[0] in names:
+                raise RuntimeError("entry {name} already exists".format(name = fields[0]))
+            if len(fields) > 2 and fields[2] in ids:
+                raise RuntimeError("id {id} already in use".format(id = fields[2]))
+        shadows = [line for line in self._read(shadow) if line_key(line) not in names]
+        self._write(shadow, shadows + [format_line(entity, shadow_fields)
+                for entity in entities])
+        self._write(primary, lines + [format_line(entity, primary_fields)
+                for entity in entities])
+        for name, entity in names.items():
+            entity._key = name
+
+    def _delete(self, entity, primary, shadow, primary_fields):
+        """
+        @brief _delete Removes the entity from the primary and shadow file.
+
+        @param entity The Entity to delete
+        @param primary The name of the primary file, e.g. "passwd"
+        @param shadow The name of the shadow file, e.g. "shadow"
+        @param primary_fields The attribute names of the primary file
+        """
+        name = entity._key or entity.get(primary_fields[0])[0]
+        lines = self._read(primary)
+        remaining = [line for line in lines if line_key(line) != name]
+        if len(remaining) == len(lines):
+            raise RuntimeError("entry {name} does not exist".format(name = name))
+        self._write(primary, remaining)
+        self._write(shadow, [line for line in self._read(shadow) if line_key(line) != name])
+
+    def _modify(self, entities, primary, shadow, primary_fields, shadow_fields):
+        """
+        @brief _modify Replaces the lines of the entities in the primary and shadow file.
+
+        The entities are located by the name they were loaded with, so renames
+        are written as well. Each file is rewritten once for all entities, and
+        not at all if none of its lines changed. A shadow line is only added for
+        an entity without one if its shadow password was set.
+
+        @param entities The Entity objects to write
+        @param primary The name of the primary file, e.g. "passwd"
+        @param shadow The name of the shadow file, e.g. "shadow"
+        @param primary_fields The attribute names of the primary file
+        @param shadow_fields The attribute names of the shadow file
+        """
+        lines = self._read(primary)
+        rows = {}
+        for index, line in enumerate(lines):
+            rows.setdefault(line_key(line), index)
+        changes = {}
+        renames = set()
+        for entity in entities:
+            name = entity._key or entity.get(primary_fields[0])[0]
+            renamed = entity.get(primary_fields[0])[0]
+            if name not in rows:
+                raise RuntimeError("entry {name} does not exist".format(name = name))
+            if renamed != name:
+                if renamed in rows or renamed in renames:
+                    raise RuntimeError("entry {name} already exists".format(name = renamed))
+                renames.add(renamed)
+            changes[name] = entity
+        primary_changed = False
+        for name, entity in changes.items():
+            line = format_line(entity, primary_fields)
+            if lines[rows[name]] != line:
+                lines[rows[name]] = line
+                primary_changed = True
+        shadows = self._read(shadow)
+        shadow_changed = False
+        matched = set()
+        for index, line in enumerate(shadows):
+            name = line_key(line)
+            entity = changes.get(name)
+            if entity is not None:
+                matched.add(name)
+                line = format_line(entity, shadow_fields)
+                if shadows[index] != line:
+                    shadows[index] = line
+                    shadow_changed = True
+        for name, entity in changes.items():
+            if name not in matched and entity.has_key(Attributes.SHADOWPASSWORD):
+                shadows.append(format_line(entity, shadow_fields))
+                shadow_changed = True
+        if shadow_changed:
+            self._write(shadow, shadows)
+        if primary_changed:
+            self._write(primary, lines)
+        for entity in changes.values():
+            entity._key = entity.get(primary_fields[0])[0]
+
+    def _set_lock(self, entity, locked, modify):
+        """
+        @brief _set_lock Locks or unlocks the password of the entity.
+
+        @param entity The Entity to lock or unlock
+        @param locked True to lock, False to unlock
+        @param modify The function writing the entity
+        """
+        copy = entity.copy()
+        self._lock_password(copy, locked)
+        modify(copy)
+        self._lock_password(entity, locked)
+
+    def _set_locks(self, entities, locked, primary, shadow, primary_fields, shadow_fields):
+        """
+        @brief _set_locks Locks or unlocks the passwords of the entities with
+        a single rewrite.
+
+        The passwords are changed on copies, the entities are only changed
+        once all of them were written, so a failed call leaves them as they
+        were and can be retried entity by entity.
+
+        @param entities The Entity objects to lock or unlock
+        @param locked True to lock, False to unlock
+        @param primary The name of the primary file, e.g. "passwd"
+        @param shadow The name of the shadow file, e.g. "shadow"
+        @param primary_fields The attribute names of the primary file
+        @param shadow_fields The attribute names of the shadow file
+        @return Returns the number of written entities
+        """
+        entities = list(entities)
+        changed = []
+        for entity in entities:
+            copy = entity.copy()
+            self._lock_password(copy, locked)
+            changed.append(copy)
+        if changed:
+            with self._lock():
+                self._modify(changed, primary, shadow, primary_fields, shadow_fields)
+        for entity in entities:
+            self._lock_password(entity, locked)
+        return len(entities)
+
+    @staticmethod
+    def _lock_password(entity, locked):
+        """
+        @brief _lock_password Prefixes the password of the entity with "!" or
+        removes a single "!".
+
+        Like usermod -U, unlocking is refused if it would leave the password
+        empty, which would allow to log in without password.
+
+        @param entity The Entity to lock or unlock
+        @param locked True to lock, False to unlock
+        """
+        attribute = Attributes.SHADOWPASSWORD
+        if not entity.get(attribute):
+            attribute = Attributes.USERPASSWORD
+            if entity.has_key(Attributes.GROUPNAME):
+                attribute = Attributes.GROUPPASSWORD
+        password = (entity.get(attribute) or [""])[0]
+        if locked and not password.startswith("!"):
+            password = "!" + password
+        elif not locked and password.startswith("!"):
+            password = password[1:]
+            if not password:
+                name = entity.get(Attributes.USERNAME) or entity.get(Attributes.GROUPNAME)
+                raise RuntimeError("unlocking {name} would leave an empty password"
+                        .format(name = name[0] if name else None))
+        entity[attribute] = password
+
+    def addUser(self, entity, mkhomedir = True, mkmailspool = True): # @Override
+        """
+        @brief addUser Adds the user to the system.
+
+        @param entity The Entity of the user
+        @param mkhomedir True if the home folder shall be created
+        @param mkmailspool True if the mail spool shall be created
+        @return Returns 1 if success
+        """
+        with self._lock():
+            self._add([entity], "passwd", "shadow", PASSWD, SHADOW, Attributes.UIDNUMBER)
+        if mkhomedir:
+            self.createHome(entity)
+        if mkmailspool:
+            self._create_mail(entity)
+        return 1
+
+    def addUsers(self, entities, mkhomedir = True, mkmailspool = True):
+        """
+        @brief addUsers Adds the users with a single rewrite of passwd and
+        shadow, none of them if one of them is invalid.
+
+        @param entities The Entity objects of the users
+        @param mkhomedir True if the home folders shall be created
+        @param mkmailspool True if the mail spools shall be created
+        @return Returns the number of added users
+        """
+        entities = list(entities)
+        if entities:
+            with self._lock():
+                self._add(entities, "passwd", "shadow", PASSWD, SHADOW, Attributes.UIDNUMBER)
+        for entity in entities:
+            if mkhomedir:
+                self.createHome(entity)
+            if mkmailspool:
+                self._create_mail(entity)
+        return len(entities)
+
+    def deleteUser(self, entity): # @Override
+        """
+        @brief deleteUser Deletes the user from the system.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        with self._lock():
+            self._delete(entity, "passwd", "shadow", PASSWD)
+        return 1
+
+    def modifyUser(self, entity): # @Override
+        """
+        @brief modifyUser Writes the changed attributes of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        with self._lock():
+            self._modify([entity], "passwd", "shadow", PASSWD, SHADOW)
+        return 1
+
+    def modifyUsers(self, entities): # @Override
+        """
+        @brief modifyUsers Writes the changed attributes of the users with
+        a single rewrite of passwd and shadow.
+
+        @param entities The Entity objects of the users
+        @return Returns the number of written users
+        """
+        entities = list(entities)
+        if entities:
+            with self._lock():
+                self._modify(entities, "passwd", "shadow", PASSWD, SHADOW)
+        return len(entities)
+
+    def lockUser(self, entity): # @Override
+        """
+        @brief lockUser Locks the password of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        self._set_lock(entity, True, self.modifyUser)
+        return 1
+
+    def unlockUser(self, entity): # @Override
+        """
+        @brief unlockUser Unlocks the password of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        self._set_lock(entity, False, self.modifyUser)
+        return 1
+
+    def lockUsers(self, entities):
+        """
+        @brief lockUsers Locks the passwords of the users with a single rewrite.
+
+        @param entities The Entity objects of the users
+        @return Returns the number of locked users
+        """
+        return self._set_locks(entities, True, "passwd", "shadow", PASSWD, SHADOW)
+
+    def unlockUsers(self, entities):
+        """
+        @brief unlockUsers Unlocks the passwords of the users with a single rewrite.
+
+        @param entities The Entity objects of the users
+        @return Returns the number of unlocked users
+        """
+        return self._set_locks(entities, False, "passwd", "shadow", PASSWD, SHADOW)
+
+    def addGroup(self, entity): # @Override
+        """
+        @brief addGroup Adds the group to the system.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        with self._lock():
+            self._add([entity], "group", "gshadow", GROUP, GSHADOW, Attributes.GIDNUMBER)
+        return 1
+
+    def deleteGroup(self, entity): # @Override
+        """
+        @brief deleteGroup Deletes the group from the system.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        with self._lock():
+            self._delete(entity, "group", "gshadow", GROUP)
+        return 1
+
+    def modifyGroup(self, entity): # @Override
+        """
+        @brief modifyGroup Writes the changed attributes of the group.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        with self._lock():
+            self._modify([entity], "group", "gshadow", GROUP, GSHADOW)
+        return 1
+
+    def modifyGroups(self, entities): # @Override
+        """
+        @brief modifyGroups Writes the changed attributes of the groups with
+        a single rewrite of group and gshadow.
+
+        @param entities The Entity objects of the groups
+        @return Returns the number of written groups
+        """
+        entities = list(entities)
+        if entities:
+            with self._lock():
+                self._modify(entities, "group", "gshadow", GROUP, GSHADOW)
+        return len(entities)
+
+    def lockGroup(self, entity): # @Override
+        """
+        @brief lockGroup Locks the password of the group.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        self._set_lock(entity, True, self.modifyGroup)
+        return 1
+
+    def unlockGroup(self, entity): # @Override
+        """
+        @brief unlockGroup Unlocks the password of the group.
+
+        @param entity The Entity of the group
+        @return Returns 1 if success
+        """
+        self._set_lock(entity, False, self.modifyGroup)
+        return 1
+
+    def lockGroups(self, entities):
+        """
+        @brief lockGroups Locks the passwords of the groups with a single rewrite.
+
+        @param entities The Entity objects of the groups
+        @return Returns the number of locked groups
+        """
+        return self._set_locks(entities, True, "group", "gshadow", GROUP, GSHADOW)
+
+    def unlockGroups(self, entities):
+        """
+        @brief unlockGroups Unlocks the passwords of the groups with a single rewrite.
+
+        @param entities The Entity objects of the groups
+        @return Returns the number of unlocked groups
+        """
+        return self._set_locks(entities, False, "group", "gshadow", GROUP, GSHADOW)
+
+    def _names(self, name, pattern):
+        """
+        @brief _names Returns the names in the account file matching the pattern.
+
+        @param name The name of the file, e.g. "passwd"
+        @param pattern The glob pattern to match, None for all
+        @return Returns a list of names
+        """
+        names = [line_key(line) for line in self._read(name)]
+        if pattern is None or pattern == "*":
+            return names
+        return fnmatch.filter(names, pattern)
+
+    def enumerateUsers(self, pattern = None): # @Override
+        """
+        @brief enumerateUsers Returns the names of the users matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of user names
+        """
+        return self._names("passwd", pattern)
+
+    def enumerateGroups(self, pattern = None): # @Override
+        """
+        @brief enumerateGroups Returns the names of the groups matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of group names
+        """
+        return self._names("group", pattern)
+
+    def _iterate(self, primary, shadow, pattern, create):
+        """
+        @brief _iterate Yields the entities of the primary file matching the pattern.
+
+        The primary file is read line by line while the entities are consumed.
+        The shadow lines are looked up in the index of the shadow file, or in
+        the lines read up front without index.
+
+        @param primary The name of the primary file, e.g. "passwd"
+        @param shadow The name of the shadow file, e.g. "shadow"
+        @param pattern The glob pattern to match, None for all
+        @param create The function creating the entity from both lines
+        @return Returns a generator of Entity objects
+        """
+        if self._indexed:
+            lookup = self._index(shadow).by_name
+        else:
+            lookup = {line_key(line): line for line in self._read(shadow)}.get
+        try:
+            file = self._path(primary).open("r")
+        except FileNotFoundError:
+            return
+        with file:
+            for line in file:
+                if not line.strip():
+                    continue
+                line = line.rstrip("\n")
+                name = line_key(line)
+                if pattern is None or fnmatch.fnmatchcase(name, pattern):
+                    yield create(line, lookup(name))
+
+    def enumerateUsersFull(self, pattern = None): # @Override
+        """
+        @brief enumerateUsersFull Returns the entities of the users matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of Entity objects
+        """
+        return list(self.iterateUsersFull(pattern))
+
+    def enumerateGroupsFull(self, pattern = None): # @Override
+        """
+        @brief enumerateGroupsFull Returns the entities of the groups matching the glob pattern.
+
+        @param pattern The glob pattern to match
+        @return Returns a list of Entity objects
+        """
+        return list(self.iterateGroupsFull(pattern))
+
+    def iterateUsersFull(self, pattern = None):
+        """
+        @brief iterateUsersFull Yields the entities of the users matching the
+        glob pattern while reading passwd.
+
+        @param pattern The glob pattern to match
+        @return Returns a generator of Entity objects
+        """
+        return self._iterate("passwd", "shadow", pattern, self._user)
+
+    def iterateGroupsFull(self, pattern = None):
+        """
+        @brief iterateGroupsFull Yields the entities of the groups matching the
+        glob pattern while reading group.
+
+        @param pattern The glob pattern to match
+        @return Returns a generator of Entity objects
+        """
+        return self._iterate("group", "gshadow", pattern, self._group)
+
+    def enumerateUsersByGroup(self, name): # @Override
+        """
+        @brief enumerateUsersByGroup Returns the names of the users in the group.
+
+        @param name The name of the group
+        @return Returns a list of user names
+        """
+        line = self._find("group", name)
+        if line is None:
+            return []
+        group = self._group(line)
+        result = group.get(Attributes.MEMBERNAME)
+        gid = str(group.get(Attributes.GIDNUMBER)[0])
+        for line in self._read("passwd"):
+            fields = line.split(":")
+            if len(fields) > 3 and fields[3] == gid and fields[0] not in result:
+                result.append(fields[0])
+        return result
+
+    def enumerateGroupsByUser(self, name): # @Override
+        """
+        @brief enumerateGroupsByUser Returns the names of the groups of the user.
+
+        @param name The name of the user
+        @return Returns a list of group names
+        """
+        line = self._find("passwd", name)
+        gid = line.split(":")[3] if line is not None else None
+        result = []
+        for line in self._read("group"):
+            fields = line.split(":")
+            if len(fields) < 4:
+                continue
+            if fields[2] == gid or name in fields[3].split(","):
+                result.append(fields[0])
+        return result
+
+    def createHome(self, entity): # @Override
+        """
+        @brief createHome Creates the home folder of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        home = Path(self.hostPath(entity.get(Attributes.HOMEDIRECTORY)[0]))
+        if home.exists():
+            raise RuntimeError("home folder {home} already exists".format(home = home))
+        skeleton = Path(self.hostPath(self._skeleton))
+        home.parent.mkdir(parents = True, exist_ok = True)
+        if skeleton.is_dir():
+            shutil.copytree(str(skeleton), str(home), symlinks = True)
+        else:
+            home.mkdir()
+        os.chmod(str(home), 0o700)
+        if os.geteuid() == 0:
+            uid = entity.get(Attributes.UIDNUMBER)[0]
+            gid = entity.get(Attributes.GIDNUMBER)[0]
+            for folder, folders, files in os.walk(str(home)):
+                os.lchown(folder, uid, gid)
+                for name in folders + files:
+                    os.lchown(os.path.join(folder, name), uid, gid)
+        return 1
+
+    def removeHome(self, entity): # @Override
+        """
+        @brief removeHome Removes the home folder of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        home = Path(self.hostPath(entity.get(Attributes.HOMEDIRECTORY)[0]))
+        if not home.is_dir():
+            raise RuntimeError("home folder {home} does not exist".format(home = home))
+        shutil.rmtree(str(home))
+        return 1
+
+    def _mail(self, entity):
+        """
+        @brief _mail Returns the path of the mail spool of the user.
+
+        @param entity The Entity of the user
+        @return Returns the Path of the mail spool
+        """
+        name = entity.get(Attributes.USERNAME)[0]
+        return Path(self.hostPath(self._mail_spool.rstrip("/") + "/" + name))
+
+    def _create_mail(self, entity):
+        """
+        @brief _create_mail Creates the mail spool of the user, if the spool folder exists.
+
+        @param entity The Entity of the user
+        """
+        mail = self._mail(entity)
+        if not mail.parent.is_dir() or mail.exists():
+            return
+        mail.touch(0o660)
+        if os.geteuid() == 0:
+            os.chown(str(mail), entity.get(Attributes.UIDNUMBER)[0],
+                    entity.get(Attributes.GIDNUMBER)[0])
+
+    def removeMail(self, entity): # @Override
+        """
+        @brief removeMail Removes the mail spool of the user.
+
+        @param entity The Entity of the user
+        @return Returns 1 if success
+        """
+        mail = self._mail(entity)
+        if mail.exists():
+            mail.unlink()
+        return 1
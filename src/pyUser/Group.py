@@ -1,8 +1,8 @@
 
 import os
-import libuser
 import time
 
+from . import Attributes
 from .BaseUser import BaseUser
 from .BaseGroup import BaseGroup
 
@@ -25,35 +25,32 @@ class Group(BaseGroup):
             self._admin = None
             self._members = None
         else:
-            self._name = group.get(libuser.GROUPNAME)[0]
-            self._gid = group.get(libuser.GIDNUMBER)[0]
-            self._admin = group.get(libuser.ADMINISTRATORNAME)
-            self._members = group.get(libuser.MEMBERNAME)
+            self._name = group.get(Attributes.GROUPNAME)[0]
+            self._gid = group.get(Attributes.GIDNUMBER)[0]
+            self._admin = group.get(Attributes.ADMINISTRATORNAME)
+            self._members = group.get(Attributes.MEMBERNAME)
+        self._entity = group
 
     @classmethod
     def create(cls, name, members = None):
         """
-        @brief create Create a new system group with the given name and home directory.
-
-        Uses the system-default if no home or loginshell is provided.
+        @brief create Create a new system group with the given name and members.
 
         @param name The name of the group to be created
-        @param home The home folder path for the group
-        @param loginshell The loginshell for the group
-        @param create_home Set to True if a home folder should be created
+        @param members The user names or User instances to add to the group
         @return Returns the Group instance representing the system group
         """
-        group = cls.init(name)
-        if members:
-            if len(members) > 0:
-                _members
-                for member in [value for value in members if isinstance(value, str)]:
-                    members.append(member)
-                for member in [value for value in members if isinstance(value, BaseUser)]:
-                    members.append(member.get_name())
-                group[libuser.MEMBERNAME] = _members
-        if cls.add(group):
-            return cls(group)
+        with cls._writing():
+            group = cls.init(name)
+            if members:
+                _members = []
+                for member in members:
+                    if isinstance(member, BaseUser):
+                        member = member.get_name()
+                    _members.append(member)
+                group[Attributes.MEMBERNAME] = _members
+            if cls.add(group):
+                return cls(group)
         return None
 
     def delete(self):
@@ -62,19 +59,25 @@ class Group(BaseGroup):
 
         @return Returns True if success
         """
-        group = self._by_id(self._gid)
-        return super().delete(group)
+        group = self._get_entity()
+        if not group:
+            return False
+        result = super().delete(group)
+        self._entity = None
+        return result
 
     def update(self):
         """
         @brief update Update the content of the system group
 
+        A copy of the libuser .Entity the group was built from is written, call
+        refresh first if the system entry might have changed in the meantime.
         @return Returns True if success
         """
-        group = self._by_id(self._gid)
-        group[libuser.GROUPNAME] = self._name
-        group[libuser.MEMBERNAME] = self._members
-        return super().modify(group)
+        group = self._writable()
+        group[Attributes.GROUPNAME] = self._name
+        group[Attributes.MEMBERNAME] = self._members
+        return self._written(group, super().modify(group))
 
     def add_member(self, user):
         """
@@ -83,12 +86,71 @@ class Group(BaseGroup):
         @param user The user to add to the group
         @return Returns True if success
         """
-        group = self._by_id(self._gid)
         if isinstance(user, BaseUser):
             user = user.get_name()
         self._members.append(user)
         return self.update()
 
+    def add_members(self, users):
+        """
+        @brief add_members Adds the users not yet in the Group with a single write.
+
+        @param users The user names or User instances to add
+        @return Returns True if success
+        """
+        members = set(self._members)
+        added = []
+        for name in self._names(users):
+            if name not in members:
+                members.add(name)
+                added.append(name)
+        if not added:
+            return True
+        self._members = self._members + added
+        return self.update()
+
+    def remove_members(self, users):
+        """
+        @brief remove_members Removes the users from the Group with a single write.
+
+        @param users The user names or User instances to remove
+        @return Returns True if success
+        """
+        removed = set(self._names(users))
+        members = [member for member in self._members if member not in removed]
+        if len(members) == len(self._members):
+            return True
+        self._members = members
+        return self.update()
+
+    def set_members(self, users):
+        """
+        @brief set_members Replaces the members of the Group with a single write.
+
+        @param users The user names or User instances of the new members
+        @return Returns True if success
+        """
+        members = self._names(users)
+        if members == self._members:
+            return True
+        self._members = members
+        return self.update()
+
+    @staticmethod
+    def _names(users):
+        """
+        @brief _names Returns the user names in order without duplicates.
+
+        @param users The user names or User instances
+        @return Returns the list of user names
+        """
+        names = {}
+        for user in users:
+            if isinstance(user, BaseUser):
+                user = user.get_name()
+            names.setdefault(user, None)
+        return list(names)
+
     def get_user_names(self):
         """
         @brief get_user_names Returns the names of the system users that
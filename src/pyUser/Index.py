@@ -0,0 +1,127 @@
+import os
+import re
+import threading
+
+ENTRY = re.compile(rb"^([^:\n]*)(?::[^:\n]*:([^:\n]*))?", re.M)
+
+class Index:
+    """
+    @brief Index Read-only hash index of an account file like passwd or group.
+
+    The file is read into memory and indexed by name and by the numeric id in
+    the third field once. Lookups are answered from the index and only decode
+    the matching line. The index is rebuilt when the inode, the modification
+    time or the size of the file changes, e.g. because it was replaced by a
+    rename. A copy is kept rather than a mapping of the file, which would
+    fault with SIGBUS if the file was truncated in place.
+    """
+
+    def __init__(self, path):
+        """
+        @brief __init__ Constructor taking the path of the account file.
+
+        @param path The path of the account file
+        """
+        self._path = str(path)
+        self._stat = ()
+        self._data = b""
+        self._names = {}
+        self._ids = {}
+        self._max_ids = {}
+        self._lock = threading.Lock()
+
+    def by_name(self, name):
+        """
+        @brief by_name Returns the line of the entry with the given name.
+
+        @param name The name of the entry
+        @return Returns the line without line break or None
+        """
+        with self._lock:
+            self._refresh()
+            return self._line(self._names.get(name.encode()))
+
+    def by_id(self, id):
+        """
+        @brief by_id Returns the line of the first entry with the given id.
+
+        @param id The numeric id of the entry
+        @return Returns the line without line break or None
+        """
+        try:
+            id = int(id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            self._refresh()
+            return self._line(self._ids.get(id))
+
+    def max_id(self, limit = None):
+        """
+        @brief max_id Returns the highest numeric id in the file.
+
+        @param limit Ids larger than the limit are ignored, None for no limit
+        @return Returns the id or None if the file has no entries
+        """
+        with self._lock:
+            self._refresh()
+            if limit not in self._max_ids:
+                self._max_ids[limit] = max((id for id in self._ids
+                        if limit is None or id <= limit), default = None)
+            return self._max_ids[limit]
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._names)
+
+    def _line(self, offset):
+        """
+        @brief _line Decodes the line starting at the offset, the lock must be held.
+
+        @param offset The offset of the line in the file or None
+        @return Returns the line without line break or None
+        """
+        if offset is None:
+            return None
+        end = self._data.find(b"\n", offset)
+        if end < 0:
+            end = len(self._data)
+        return self._data[offset:end].decode()
+
+    def _refresh(self):
+        """
+        @brief _refresh Rebuilds the index if the file changed, the lock must be held.
+        """
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            stat = None
+        key = None if stat is None else (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._stat:
+            return
+        self._data = b""
+        self._names = {}
+        self._ids = {}
+        self._max_ids = {}
+        self._stat = key
+        if stat is None:
+            return
+        try:
+            with open(self._path, "rb") as file:
+                stat = os.fstat(file.fileno())
+                self._data = file.read()
+        except FileNotFoundError:
+            self._stat = None
+            return
+        self._stat = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        names = self._names
+        ids = self._ids
+        for match in ENTRY.finditer(self._data):
+            name, id = match.group(1, 2)
+            if not name:
+                continue
+            offset = match.start()
+            names.setdefault(name, offset)
+            if id and id.isdigit():
+                ids.setdefault(int(id), offset)
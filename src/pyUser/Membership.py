@@ -0,0 +1,92 @@
+import threading
+
+class Membership:
+    """
+    @brief Membership Inverted index of the group memberships of users.
+
+    Maps every user name to the names of the groups listing it as member and
+    every group name to its id and members, so the groups of a user are
+    found without scanning all groups. Groups sharing an id are kept apart.
+    """
+
+    def __init__(self):
+        """
+        @brief __init__ Constructor creating an empty index.
+        """
+        self._groups = {}
+        self._users = {}
+        self._gids = {}
+        self._lock = threading.Lock()
+
+    def set_group(self, name, gid, members):
+        """
+        @brief set_group Adds or replaces the group in the index.
+
+        @param name The name of the group
+        @param gid The id of the group
+        @param members The names of the members of the group
+        """
+        with self._lock:
+            self._remove(name)
+            self._groups[name] = (gid, list(members))
+            self._gids.setdefault(gid, []).append(name)
+            for member in members:
+                self._users.setdefault(member, set()).add(name)
+
+    def remove_group(self, name):
+        """
+        @brief remove_group Removes the group from the index.
+
+        @param name The name of the group
+        """
+        with self._lock:
+            self._remove(name)
+
+    def has_group(self, name):
+        """
+        @brief has_group Returns True if the group is in the index.
+
+        @param name The name of the group
+        """
+        with self._lock:
+            return name in self._groups
+
+    def group_names(self, user, gid = None):
+        """
+        @brief group_names Returns the names of the groups of the user.
+
+        @param user The name of the user
+        @param gid The primary group id of the user, listed first
+        @return Returns a list of group names
+        """
+        with self._lock:
+            names = set(self._users.get(user, ()))
+            result = []
+            if self._gids.get(gid):
+                result.append(self._gids[gid][0])
+                names.discard(result[0])
+            groups = self._groups
+            result += sorted(names, key = lambda name: (groups[name][0], name))
+            return result
+
+    def _remove(self, name):
+        """
+        @brief _remove Removes the group from the index, the lock must be held.
+
+        @param name The name of the group
+        """
+        entry = self._groups.pop(name, None)
+        if entry is None:
+            return
+        gid, members = entry
+        names = self._gids.get(gid)
+        if names is not None:
+            names.remove(name)
+            if not names:
+                del self._gids[gid]
+        for member in members:
+            groups = self._users.get(member)
+            if groups is not None:
+                groups.discard(name)
+                if not groups:
+                    del self._users[member]
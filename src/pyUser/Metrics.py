@@ -0,0 +1,171 @@
+import time
+import bisect
+import threading
+
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Operation:
+    """
+    @brief _Operation The counters of a single backend operation.
+    """
+
+    __slots__ = ("calls", "errors", "seconds", "buckets")
+
+    def __init__(self, size):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (size + 1)
+
+class _Proxy:
+    """
+    @brief _Proxy Wraps a backend and reports the duration of every method call.
+    """
+
+    def __init__(self, backend, metrics):
+        self._backend = backend
+        self._metrics = metrics
+        self._methods = {}
+
+    def __getattr__(self, name):
+        method = self._methods.get(name)
+        if method is not None:
+            return method
+        value = getattr(self._backend, name)
+        if not callable(value):
+            return value
+        record = self._metrics.record
+
+        def method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = value(*args, **kwargs)
+            except BaseException as exception:
+                record(name, time.perf_counter() - start, exception)
+                raise
+            record(name, time.perf_counter() - start)
+            return result
+
+        self._methods[name] = method
+        return method
+
+class Metrics:
+    """
+    @brief Metrics Counts the calls, errors and latencies of backend calls.
+
+    Set with set_metrics, every method called on the backend is timed and
+    recorded under its name, e.g. "lookupUserByName". Without metrics set
+    the backend is called directly.
+    """
+
+    def __init__(self, callback = None, buckets = BUCKETS):
+        """
+        @brief __init__ Constructor taking the optional callback.
+
+        @param callback Called with the operation, the duration in seconds and
+        the raised exception or None after every backend call
+        @param buckets The upper bounds of the latency histogram in seconds
+        """
+        self._callback = callback
+        self._buckets = tuple(sorted(buckets))
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, backend):
+        """
+        @brief wrap Returns the timing proxy of the backend.
+
+        @param backend The backend
+        @return Returns the proxy
+        """
+        return _Proxy(backend, self)
+
+    def record(self, operation, seconds, error = None):
+        """
+        @brief record Records a single backend call.
+
+        @param operation The name of the operation
+        @param seconds The duration of the call
+        @param error The raised exception or None
+        """
+        bucket = bisect.bisect_left(self._buckets, seconds)
+        with self._lock:
+            counters = self._operations.get(operation)
+            if counters is None:
+                counters = self._operations[operation] = _Operation(len(self._buckets))
+            counters.calls += 1
+            counters.seconds += seconds
+            counters.buckets[bucket] += 1
+            if error is not None:
+                counters.errors += 1
+        if self._callback is not None:
+            self._callback(operation, seconds, error)
+
+    def stats(self):
+        """
+        @brief stats Returns the counters of all operations.
+
+        @return Returns a dict mapping the operations to dicts with the number
+        of "calls" and "errors", the total "seconds" and the "buckets", a list
+        of the upper bound and the cumulative number of calls per bucket
+        """
+        with self._lock:
+            result = {}
+            for operation, counters in sorted(self._operations.items()):
+                total = 0
+                buckets = []
+                for bound, count in zip(self._buckets + (float("inf"),), counters.buckets):
+                    total += count
+                    buckets.append((bound, total))
+                result[operation] = {
+                    "calls": counters.calls,
+                    "errors": counters.errors,
+                    "seconds": counters.seconds,
+                    "buckets": buckets,
+                }
+            return result
+
+    def reset(self):
+        """
+        @brief reset Drops all recorded calls.
+        """
+        with self._lock:
+            self._operations = {}
+
+    def prometheus(self, prefix = "pyuser_backend"):
+        """
+        @brief prometheus Returns the counters in the Prometheus text format.
+
+        @param prefix The prefix of the metric names
+        @return Returns the text
+        """
+        stats = self.stats()
+        lines = [
+            "# HELP {prefix}_calls_total Backend calls by operation.".format(prefix = prefix),
+            "# TYPE {prefix}_calls_total counter".format(prefix = prefix),
+        ]
+        for operation, values in stats.items():
+            lines.append('{prefix}_calls_total{{operation="{operation}"}} {calls}'.format(
+                    prefix = prefix, operation = operation, calls = values["calls"]))
+        lines += [
+            "# HELP {prefix}_errors_total Failed backend calls by operation.".format(prefix = prefix),
+            "# TYPE {prefix}_errors_total counter".format(prefix = prefix),
+        ]
+        for operation, values in stats.items():
+            lines.append('{prefix}_errors_total{{operation="{operation}"}} {errors}'.format(
+                    prefix = prefix, operation = operation, errors = values["errors"]))
+        lines += [
+            "# HELP {prefix}_seconds Latency of backend calls by operation.".format(prefix = prefix),
+            "# TYPE {prefix}_seconds histogram".format(prefix = prefix),
+        ]
+        for operation, values in stats.items():
+            for bound, count in values["buckets"]:
+                bound = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('{prefix}_seconds_bucket{{operation="{operation}",le="{bound}"}} {count}'
+                        .format(prefix = prefix, operation = operation, bound = bound, count = count))
+            lines.append('{prefix}_seconds_sum{{operation="{operation}"}} {seconds!r}'.format(
+                    prefix = prefix, operation = operation, seconds = values["seconds"]))
+            lines.append('{prefix}_seconds_count{{operation="{operation}"}} {calls}'.format(
+                    prefix = prefix, operation = operation, calls = values["calls"]))
+        return "\n".join(lines) + "\n"
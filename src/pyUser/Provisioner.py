@@ -0,0 +1,251 @@
+import os
+import stat
+import fcntl
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Attributes
+from .Admin import Admin
+
+FICLONE = 0x40049409
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class Skeleton:
+    """
+    @brief Skeleton The scanned content of a skeleton folder.
+
+    The folder is walked once, copying it into a home folder then only
+    creates the folders and copies the files without listing or stat
+    calls on the skeleton.
+    """
+
+    def __init__(self, path):
+        """
+        @brief __init__ Constructor scanning the skeleton folder.
+
+        @param path The path of the skeleton folder on the host
+        """
+        self.path = str(path)
+        self.entries = []
+        if not os.path.isdir(self.path):
+            return
+        for folder, folders, files in os.walk(self.path):
+            relative = os.path.relpath(folder, self.path)
+            for name in sorted(folders + files):
+                source = os.path.join(folder, name)
+                info = os.lstat(source)
+                target = os.readlink(source) if stat.S_ISLNK(info.st_mode) else None
+                self.entries.append((os.path.normpath(os.path.join(relative, name)),
+                        source, stat.S_IFMT(info.st_mode), stat.S_IMODE(info.st_mode), target))
+            folders.sort()
+
+    def copy(self, home, uid = None, gid = None):
+        """
+        @brief copy Creates the home folder with the content of the skeleton.
+
+        @param home The path of the home folder on the host, must not exist
+        @param uid The owner of the copied files, None to keep the current user
+        @param gid The group of the copied files
+        """
+        os.mkdir(home, 0o700)
+        os.chmod(home, 0o700)
+        if uid is not None:
+            os.lchown(home, uid, gid)
+        folders = []
+        for relative, source, kind, mode, target in self.entries:
+            destination = os.path.join(home, relative)
+            if kind == stat.S_IFDIR:
+                os.mkdir(destination, 0o700)
+                folders.append((destination, mode))
+            elif kind == stat.S_IFLNK:
+                os.symlink(target, destination)
+            elif kind == stat.S_IFREG:
+                _copy_file(source, destination, mode)
+            else:
+                continue
+            if uid is not None:
+                os.lchown(destination, uid, gid)
+        for destination, mode in reversed(folders):
+            os.chmod(destination, mode)
+
+def _copy_file(source, destination, mode):
+    """
+    @brief _copy_file Copies a regular file, sharing its blocks if the file
+    system supports reflinks and copying in the kernel otherwise.
+
+    @param source The path of the file to copy
+    @param destination The path of the new file
+    @param mode The permissions of the new file
+    """
+    reader = os.open(source, os.O_RDONLY)
+    try:
+        writer = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            _copy_data(reader, writer)
+        finally:
+            os.close(writer)
+    finally:
+        os.close(reader)
+    os.chmod(destination, mode)
+
+def _copy_data(reader, writer):
+    """
+    @brief _copy_data Copies the content of one file descriptor to another.
+
+    @param reader The file descriptor to read
+    @param writer The file descriptor to write
+    """
+    try:
+        fcntl.ioctl(writer, FICLONE, reader)
+        return
+    except OSError:
+        pass
+    if hasattr(os, "copy_file_range"):
+        try:
+            while os.copy_file_range(reader, writer, 1 << 30) > 0:
+                pass
+            return
+        except OSError:
+            pass
+    while True:
+        data = os.read(reader, 1 << 16)
+        if not data:
+            return
+        os.write(writer, data)
+
+class Provisioner:
+    """
+    @brief Provisioner Creates home folders of users in a thread pool.
+
+    The skeleton folder is scanned once and copied into the home folders
+    concurrently. Each home folder is reported with its own status, which is
+    one of PENDING, RUNNING, DONE or FAILED.
+    """
+
+    def __init__(self, workers = 8, skeleton = "/etc/skel"):
+        """
+        @brief __init__ Constructor taking the number of threads.
+
+        @param workers The number of home folders created concurrently
+        @param skeleton The path of the skeleton folder
+        """
+        self._skeleton = Skeleton(Admin._host_path(skeleton))
+        self._executor = ThreadPoolExecutor(max_workers = workers,
+                thread_name_prefix = "pyUser-home")
+        self._status = {}
+        self._errors = {}
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.shutdown()
+        return False
+
+    def provision(self, users, wait = False):
+        """
+        @brief provision Creates the home folders of the users.
+
+        @param users The User instances or libuser .Entity objects
+        @param wait Set to True to return after all home folders were created
+        @return Returns a dict mapping the user names to their status
+        """
+        jobs = []
+        with self._lock:
+            for user in users:
+                entity = user._get_entity() if hasattr(user, "_get_entity") else user
+                name = entity.get(Attributes.USERNAME)[0]
+                self._status[name] = PENDING
+                self._errors.pop(name, None)
+                jobs.append((name, entity))
+        futures = [self._executor.submit(self._provision, name, entity) for name, entity in jobs]
+        with self._lock:
+            self._futures = [future for future in self._futures if not future.done()] + futures
+        if wait:
+            for future in futures:
+                future.result()
+        return {name: self.status(name) for name, entity in jobs}
+
+    def status(self, name):
+        """
+        @brief status Returns the status of the home folder of the user.
+
+        @param name The name of the user
+        @return Returns the status or None if the user was not provisioned
+        """
+        with self._lock:
+            return self._status.get(name)
+
+    def error(self, name):
+        """
+        @brief error Returns the exception raised creating the home folder.
+
+        @param name The name of the user
+        @return Returns the exception or None
+        """
+        with self._lock:
+            return self._errors.get(name)
+
+    def statuses(self):
+        """
+        @brief statuses Returns the status of all provisioned home folders.
+
+        @return Returns a dict mapping the user names to their status
+        """
+        with self._lock:
+            return dict(self._status)
+
+    def wait(self):
+        """
+        @brief wait Waits until all queued home folders are created.
+
+        @return Returns True if none failed
+        """
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.result()
+        with self._lock:
+            return FAILED not in self._status.values()
+
+    def shutdown(self, wait = True):
+        """
+        @brief shutdown Stops the threads.
+
+        @param wait Set to True to create the queued home folders first
+        """
+        self._executor.shutdown(wait = wait)
+
+    def _provision(self, name, entity):
+        """
+        @brief _provision Creates the home folder of a single user.
+
+        @param name The name of the user
+        @param entity The libuser .Entity of the user
+        """
+        with self._lock:
+            self._status[name] = RUNNING
+        try:
+            home = Admin._host_path(entity.get(Attributes.HOMEDIRECTORY)[0])
+            if os.path.lexists(home):
+                raise RuntimeError("home folder {home} already exists".format(home = home))
+            os.makedirs(os.path.dirname(home), exist_ok = True)
+            uid, gid = None, None
+            if os.geteuid() == 0:
+                uid = entity.get(Attributes.UIDNUMBER)[0]
+                gid = entity.get(Attributes.GIDNUMBER)[0]
+            self._skeleton.copy(home, uid, gid)
+            status, error = DONE, None
+        except Exception as exception:
+            status, error = FAILED, exception
+        with self._lock:
+            self._status[name] = status
+            if error is not None:
+                self._errors[name] = error
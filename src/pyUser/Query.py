@@ -0,0 +1,235 @@
+import sys
+import array
+import bisect
+
+from .Record import UserRecord, GroupRecord
+
+def _bounds(value):
+    """
+    @brief _bounds Returns the first and last id of a range.
+
+    @param value A range or a tuple of the first and last id, both included
+    @return Returns a tuple of the first and last id
+    """
+    if isinstance(value, range):
+        return (value.start, value.stop - 1)
+    first, last = value
+    return (first, last)
+
+class Table:
+    """
+    @brief Table Columnar, indexed copy of records for fast filtering.
+
+    Every attribute is stored in its own column. Equality predicates are
+    answered from hash indexes, ranges and prefixes from sorted indexes. A
+    query starts with the rows of the most selective indexed predicate and
+    checks the other predicates against the columns of these rows only.
+    """
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def _index(column):
+        """
+        @brief _index Returns a hash index of the column.
+
+        @param column The column
+        @return Returns a dict mapping the values to arrays of rows
+        """
+        index = {}
+        for row, value in enumerate(column):
+            rows = index.get(value)
+            if rows is None:
+                rows = index[value] = array.array("I")
+            rows.append(row)
+        return index
+
+    @staticmethod
+    def _sorted(column):
+        """
+        @brief _sorted Returns a sorted index of the column.
+
+        @param column The column
+        @return Returns a tuple of the sorted values and the rows in that order
+        """
+        order = sorted(range(len(column)), key = column.__getitem__)
+        return ([column[row] for row in order], array.array("I", order))
+
+    @staticmethod
+    def _range(index, first, last):
+        """
+        @brief _range Returns the rows with values between first and last.
+
+        @param index The sorted index
+        @param first The smallest value, included
+        @param last The largest value, included
+        @return Returns the rows
+        """
+        values, order = index
+        return order[bisect.bisect_left(values, first):bisect.bisect_right(values, last)]
+
+    @staticmethod
+    def _prefix(index, prefix):
+        """
+        @brief _prefix Returns the rows with values starting with the prefix.
+
+        @param index The sorted index
+        @param prefix The prefix
+        @return Returns the rows
+        """
+        values, order = index
+        start = bisect.bisect_left(values, prefix)
+        end = bisect.bisect_left(values, prefix + chr(sys.maxunicode), start)
+        return order[start:end]
+
+    @staticmethod
+    def _select(candidates, checks):
+        """
+        @brief _select Returns the rows matching all predicates.
+
+        @param candidates The rows of each indexed predicate
+        @param checks Functions testing a row, one per predicate
+        @return Returns the matching rows in file order
+        """
+        if not candidates:
+            return []
+        candidates = sorted(candidates, key = len)
+        rows = candidates[0]
+        if len(candidates) > 1:
+            rows = [row for row in rows if all(check(row) for check in checks)]
+        return sorted(rows)
+
+class UserTable(Table):
+    """
+    @brief UserTable Columnar index of users by name, uid, gid, home and shell.
+    """
+
+    def __init__(self, records):
+        """
+        @brief __init__ Constructor building the columns and indexes.
+
+        @param records The UserRecord instances
+        """
+        self._names = [record._name for record in records]
+        self._uids = array.array("q", (record._uid for record in records))
+        self._gids = array.array("q", (record._gid for record in records))
+        self._homes = [sys.intern(record._home or "") for record in records]
+        self._shells = [record._loginshell or "" for record in records]
+        self._by_uid = self._sorted(self._uids)
+        self._by_gid = self._index(self._gids)
+        self._by_shell = self._index(self._shells)
+        self._by_home = self._sorted(self._homes)
+        self._by_name = self._sorted(self._names)
+
+    def record(self, row):
+        """
+        @brief record Returns the record of the row.
+
+        @param row The row
+        @return Returns the UserRecord
+        """
+        return UserRecord(self._names[row], self._uids[row], self._gids[row],
+                self._homes[row], self._shells[row])
+
+    def name(self, row):
+        return self._names[row]
+
+    def select(self, shell = None, uid_range = None, home_prefix = None, gid = None,
+            name_prefix = None):
+        """
+        @brief select Returns the rows of the users matching all given predicates.
+
+        @param shell The login shell
+        @param uid_range A range or a tuple of the first and last uid
+        @param home_prefix The start of the home folder path
+        @param gid The primary gid
+        @param name_prefix The start of the user name
+        @return Returns the list of rows
+        """
+        candidates, checks = [], []
+        if shell is not None:
+            candidates.append(self._by_shell.get(shell, ()))
+            checks.append(lambda row: self._shells[row] == shell)
+        if gid is not None:
+            candidates.append(self._by_gid.get(int(gid), ()))
+            checks.append(lambda row: self._gids[row] == int(gid))
+        if uid_range is not None:
+            first, last = _bounds(uid_range)
+            candidates.append(self._range(self._by_uid, first, last))
+            checks.append(lambda row: first <= self._uids[row] <= last)
+        if home_prefix is not None:
+            candidates.append(self._prefix(self._by_home, home_prefix))
+            checks.append(lambda row: self._homes[row].startswith(home_prefix))
+        if name_prefix is not None:
+            candidates.append(self._prefix(self._by_name, name_prefix))
+            checks.append(lambda row: self._names[row].startswith(name_prefix))
+        if not candidates:
+            return list(range(len(self._names)))
+        return self._select(candidates, checks)
+
+class GroupTable(Table):
+    """
+    @brief GroupTable Columnar index of groups by name, gid and members.
+    """
+
+    def __init__(self, records):
+        """
+        @brief __init__ Constructor building the columns and indexes.
+
+        @param records The GroupRecord instances
+        """
+        self._names = [record._name for record in records]
+        self._gids = array.array("q", (record._gid for record in records))
+        self._admins = [record._admin for record in records]
+        self._members = [record._members for record in records]
+        self._by_gid = self._sorted(self._gids)
+        self._by_name = self._sorted(self._names)
+        self._by_member = {}
+        for row, members in enumerate(self._members):
+            for member in members:
+                rows = self._by_member.get(member)
+                if rows is None:
+                    rows = self._by_member[member] = array.array("I")
+                rows.append(row)
+
+    def record(self, row):
+        """
+        @brief record Returns the record of the row.
+
+        @param row The row
+        @return Returns the GroupRecord
+        """
+        return GroupRecord(self._names[row], self._gids[row], self._admins[row],
+                self._members[row])
+
+    def name(self, row):
+        return self._names[row]
+
+    def select(self, gid = None, gid_range = None, name_prefix = None, member = None):
+        """
+        @brief select Returns the rows of the groups matching all given predicates.
+
+        @param gid The gid
+        @param gid_range A range or a tuple of the first and last gid
+        @param name_prefix The start of the group name
+        @param member The name of a member
+        @return Returns the list of rows
+        """
+        candidates, checks = [], []
+        if gid is not None:
+            candidates.append(self._range(self._by_gid, int(gid), int(gid)))
+            checks.append(lambda row: self._gids[row] == int(gid))
+        if gid_range is not None:
+            first, last = _bounds(gid_range)
+            candidates.append(self._range(self._by_gid, first, last))
+            checks.append(lambda row: first <= self._gids[row] <= last)
+        if name_prefix is not None:
+            candidates.append(self._prefix(self._by_name, name_prefix))
+            checks.append(lambda row: self._names[row].startswith(name_prefix))
+        if member is not None:
+            candidates.append(self._by_member.get(member, ()))
+            checks.append(lambda row: member in self._members[row])
+        if not candidates:
+            return list(range(len(self._names)))
+        return self._select(candidates, checks)
@@ -0,0 +1,201 @@
+import time
+
+from .User import User
+from .Group import Group
+from .Batch import Batch
+
+USER_ATTRIBUTES = {"home": "_home", "loginshell": "_loginshell"}
+GROUP_ATTRIBUTES = {"members": "_members"}
+
+class Change:
+    """
+    @brief Change A single change of a Plan.
+    """
+
+    def __init__(self, action, kind, name, values = None, entry = None):
+        """
+        @brief __init__ Constructor taking the description of the change.
+
+        @param action The action, one of "create", "update" or "delete"
+        @param kind The kind of the entry, "user" or "group"
+        @param name The name of the user or group
+        @param values A dict mapping the attribute names to tuples of the old
+        and the new value
+        @param entry The existing User or Group instance
+        """
+        self.action = action
+        self.kind = kind
+        self.name = name
+        self.values = values or {}
+        self.entry = entry
+
+    def __str__(self):
+        sign = {"create": "+", "update": "~", "delete": "-"}[self.action]
+        values = []
+        for attribute, (old, new) in self.values.items():
+            if self.action == "create":
+                values.append("{attribute}={new}".format(attribute = attribute, new = new))
+            else:
+                values.append("{attribute}: {old} -> {new}".format(
+                        attribute = attribute, old = old, new = new))
+        return " ".join([sign, self.kind, self.name] + values)
+
+class Plan:
+    """
+    @brief Plan The minimal changes to bring the system to a desired state.
+
+    Created by plan, applied with apply using a Batch.
+    """
+
+    def __init__(self, changes, seconds):
+        """
+        @brief __init__ Constructor taking the planned changes.
+
+        @param changes The list of Change instances
+        @param seconds The time it took to compute the plan
+        """
+        self.changes = changes
+        self.plan_seconds = seconds
+        self.apply_seconds = None
+        self.results = None
+
+    def __len__(self):
+        return len(self.changes)
+
+    def print(self):
+        """
+        @brief print Print the planned changes, e.g. for a dry run.
+        """
+        for change in self.changes:
+            print(change)
+        print("{count} changes planned in {seconds:.3f}s".format(
+                count = len(self.changes), seconds = self.plan_seconds))
+
+    def apply(self, create_home = True):
+        """
+        @brief apply Writes the planned changes with a single Batch.
+
+        @param create_home Set to True to create the home folders of new users
+        @return Returns the list of BatchResult instances
+        """
+        start = time.perf_counter()
+        changes = Batch()
+        for change in self.changes:
+            values = {attribute: new for attribute, (old, new) in change.values.items()}
+            if change.action == "delete":
+                changes.delete(change.entry)
+            elif change.kind == "user" and change.action == "create":
+                changes.create_user(change.name, values.get("home"),
+                        values.get("loginshell"), create_home)
+            elif change.kind == "group" and change.action == "create":
+                changes.create_group(change.name, values.get("members"))
+            else:
+                attributes = USER_ATTRIBUTES if change.kind == "user" else GROUP_ATTRIBUTES
+                for attribute, value in values.items():
+                    setattr(change.entry, attributes[attribute], value)
+                changes.update(change.entry)
+        self.results = changes.commit()
+        self.apply_seconds = time.perf_counter() - start
+        return self.results
+
+def _compare(entry, desired, attributes):
+    """
+    @brief _compare Returns the attributes of the entry differing from the desired ones.
+
+    Lists are compared ignoring their order.
+
+    @param entry The User or Group instance
+    @param desired A dict of the desired attribute values
+    @param attributes A dict mapping attribute names to instance attributes
+    @return Returns a dict mapping attribute names to old and new values
+    """
+    result = {}
+    for attribute, value in desired.items():
+        if attribute not in attributes:
+            raise Exception("Unknown attribute '{attribute}'".format(attribute = attribute))
+        current = getattr(entry, attributes[attribute])
+        if isinstance(value, (list, tuple, set)):
+            if set(current or ()) != set(value):
+                result[attribute] = (current, list(value))
+        elif current != value:
+            result[attribute] = (current, value)
+    return result
+
+def _plan(kind, current, desired, attributes, prune, min_id, max_id):
+    """
+    @brief _plan Returns the changes of one kind of entries.
+
+    @param kind The kind of the entries, "user" or "group"
+    @param current The existing User or Group instances
+    @param desired A dict mapping names to dicts of desired attribute values
+    @param attributes A dict mapping attribute names to instance attributes
+    @param prune Set to True to delete entries not in desired
+    @param min_id Entries with smaller ids are never deleted
+    @param max_id Entries with larger ids are never deleted
+    @return Returns a list of Change instances
+    """
+    changes = []
+    existing = {entry.get_name(): entry for entry in current}
+    for name, values in desired.items():
+        values = values or {}
+        entry = existing.get(name)
+        if entry is None:
+            for attribute in values:
+                if attribute not in attributes:
+                    raise Exception("Unknown attribute '{attribute}'".format(attribute = attribute))
+            changes.append(Change("create", kind, name,
+                    {attribute: (None, value) for attribute, value in values.items()}))
+            continue
+        difference = _compare(entry, values, attributes)
+        if difference:
+            changes.append(Change("update", kind, name, difference, entry))
+    if prune:
+        for name, entry in existing.items():
+            if name not in desired and min_id <= entry.get_id() <= max_id:
+                changes.append(Change("delete", kind, name, entry = entry))
+    return changes
+
+def plan(users = None, groups = None, prune = False, min_id = 1000, max_id = 60000):
+    """
+    @brief plan Computes the changes needed to reach the desired users and groups.
+
+    Users are described by dicts with "home" and "loginshell", groups by dicts
+    with "members". Attributes not given are left untouched.
+
+    @param users A dict mapping user names to dicts of desired attributes
+    @param groups A dict mapping group names to dicts of desired attributes
+    @param prune Set to True to delete users and groups not listed
+    @param min_id Users and groups with smaller ids are never deleted
+    @param max_id Users and groups with larger ids, like nobody, are never deleted
+    @return Returns the Plan
+    """
+    start = time.perf_counter()
+    changes = []
+    if groups is not None:
+        changes += _plan("group", Group.list(), groups, GROUP_ATTRIBUTES, prune, min_id,
+                max_id)
+    if users is not None:
+        changes += _plan("user", User.list(), users, USER_ATTRIBUTES, prune, min_id,
+                max_id)
+    return Plan(changes, time.perf_counter() - start)
+
+def reconcile(users = None, groups = None, prune = False, min_id = 1000, max_id = 60000,
+        dry_run = False, create_home = True):
+    """
+    @brief reconcile Brings the system to the desired users and groups.
+
+    @param users A dict mapping user names to dicts of desired attributes
+    @param groups A dict mapping group names to dicts of desired attributes
+    @param prune Set to True to delete users and groups not listed
+    @param min_id Users and groups with smaller ids are never deleted
+    @param max_id Users and groups with larger ids, like nobody, are never deleted
+    @param dry_run Set to True to print the plan without applying it
+    @param create_home Set to True to create the home folders of new users
+    @return Returns the Plan
+    """
+    result = plan(users, groups, prune, min_id, max_id)
+    if dry_run:
+        result.print()
+    else:
+        result.apply(create_home)
+    return result
@@ -0,0 +1,193 @@
+import sys
+
+from . import Attributes
+
+class Record:
+    """
+    @brief Record Basic implementation of compact, read-only account records.
+
+    Records keep the attributes in slots instead of a per-instance dict and
+    hold no reference to the libuser .Entity, so large directories can be
+    kept in memory cheaply.
+    """
+    __slots__ = ()
+
+    def print(self):
+        """
+        @biref print Print the content of the instance
+        """
+        print({entry: getattr(self, "_" + entry) for entry in self._fields()})
+
+    @classmethod
+    def _fields(cls):
+        """
+        @brief _fields Returns the names of the attributes without leading underscore.
+
+        @return Returns a list of attribute names
+        """
+        return [slot[1:] for slot in cls.__slots__]
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, slot) for slot in self.__slots__))
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+    def __repr__(self):
+        return "{type}({values})".format(type = type(self).__name__, values = ", ".join(
+                repr(getattr(self, slot)) for slot in self.__slots__))
+
+class UserRecord(Record):
+    """
+    @brief UserRecord Compact record of a system user.
+    """
+    __slots__ = ("_name", "_uid", "_gid", "_home", "_loginshell")
+
+    def __init__(self, name, uid, gid, home, loginshell):
+        """
+        @brief __init__ Constructor taking the attributes of the user.
+        """
+        self._name = name
+        self._uid = uid
+        self._gid = gid
+        self._home = home
+        self._loginshell = None if loginshell is None else sys.intern(loginshell)
+
+    @classmethod
+    def from_entity(cls, user):
+        """
+        @brief from_entity Creates the record from the libuser .Entity of the user.
+
+        @param user The libuser .Entity instance representing the system user
+        @return Returns the UserRecord
+        """
+        if user is None:
+            return cls(None, None, None, None, None)
+        return cls(user.get(Attributes.USERNAME)[0], user.get(Attributes.UIDNUMBER)[0],
+                user.get(Attributes.GIDNUMBER)[0], user.get(Attributes.HOMEDIRECTORY)[0],
+                user.get(Attributes.LOGINSHELL)[0])
+
+    def get_name(self):
+        """
+        @brief get_name Returns the name of the User.
+
+        @return Returns the name of the user
+        """
+        return self._name
+
+    def get_id(self):
+        """
+        @brief get_id Returns the uid of the User.
+
+        @return Returns the uid of the user
+        """
+        return self._uid
+
+    def get_gid(self):
+        """
+        @brief get_gid Returns the primary group id of the User.
+
+        @return Returns the gid of the user
+        """
+        return self._gid
+
+    def get_home(self):
+        """
+        @brief get_home Returns the home folder of the User.
+
+        @return Returns the home folder path of the user
+        """
+        return self._home
+
+    def get_loginshell(self):
+        """
+        @brief get_loginshell Returns the loginshell of the User.
+
+        @return Returns the loginshell of the user
+        """
+        return self._loginshell
+
+    def is_valid(self):
+        """
+        @brief is_valid Returns True if the user is valid.
+
+        @return Returns True if the user instance is valid
+        """
+        return self._name is not None and self._uid is not None
+
+class GroupRecord(Record):
+    """
+    @brief GroupRecord Compact record of a system group.
+    """
+    __slots__ = ("_name", "_gid", "_admin", "_members")
+
+    def __init__(self, name, gid, admin, members):
+        """
+        @brief __init__ Constructor taking the attributes of the group.
+        """
+        self._name = name
+        self._gid = gid
+        self._admin = None if admin is None else tuple(admin)
+        self._members = None if members is None else tuple(members)
+
+    @classmethod
+    def from_entity(cls, group):
+        """
+        @brief from_entity Creates the record from the libuser .Entity of the group.
+
+        @param group The libuser .Entity instance representing the system group
+        @return Returns the GroupRecord
+        """
+        if group is None:
+            return cls(None, None, None, None)
+        return cls(group.get(Attributes.GROUPNAME)[0], group.get(Attributes.GIDNUMBER)[0],
+                group.get(Attributes.ADMINISTRATORNAME), group.get(Attributes.MEMBERNAME))
+
+    def get_name(self):
+        """
+        @brief get_name Returns the name of the Group.
+
+        @return Returns the name of the group
+        """
+        return self._name
+
+    def get_id(self):
+        """
+        @brief get_id Returns the id of the Group.
+
+        @return Returns the id of the group
+        """
+        return self._gid
+
+    def get_admin(self):
+        """
+        @brief get_admin Returns the administrators of the Group.
+
+        @return Returns a tuple of user names
+        """
+        return self._admin
+
+    def get_members(self):
+        """
+        @brief get_members Returns the members of the Group.
+
+        @return Returns a tuple of user names
+        """
+        return self._members
+
+    def is_valid(self):
+        """
+        @brief is_valid Returns True if the group is valid.
+
+        @return Returns True if the group instance is valid
+        """
+        return self._name is not None and self._gid is not None
@@ -0,0 +1,292 @@
+import sys
+import mmap
+import array
+import struct
+
+from .Record import UserRecord, GroupRecord
+from .BaseUser import BaseUser
+from .BaseGroup import BaseGroup
+
+MAGIC = b"PYUSNAP\x01"
+HEADER = struct.Struct("<8s8I")
+LITTLE = 1
+BIG = 2
+
+def _pad(size):
+    """
+    @brief _pad Returns the size rounded up to a multiple of eight.
+
+    @param size The size in bytes
+    @return Returns the padded size
+    """
+    return (size + 7) & ~7
+
+class Snapshot:
+    """
+    @brief Snapshot Compact, columnar copy of all users and groups.
+
+    The snapshot is stored as a table of unique strings followed by integer
+    columns referencing it: name, uid, gid, home and loginshell of the users
+    and name, gid, members and administrators of the groups. Loading a saved
+    snapshot maps the file and only parses the header, the columns are read
+    in place and the strings are decoded on access.
+    """
+
+    def __init__(self, buffer, file = None):
+        """
+        @brief __init__ Constructor taking the serialized snapshot.
+
+        @param buffer The bytes or mmap holding the snapshot
+        @param file The mapped file to close with the snapshot
+        """
+        self._buffer = buffer
+        self._file = file
+        magic, version, order, strings, users, groups, members, admins, blob = \
+                HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != 1:
+            raise Exception("Not a pyUser snapshot")
+        self._swap = order != (LITTLE if sys.byteorder == "little" else BIG)
+        self._user_count = users
+        self._group_count = groups
+        self._strings = {}
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self._offsets, offset = self._column(view, offset, "I", strings + 1)
+        self._blob = view[offset:offset + blob]
+        offset += _pad(blob)
+        self._user_name, offset = self._column(view, offset, "I", users)
+        self._user_uid, offset = self._column(view, offset, "q", users)
+        self._user_gid, offset = self._column(view, offset, "q", users)
+        self._user_home, offset = self._column(view, offset, "I", users)
+        self._user_shell, offset = self._column(view, offset, "I", users)
+        self._group_name, offset = self._column(view, offset, "I", groups)
+        self._group_gid, offset = self._column(view, offset, "q", groups)
+        self._group_members, offset = self._column(view, offset, "I", groups + 1)
+        self._group_admins, offset = self._column(view, offset, "I", groups + 1)
+        self._members, offset = self._column(view, offset, "I", members)
+        self._admins, offset = self._column(view, offset, "I", admins)
+
+    def _column(self, view, offset, typecode, count):
+        """
+        @brief _column Returns the integer column at the offset.
+
+        The column is a view on the buffer unless the byte order differs.
+
+        @param view The memoryview of the buffer
+        @param offset The offset of the column
+        @param typecode The array typecode of the column, "I" or "q"
+        @param count The number of entries of the column
+        @return Returns the column and the offset of the next column
+        """
+        size = array.array(typecode).itemsize * count
+        column = view[offset:offset + size]
+        if self._swap:
+            column = array.array(typecode, column.tobytes())
+            column.byteswap()
+        else:
+            column = column.cast(typecode)
+        return column, offset + _pad(size)
+
+    @classmethod
+    def capture(cls):
+        """
+        @brief capture Takes a snapshot of all users and groups of the system.
+
+        @return Returns the Snapshot
+        """
+        users = [UserRecord.from_entity(user) for user in BaseUser._enumerate_full('*')]
+        groups = [GroupRecord.from_entity(group) for group in BaseGroup._enumerate_full('*')]
+        return cls.from_records(users, groups)
+
+    @classmethod
+    def from_records(cls, users, groups):
+        """
+        @brief from_records Creates the snapshot of the given records.
+
+        @param users The UserRecord instances
+        @param groups The GroupRecord instances
+        @return Returns the Snapshot
+        """
+        strings = {}
+
+        def intern(value):
+            return strings.setdefault("" if value is None else value, len(strings))
+
+        user_name = array.array("I", (intern(user._name) for user in users))
+        user_uid = array.array("q", (user._uid for user in users))
+        user_gid = array.array("q", (user._gid for user in users))
+        user_home = array.array("I", (intern(user._home) for user in users))
+        user_shell = array.array("I", (intern(user._loginshell) for user in users))
+        group_name = array.array("I", (intern(group._name) for group in groups))
+        group_gid = array.array("q", (group._gid for group in groups))
+        group_members = array.array("I", [0])
+        group_admins = array.array("I", [0])
+        members = array.array("I")
+        admins = array.array("I")
+        for group in groups:
+            members.extend(intern(member) for member in group._members or ())
+            admins.extend(intern(admin) for admin in group._admin or ())
+            group_members.append(len(members))
+            group_admins.append(len(admins))
+
+        offsets = array.array("I", [0])
+        blob = bytearray()
+        for value in strings:
+            blob += value.encode()
+            offsets.append(len(blob))
+
+        order = LITTLE if sys.byteorder == "little" else BIG
+        parts = [HEADER.pack(MAGIC, 1, order, len(strings), len(users), len(groups),
+                len(members), len(admins), len(blob))]
+        for part in (offsets, bytes(blob), user_name, user_uid, user_gid, user_home,
+                user_shell, group_name, group_gid, group_members, group_admins,
+                members, admins):
+            data = part if isinstance(part, bytes) else part.tobytes()
+            parts.append(data + b"\0" * (_pad(len(data)) - len(data)))
+        return cls(b"".join(parts))
+
+    @classmethod
+    def load(cls, path):
+        """
+        @brief load Maps a saved snapshot.
+
+        @param path The path of the snapshot file
+        @return Returns the Snapshot
+        """
+        with open(str(path), "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        return cls(buffer, buffer)
+
+    def save(self, path):
+        """
+        @brief save Writes the snapshot to the file.
+
+        @param path The path of the snapshot file
+        """
+        with open(str(path), "wb") as file:
+            file.write(self._buffer)
+
+    def close(self):
+        """
+        @brief close Releases the mapped file of a loaded snapshot.
+        """
+        if self._file is not None:
+            for name, value in list(vars(self).items()):
+                if isinstance(value, memoryview):
+                    value.release()
+            self._strings = {}
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+        return False
+
+    def _string(self, index):
+        """
+        @brief _string Returns the string of the string table.
+
+        @param index The index of the string
+        @return Returns the decoded string
+        """
+        value = self._strings.get(index)
+        if value is None:
+            value = bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode()
+            self._strings[index] = value
+        return value
+
+    def user_count(self):
+        """
+        @brief user_count Returns the number of users.
+        """
+        return self._user_count
+
+    def group_count(self):
+        """
+        @brief group_count Returns the number of groups.
+        """
+        return self._group_count
+
+    def user(self, index):
+        """
+        @brief user Returns the record of the user at the index.
+
+        @param index The index of the user
+        @return Returns the UserRecord
+        """
+        return UserRecord(self._string(self._user_name[index]), self._user_uid[index],
+                self._user_gid[index], self._string(self._user_home[index]),
+                self._string(self._user_shell[index]))
+
+    def group(self, index):
+        """
+        @brief group Returns the record of the group at the index.
+
+        @param index The index of the group
+        @return Returns the GroupRecord
+        """
+        members = self._members[self._group_members[index]:self._group_members[index + 1]]
+        admins = self._admins[self._group_admins[index]:self._group_admins[index + 1]]
+        return GroupRecord(self._string(self._group_name[index]), self._group_gid[index],
+                [self._string(admin) for admin in admins],
+                [self._string(member) for member in members])
+
+    def users(self):
+        """
+        @brief users Returns the records of all users.
+
+        @return Returns a list of UserRecord instances
+        """
+        return [self.user(index) for index in range(self._user_count)]
+
+    def groups(self):
+        """
+        @brief groups Returns the records of all groups.
+
+        @return Returns a list of GroupRecord instances
+        """
+        return [self.group(index) for index in range(self._group_count)]
+
+    def diff(self, other):
+        """
+        @brief diff Compares the snapshot with another one.
+
+        @param other The Snapshot to compare with, e.g. an older one
+        @return Returns a dict with the keys "users" and "groups", each holding
+        the lists of added, removed and changed names relative to other
+        """
+        return {
+            "users": self._diff(other.users(), self.users()),
+            "groups": self._diff(other.groups(), self.groups()),
+        }
+
+    @staticmethod
+    def _diff(before, after):
+        """
+        @brief _diff Compares two lists of records by name.
+
+        @param before The records before
+        @param after The records after
+        @return Returns a tuple of the lists of added, removed and changed names
+        """
+        before = {record.get_name(): record for record in before}
+        after = {record.get_name(): record for record in after}
+        added = [name for name in after if name not in before]
+        removed = [name for name in before if name not in after]
+        changed = [name for name in after if name in before and after[name] != before[name]]
+        return (added, removed, changed)
+
+def snapshot(path = None):
+    """
+    @brief snapshot Takes a snapshot of all users and groups of the system.
+
+    @param path If set, the snapshot is written to this file
+    @return Returns the Snapshot
+    """
+    result = Snapshot.capture()
+    if path is not None:
+        result.save(path)
+    return result
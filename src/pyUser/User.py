@@ -1,9 +1,11 @@
 import os
-import libuser
 import time
 
 from pathlib import Path
+from . import Attributes
 from .BaseUser import BaseUser
+from .Group import Group
+from .Cleaner import Cleaner
 
 class User(BaseUser):
     """
@@ -24,10 +26,11 @@ class User(BaseUser):
             self._home = None
             self._loginshell = None
         else:
-            super().__init__(user.get(libuser.USERNAME)[0], user.get(libuser.UIDNUMBER)[0])
-            self._gid = user.get(libuser.GIDNUMBER)[0]
-            self._home = user.get(libuser.HOMEDIRECTORY)[0]
-            self._loginshell = user.get(libuser.LOGINSHELL)[0]
+            super().__init__(user.get(Attributes.USERNAME)[0], user.get(Attributes.UIDNUMBER)[0])
+            self._gid = user.get(Attributes.GIDNUMBER)[0]
+            self._home = user.get(Attributes.HOMEDIRECTORY)[0]
+            self._loginshell = user.get(Attributes.LOGINSHELL)[0]
+        self._entity = user
 
     @classmethod
     def create(cls, name, home = None, loginshell = None, create_home = True):
@@ -42,30 +45,137 @@ class User(BaseUser):
         @param create_home Set to True if a home folder should be created
         @return Returns the User instance representing the system user
         """
+        with cls._writing():
+            user = cls._new(name, home, loginshell)
+            if cls.add(user, create_home = create_home) > 0:
+                return cls(cls._by_name(name))
+        return None
+
+    @classmethod
+    def create_many(cls, users, writes = None):
+        """
+        @brief create_many Create several new system users with a single write,
+        if the backend supports it.
+
+        The new users get distinct ids, the home folders are created after
+        the users were written.
+
+        @param users Tuples of the name, home folder path, loginshell and
+        create_home arguments of create
+        @param writes A list the number of backend writes adding the users
+        is appended to
+        @return Returns a dict mapping the names to the User instance or the
+        raised exception
+        """
+        result = {}
+        with cls._writing():
+            allocator = cls._ALLOCATOR
+            values = []
+            homes = []
+            taken = set()
+            for name, home, loginshell, create_home in users:
+                try:
+                    value = cls._new(name, home, loginshell)
+                    cls._assign_id(value, cls._free_id(value, taken))
+                except Exception as exception:
+                    result[name] = exception
+                    continue
+                id = int(value.get(Attributes.UIDNUMBER)[0])
+                taken.add(id)
+                if allocator is not None:
+                    allocator.reserve(id)
+                values.append(value)
+                homes.append(create_home)
+            outcomes = cls.add_many(values, create_home = False, writes = writes)
+            for value, create_home, outcome in zip(values, homes, outcomes):
+                name = value.get(Attributes.USERNAME)[0]
+                if outcome is not True:
+                    if allocator is not None:
+                        allocator.release(int(value.get(Attributes.UIDNUMBER)[0]))
+                    result[name] = outcome if outcome else RuntimeError(
+                            "adding {name} failed".format(name = name))
+                    continue
+                try:
+                    if create_home and not cls._create_home(value):
+                        result[name] = RuntimeError("creating home for {name} failed"
+                                .format(name = name))
+                        continue
+                    result[name] = cls(cls._by_name(name))
+                except Exception as exception:
+                    result[name] = exception
+        return result
+
+    @classmethod
+    def _new(cls, name, home, loginshell):
+        """
+        @brief _new Returns a new libuser .Entity for the user.
+
+        @param name The name of the user
+        @param home The home folder path or None for the default
+        @param loginshell The loginshell or None for the default
+        @return Returns the libuser .Entity
+        """
         user = cls.init(name)
         if home:
-            user[libuser.HOMEDIRECTORY] = home
+            user[Attributes.HOMEDIRECTORY] = home
         if loginshell:
-            user[libuser.LOGINSHELL] = loginshell
-        if cls.add(user, create_home = create_home) > 0:
-            return cls(cls._by_name(name))
-        return None
+            user[Attributes.LOGINSHELL] = loginshell
+        return user
+
+    @classmethod
+    def _free_id(cls, value, taken):
+        """
+        @brief _free_id Returns the first uid from the one of the new entity
+        on, that is neither in use nor taken by another new user.
+
+        @param value The new libuser .Entity
+        @param taken The uids of the other new users
+        @return Returns the uid
+        """
+        allocator = cls._ALLOCATOR
+        id = int(value.get(Attributes.UIDNUMBER)[0])
+        while id in taken or (not allocator.is_free(id) if allocator is not None
+                else cls._lookup_id(id) is not None):
+            id += 1
+        return id
 
-    def delete(self): # @Override
+    def delete(self, deferred = False): # @Override
         """
         @brief delete Delete the user.
 
+        With deferred removal the home folder is moved to the trash before the
+        account is deleted, and moved back if deleting fails. The home folder
+        and the mail spool are removed in the background, see Cleaner. A home
+        folder that cannot be moved is removed in place.
+
+        @param deferred True to use the default Cleaner, a Cleaner instance,
+        or False to remove the home folder and mail spool before returning
         @return Returns True if success
         """
         if not self.is_valid():
             return
-        user = self._by_id(self._uid)
+        user = self._get_entity()
         if not user:
             return
+        home = Path(self._host_path(self._home))
+        if deferred:
+            cleaner = deferred if isinstance(deferred, Cleaner) else Cleaner.default()
+            path = cleaner.move(self._name, str(home))
+            result = False
+            try:
+                result = super().delete(user)
+            finally:
+                if not result:
+                    cleaner.restore(path, str(home))
+            if result:
+                cleaner.queue(user, path)
+            self._entity = None
+            return result
         result = super().delete(user)
-        if Path(self._home).exists() and Path(self._home).is_dir():
+        if home.exists() and home.is_dir():
             result = result and super()._remove_home(user)
         result = result and super()._remove_mail(user)
+        self._entity = None
         return result
 
     def remove_home(self):
@@ -74,8 +184,7 @@ class User(BaseUser):
 
         @return Returns True of success
         """
-        user = self._by_id(self._uid)
-        return super()._remove_home(user)
+        return super()._remove_home(self._get_entity())
 
     def create_home(self):
         """
@@ -85,8 +194,7 @@ class User(BaseUser):
         """
         if self.has_home():
             self.remove_home()
-        user = self._by_id(self._uid)
-        return super()._create_home(user)
+        return super()._create_home(self._get_entity())
 
     def has_home(self):
         """
@@ -94,20 +202,108 @@ class User(BaseUser):
 
         @return Returns True if the user has a home directory
         """
-        return self.is_valid() and Path(self._home).exists() and Path(self._home).is_dir()
+        if not self.is_valid():
+            return False
+        home = Path(self._host_path(self._home))
+        return home.exists() and home.is_dir()
+
+    def get_group_names(self):
+        """
+        @brief get_group_names Returns the names of the groups the user is part of.
+
+        Includes the primary group, which is listed first. Served from the
+        membership index of Group, see Group.reset_membership.
+
+        @return Returns a list of group names
+        """
+        if not self.is_valid():
+            return []
+        return Group.get_group_names_of(self._name, self._gid)
+
+    def get_groups(self):
+        """
+        @brief get_groups Returns the groups the user is part of.
+
+        @return Returns a list of Group instances
+        """
+        return [Group.by_name(name) for name in self.get_group_names()]
 
     def update(self):
         """
         @brief update Update the user properties.
 
         This includes username, homedirectory, and loginshell.
+        A copy of the libuser .Entity the user was built from is written, call
+        refresh first if the system entry might have changed in the meantime.
         @return Returns True if success
         """
-        user = self._by_id(self._uid)
-        user[libuser.USERNAME] = self._name
-        user[libuser.HOMEDIRECTORY] = self._home
-        user[libuser.LOGINSHELL] = self._loginshell
-        return super().modify(user)
+        user = self._writable()
+        user[Attributes.USERNAME] = self._name
+        user[Attributes.HOMEDIRECTORY] = self._home
+        user[Attributes.LOGINSHELL] = self._loginshell
+        return self._written(user, super().modify(user))
+
+    @classmethod
+    def bulk_update(cls, selector = None, home = None, loginshell = None):
+        """
+        @brief bulk_update Changes the home folder path or loginshell of many
+        users with a single write.
+
+        The new values are computed for all selected users first, only users
+        with a changed value are written. The home folders are not moved. The
+        values are set on copies of the entities, which the users take over
+        once the write succeeded.
+
+        @param selector None for all users, a dict of predicates for query, a
+        function returning True for the User instances to change or an iterable
+        of user names and User instances
+        @param home The new home folder path or a function returning it for a User
+        @param loginshell The new loginshell or a function returning it for a User
+        @return Returns a dict with the number of "changed" and "unchanged"
+        users, the number of "missing" users that do not exist and the number
+        of users whose write "failed"
+        """
+        if selector is None:
+            users = cls.list()
+        elif isinstance(selector, dict):
+            users = cls.query(**selector)
+        elif callable(selector):
+            users = [user for user in cls.list() if selector(user)]
+        else:
+            users = [user if isinstance(user, BaseUser) else cls.by_name(user)
+                    for user in selector]
+        changed = []
+        missing = 0
+        for user in users:
+            if not user.is_valid():
+                missing += 1
+                continue
+            values = {}
+            if home is not None:
+                values[Attributes.HOMEDIRECTORY] = home(user) if callable(home) else home
+            if loginshell is not None:
+                values[Attributes.LOGINSHELL] = \
+                        loginshell(user) if callable(loginshell) else loginshell
+            if values.get(Attributes.HOMEDIRECTORY, user._home) == user._home and \
+                    values.get(Attributes.LOGINSHELL, user._loginshell) == user._loginshell:
+                continue
+            entity = user._writable()
+            if entity is None:
+                missing += 1
+                continue
+            for attribute, value in values.items():
+                entity[attribute] = value
+            changed.append((user, entity, values))
+        unchanged = len(users) - len(changed) - missing
+        if changed and not cls.modify_many(entity for user, entity, values in changed):
+            return {"changed": 0, "unchanged": unchanged, "missing": missing,
+                    "failed": len(changed)}
+        for user, entity, values in changed:
+            user._written(entity, True)
+            user._home = values.get(Attributes.HOMEDIRECTORY, user._home)
+            user._loginshell = values.get(Attributes.LOGINSHELL, user._loginshell)
+        return {"changed": len(changed), "unchanged": unchanged, "missing": missing,
+                "failed": 0}
 
     @staticmethod
     def is_valid(user):
@@ -0,0 +1,339 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from . import Attributes
+from .Admin import Admin
+from .Record import UserRecord, GroupRecord
+from .User import User
+from .Group import Group
+
+USER_FILES = ("passwd", "shadow")
+GROUP_FILES = ("group", "gshadow")
+
+USER_ATTRIBUTES = (Attributes.USERNAME, Attributes.UIDNUMBER, Attributes.GIDNUMBER,
+        Attributes.GECOS, Attributes.HOMEDIRECTORY, Attributes.LOGINSHELL,
+        Attributes.SHADOWPASSWORD, Attributes.SHADOWLASTCHANGE, Attributes.SHADOWMIN,
+        Attributes.SHADOWMAX, Attributes.SHADOWWARNING, Attributes.SHADOWINACTIVE,
+        Attributes.SHADOWEXPIRE, Attributes.SHADOWFLAG)
+GROUP_ATTRIBUTES = (Attributes.GROUPNAME, Attributes.GIDNUMBER, Attributes.GROUPPASSWORD,
+        Attributes.MEMBERNAME, Attributes.ADMINISTRATORNAME)
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+EVENT = struct.Struct("iIII")
+POLL = 0.1
+
+class Event:
+    """
+    @brief Event A user or group that was added, removed or modified.
+    """
+
+    def __init__(self, kind, action, name, before = None, after = None):
+        """
+        @brief __init__ Constructor taking the description of the change.
+
+        @param kind The kind of the entry, "user" or "group"
+        @param action The action, one of "added", "removed" or "modified"
+        @param name The name of the user or group
+        @param before The record before the change, None if added
+        @param after The record after the change, None if removed
+        """
+        self.kind = kind
+        self.action = action
+        self.name = name
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return "Event({kind!r}, {action!r}, {name!r})".format(
+                kind = self.kind, action = self.action, name = self.name)
+
+class _Inotify:
+    """
+    @brief _Inotify Minimal inotify binding using ctypes.
+    """
+
+    def __init__(self, directories):
+        """
+        @brief __init__ Watches the given directories for changed files.
+
+        Raises OSError if inotify is not available.
+
+        @param directories The directories to watch
+        """
+        name = ctypes.util.find_library("c")
+        libc = ctypes.CDLL(name, use_errno = True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        for directory in directories:
+            if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+                error = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(error, "inotify_add_watch failed for '{directory}'"
+                        .format(directory = directory))
+
+    def read(self, timeout):
+        """
+        @brief read Waits for events and returns the names of the changed files.
+
+        @param timeout The maximum number of seconds to wait
+        @return Returns a set of file names, None if events were lost
+        """
+        names = set()
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return names
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                names = None
+            elif names is not None:
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+class Watcher:
+    """
+    @brief Watcher Reports users and groups changed outside of this process.
+
+    The account files are watched with inotify, or polled for changes of their
+    modification time if inotify is not available. After a change the affected
+    database is parsed again and compared with the last parsed state, each
+    difference is reported as an Event. The cached lookups of User and Group
+    for the changed entries are dropped.
+    """
+
+    def __init__(self, callback = None, interval = 1.0, inotify = True, settle = 0.05):
+        """
+        @brief __init__ Constructor parsing the current state of the database.
+
+        @param callback Called with every Event when watching in the background
+        @param interval The maximum number of seconds between two checks
+        @param inotify Set to False to poll the modification times
+        @param settle The number of seconds to wait for related changes, e.g.
+        of passwd and shadow, to report them together
+        """
+        self._callback = callback
+        self._interval = interval
+        self._settle = settle
+        self._paths = {name: Admin._host_path("/etc/" + name)
+                for name in USER_FILES + GROUP_FILES}
+        self._inotify = None
+        if inotify:
+            try:
+                self._inotify = _Inotify(sorted({os.path.dirname(path)
+                        for path in self._paths.values()}))
+            except OSError:
+                self._inotify = None
+        self._stats = self._stat()
+        self._users = self._parse_users()
+        self._groups = self._parse_groups()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def uses_inotify(self):
+        """
+        @brief uses_inotify Returns True if inotify is used instead of polling.
+        """
+        return self._inotify is not None
+
+    def poll(self, timeout = 0):
+        """
+        @brief poll Waits for changes of the database and returns them.
+
+        @param timeout The maximum number of seconds to wait for a change
+        @return Returns the list of Event instances, empty if nothing changed
+        """
+        with self._lock:
+            changed = self._wait(timeout)
+            events = []
+            if changed & set(USER_FILES):
+                users = self._parse_users()
+                events += self._diff("user", self._users, users, UserRecord)
+                self._users = users
+            if changed & set(GROUP_FILES):
+                groups = self._parse_groups()
+                events += self._diff("group", self._groups, groups, GroupRecord)
+                self._groups = groups
+        self._invalidate(events)
+        return events
+
+    def start(self):
+        """
+        @brief start Starts watching in a background thread calling the callback.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target = self._run, name = "pyUser-watcher",
+                daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        @brief stop Stops the background thread, see start.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self):
+        """
+        @brief close Stops watching and releases the inotify instance.
+        """
+        self.stop()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+        return False
+
+    def _run(self):
+        """
+        @brief _run Body of the background thread.
+        """
+        while not self._stopped.is_set():
+            for event in self.poll(self._interval):
+                if self._callback is not None:
+                    self._callback(event)
+
+    def _wait(self, timeout):
+        """
+        @brief _wait Waits for changed account files.
+
+        @param timeout The maximum number of seconds to wait
+        @return Returns the set of changed file names
+        """
+        files = set(self._paths)
+        if self._inotify is not None:
+            names = self._inotify.read(timeout)
+            if names is not None and not names & files:
+                return set()
+            while names is not None:
+                more = self._inotify.read(self._settle)
+                if not more:
+                    break
+                names = None if more is None else names | more
+            self._stats = self._stat()
+            return files if names is None else names & files
+        stats = self._stat()
+        changed = {name for name in files if stats[name] != self._stats[name]}
+        while not changed and timeout > 0 and not self._stopped.is_set():
+            step = min(timeout, POLL)
+            self._stopped.wait(step)
+            timeout -= step
+            stats = self._stat()
+            changed = {name for name in files if stats[name] != self._stats[name]}
+        if changed and self._settle:
+            time.sleep(self._settle)
+            stats = self._stat()
+            changed = {name for name in files if stats[name] != self._stats[name]}
+        self._stats = stats
+        return changed
+
+    def _stat(self):
+        """
+        @brief _stat Returns the identity and modification time of the account files.
+
+        @return Returns a dict mapping the file names to tuples
+        """
+        result = {}
+        for name, path in self._paths.items():
+            try:
+                stat = os.stat(path)
+                result[name] = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                result[name] = None
+        return result
+
+    @staticmethod
+    def _parse(entities, attributes):
+        """
+        @brief _parse Returns the state of the entities by name.
+
+        @param entities The libuser .Entity instances
+        @param attributes The compared attributes
+        @return Returns a dict mapping names to tuples of the entity and the values
+        """
+        result = {}
+        for entity in entities:
+            values = tuple(tuple(entity.get(attribute)) for attribute in attributes)
+            result[values[0][0]] = (entity, values)
+        return result
+
+    def _parse_users(self):
+        return self._parse(User._enumerate_full('*'), USER_ATTRIBUTES)
+
+    def _parse_groups(self):
+        return self._parse(Group._enumerate_full('*'), GROUP_ATTRIBUTES)
+
+    @staticmethod
+    def _diff(kind, before, after, record):
+        """
+        @brief _diff Compares two parsed states.
+
+        @param kind The kind of the entries, "user" or "group"
+        @param before The state before
+        @param after The state after
+        @param record The record type describing the entries
+        @return Returns the list of Event instances
+        """
+        events = []
+        for name, (entity, values) in after.items():
+            if name not in before:
+                events.append(Event(kind, "added", name, None, record.from_entity(entity)))
+            elif before[name][1] != values:
+                events.append(Event(kind, "modified", name,
+                        record.from_entity(before[name][0]), record.from_entity(entity)))
+        for name, (entity, values) in before.items():
+            if name not in after:
+                events.append(Event(kind, "removed", name, record.from_entity(entity), None))
+        return events
+
+    @staticmethod
+    def _invalidate(events):
+        """
+        @brief _invalidate Drops the cached lookups of the changed entries.
+
+        @param events The Event instances
+        """
+        groups = False
+        for event in events:
+            type = User if event.kind == "user" else Group
+            for record in (event.before, event.after):
+                if record is not None:
+                    type._forget(record.get_name(), record.get_id())
+            groups = groups or event.kind == "group"
+        if groups:
+            Group.reset_membership()
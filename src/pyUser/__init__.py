@@ -1,2 +1,98 @@
-from .Group import Group
-from .User import User
+"""
+@brief pyUser Object-oriented API to manage system users and groups.
+
+The classes are imported on first access, so importing the package neither
+loads the submodules nor libuser.
+"""
+
+import sys
+import types
+import importlib
+
+_EXPORTS = {
+    "Group": ".Group",
+    "User": ".User",
+    "Batch": ".Batch",
+    "BatchResult": ".Batch",
+    "batch": ".Batch",
+    "Admin": ".Admin",
+    "Backend": ".Backend",
+    "Entity": ".Entity",
+    "FilesBackend": ".FilesBackend",
+    "Record": ".Record",
+    "UserRecord": ".Record",
+    "GroupRecord": ".Record",
+    "Snapshot": ".Snapshot",
+    "snapshot": ".Snapshot",
+    "Plan": ".Reconcile",
+    "plan": ".Reconcile",
+    "reconcile": ".Reconcile",
+    "Watcher": ".Watcher",
+    "Event": ".Watcher",
+    "Allocator": ".Allocator",
+    "Provisioner": ".Provisioner",
+    "Cleaner": ".Cleaner",
+    "Metrics": ".Metrics",
+}
+
+__all__ = list(_EXPORTS) + ["set_backend", "set_backend_factory", "set_metrics"]
+
+def set_backend(backend):
+    """
+    @brief set_backend Sets the backend used in this library.
+
+    @param backend The Backend implementation, None resets to the libuser admin
+    """
+    from .Admin import Admin
+    Admin.set_backend(backend)
+
+def set_backend_factory(factory):
+    """
+    @brief set_backend_factory Sets the factory creating a backend per thread.
+
+    @param factory Callable returning a new Backend, None for libuser.admin
+    """
+    from .Admin import Admin
+    Admin.set_backend_factory(factory)
+
+def set_metrics(metrics):
+    """
+    @brief set_metrics Sets the metrics recording the backend calls.
+
+    @param metrics The Metrics instance, None to stop recording
+    """
+    from .Admin import Admin
+    Admin.set_metrics(metrics)
+
+def __getattr__(name):
+    """
+    @brief __getattr__ Imports the exported class on first access.
+
+    @param name The name of the exported class
+    @return Returns the exported class
+    """
+    if name not in _EXPORTS:
+        raise AttributeError("module {module!r} has no attribute {name!r}"
+                .format(module = __name__, name = name))
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    object.__setattr__(sys.modules[__name__], name, value)
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+class _Package(types.ModuleType):
+    """
+    @brief _Package Module type of the package keeping the exported classes
+    in place of the submodules of the same name.
+
+    Importing a submodule binds it as attribute of the package, which would
+    shadow the class of the same name, e.g. pyUser.User.
+    """
+
+    def __setattr__(self, name, value):
+        if name in _EXPORTS and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
@@ -0,0 +1,237 @@
+"""
+@brief aio Coroutine API for users and groups.
+
+The blocking calls are run in a bounded thread pool, so the event loop is not
+blocked by file or network I/O of the backend. Reads run concurrently, writes
+are run one after another in the order they were issued.
+"""
+
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .User import User as _User
+from .Group import Group as _Group
+
+_READERS = None
+_WRITER = None
+_WORKERS = 8
+_LOCK = threading.Lock()
+
+def configure(max_workers = 8):
+    """
+    @brief configure Sets the number of threads running reads concurrently.
+
+    Takes effect for the executors created after the call, see shutdown.
+
+    @param max_workers The maximum number of concurrent reads
+    """
+    global _WORKERS
+    _WORKERS = max_workers
+
+def shutdown(wait = True):
+    """
+    @brief shutdown Shuts the executors down, they are recreated on next use.
+
+    @param wait Set to True to wait for pending calls to finish
+    """
+    global _READERS, _WRITER
+    with _LOCK:
+        readers, writer = _READERS, _WRITER
+        _READERS, _WRITER = None, None
+    for executor in (readers, writer):
+        if executor is not None:
+            executor.shutdown(wait = wait)
+
+def _executor(write):
+    """
+    @brief _executor Returns the executor for reads or for writes.
+
+    @param write True for the single threaded executor ordering the writes
+    @return Returns the executor
+    """
+    global _READERS, _WRITER
+    with _LOCK:
+        if write:
+            if _WRITER is None:
+                _WRITER = ThreadPoolExecutor(max_workers = 1,
+                        thread_name_prefix = "pyUser-write")
+            return _WRITER
+        if _READERS is None:
+            _READERS = ThreadPoolExecutor(max_workers = _WORKERS,
+                    thread_name_prefix = "pyUser-read")
+        return _READERS
+
+async def _run(write, function, *args, **kwargs):
+    """
+    @brief _run Runs the blocking function in the executor.
+
+    @param write True if the function writes to the backend
+    @param function The function to run
+    @return Returns the result of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(write), lambda: function(*args, **kwargs))
+
+class AsyncBase:
+    """
+    @brief AsyncBase Coroutine versions of the classmethods of Base.
+
+    Every coroutine returns the same result as the blocking classmethod of
+    the wrapped implementation type.
+    """
+
+    _TYPE = None
+
+    @classmethod
+    async def by_id(cls, id):
+        """
+        @brief by_id Returns the implementation type for the given libuser .Entity id.
+
+        @param id The id of the libuser .Entity
+        @return Returns the implementation type for the libuser .Entity
+        """
+        return await _run(False, cls._TYPE.by_id, id)
+
+    @classmethod
+    async def by_name(cls, name):
+        """
+        @brief by_name Returns the implementation type for the given libuser .Entity name.
+
+        @param name The name of the libuser .Entity
+        @return Returns the implementation type for the libuser .Entity
+        """
+        return await _run(False, cls._TYPE.by_name, name)
+
+    @classmethod
+    async def enumerate(cls, expr, full = True):
+        """
+        @brief enumerate enumerates all libuser .Entity instances matching
+        the given expression.
+
+        @param expr The expression to match
+        @param full Set to False to look up every matching name separately
+        @return Returns a list of matching implementation instances
+        """
+        return await _run(False, cls._TYPE.enumerate, expr, full)
+
+    @classmethod
+    async def list(cls):
+        """
+        @brief list returns a list of all libuser .Enitity instances
+
+        @return Returns the list of implementation instances
+        """
+        return await cls.enumerate('*')
+
+    @classmethod
+    async def iter_enumerate(cls, expr, chunk_size = 100, full = True):
+        """
+        @brief iter_enumerate Streams the instances matching the expression,
+        to be used with async for.
+
+        The instances are hydrated in chunks in the executor.
+
+        @param expr The expression to match
+        @param chunk_size The number of instances hydrated per executor call
+        @param full Set to False to look up every matching name separately
+        @return Returns an asynchronous generator of implementation instances
+        """
+        entries = cls._TYPE.iter_enumerate(expr, chunk_size, full)
+        while True:
+            chunk = await _run(False, next, entries, None)
+            if chunk is None:
+                return
+            for entry in chunk:
+                yield entry
+
+    @classmethod
+    async def add(cls, value, *args, **kwargs):
+        """
+        @brief add Add a libuser .Entity to the system.
+
+        @param value The libuser .Entity to be added to the system
+        @return Returns True if success
+        """
+        return await _run(True, cls._TYPE.add, value, *args, **kwargs)
+
+    @classmethod
+    async def delete(cls, value):
+        """
+        @brief delete Deletes a libuser .Entity from the system.
+
+        Instances of the implementation type are deleted with their delete
+        method, which removes the home folder and mail spool of users as well.
+
+        @param value The libuser .Entity or implementation instance to be deleted
+        @return Returns True if success
+        """
+        if isinstance(value, cls._TYPE):
+            return await _run(True, value.delete)
+        return await _run(True, super(cls._TYPE, cls._TYPE).delete, value)
+
+    @classmethod
+    async def modify(cls, value):
+        """
+        @brief modify Modifies a libuser .Entity instance.
+
+        @param value The libuser .Entity to be modified
+        @return Returns True if success
+        """
+        return await _run(True, cls._TYPE.modify, value)
+
+    @classmethod
+    async def lock(cls, value):
+        """
+        @brief lock Locks the given libuser .Entity.
+
+        @param value The libuser .Entity to be locked
+        @return Returns True if success
+        """
+        return await _run(True, cls._TYPE.lock, value)
+
+    @classmethod
+    async def unlock(cls, value):
+        """
+        @brief unlock Unlocks the given libuser .Entity.
+
+        @param value The libuser .Entity to be unlocked
+        @return Returns True if success
+        """
+        return await _run(True, cls._TYPE.unlock, value)
+
+    @classmethod
+    async def create(cls, name, *args, **kwargs):
+        """
+        @brief create Create a new system entry, see User.create and Group.create.
+
+        @param name The name of the entry to be created
+        @return Returns the implementation instance or None
+        """
+        return await _run(True, cls._TYPE.create, name, *args, **kwargs)
+
+    @classmethod
+    async def write(cls, function, *args, **kwargs):
+        """
+        @brief write Runs a blocking write, e.g. User.update, in order with the
+        other writes.
+
+        @param function The function to run
+        @return Returns the result of the function
+        """
+        return await _run(True, function, *args, **kwargs)
+
+class User(AsyncBase):
+    """
+    @brief User Coroutine API for system users.
+    """
+
+    _TYPE = _User
+
+class Group(AsyncBase):
+    """
+    @brief Group Coroutine API for system groups.
+    """
+
+    _TYPE = _Group
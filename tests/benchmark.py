@@ -0,0 +1,599 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import threading
+import subprocess
+import time
+import random
+import inspect
+import tempfile
+from pathlib import Path
+
+path = Path(__file__)
+path = str(Path(str(path).replace(str(path.name), "")).parent) + "/src/"
+sys.path.append(path)
+
+LIBUSER_CONF = """[defaults]
+modules = files shadow
+create_modules = files shadow
+crypt_style = sha512
+
+[userdefaults]
+LU_USERNAME = %n
+LU_UIDNUMBER = 1000
+LU_GIDNUMBER = %u
+LU_HOMEDIRECTORY = {directory}/home/%n
+LU_LOGINSHELL = /bin/bash
+
+[groupdefaults]
+LU_GROUPNAME = %n
+LU_GIDNUMBER = 1000
+
+[files]
+directory = {directory}/etc
+
+[shadow]
+directory = {directory}/etc
+"""
+
+def print_result(method, count, seconds, latencies = None):
+    """
+    @brief print_result Prints the result of a benchmark.
+
+    @param method The name of the benchmark
+    @param count The number of entries processed
+    @param seconds The time it took to process the entries
+    @param latencies A dict with the median "p50" and the 99th percentile
+    "p99" latency in seconds, printed if given
+    """
+    line = "Benchmark: '{method}' entries: {count} time: {seconds:.3f}s".format(
+            method = method, count = count, seconds = seconds)
+    if latencies is not None:
+        line += " p50: {p50:.3f}ms p99: {p99:.3f}ms".format(
+                p50 = latencies["p50"] * 1000, p99 = latencies["p99"] * 1000)
+    print(line)
+
+def write_database(directory, users, groups, seed = None, first_gid = 5000):
+    """
+    @brief write_database Writes a synthetic account database below the given root.
+
+    Every user is a member of its own group. Without seed every user joins
+    one of the shared groups in turn. With a seed every user joins one to
+    four of the shared groups picked with a skewed distribution, so a few
+    groups have thousands of members while most have only a few.
+
+    @param directory The root to write etc/passwd, shadow, group and gshadow to
+    @param users The number of users to create
+    @param groups The number of shared groups to create
+    @param seed The seed of the random membership or None
+    @param first_gid The gid of the first shared group
+    """
+    generator = random.Random(seed) if seed is not None else None
+    directory = Path(directory) / "etc"
+    directory.mkdir(parents = True, exist_ok = True)
+    members = [[] for _ in range(groups)]
+    with (directory / "passwd").open("w") as passwd, \
+            (directory / "shadow").open("w") as shadow:
+        for index in range(users):
+            name = "user{index}".format(index = index)
+            uid = 10000 + index
+            passwd.write("{name}:x:{uid}:{uid}::/home/{name}:/bin/bash\n"
+                    .format(name = name, uid = uid))
+            shadow.write("{name}:!:19000:0:99999:7:::\n".format(name = name))
+            if generator is None:
+                members[index % groups].append(name)
+                continue
+            joined = {int(groups * generator.random() ** 3) for _ in range(1 + index % 4)}
+            for group in sorted(joined):
+                members[group].append(name)
+    with (directory / "group").open("w") as group, \
+            (directory / "gshadow").open("w") as gshadow:
+        for index in range(users):
+            name = "user{index}".format(index = index)
+            group.write("{name}:x:{gid}:\n".format(name = name, gid = 10000 + index))
+            gshadow.write("{name}:!::\n".format(name = name))
+        for index in range(groups):
+            name = "group{index}".format(index = index)
+            group.write("{name}:x:{gid}:{members}\n".format(name = name,
+                    gid = first_gid + index, members = ",".join(members[index])))
+            gshadow.write("{name}:!::{members}\n".format(name = name,
+                    members = ",".join(members[index])))
+
+def setup(users, backend, groups = 100):
+    """
+    @brief setup Creates a synthetic database and points the backend at it.
+
+    Must be called before pyUser is imported, as libuser reads the
+    configuration when the admin instance is created.
+
+    @param users The number of users to create
+    @param backend The backend to use, "libuser", "files" or "files-scan"
+    @param groups The number of shared groups to create
+    @return Returns the temporary directory holding the database
+    """
+    directory = tempfile.TemporaryDirectory(prefix = "pyUser-bench-")
+    write_database(directory.name, users, groups)
+    if backend == "libuser":
+        config = Path(directory.name) / "libuser.conf"
+        config.write_text(LIBUSER_CONF.format(directory = directory.name))
+        os.environ["LIBUSER_CONF"] = str(config)
+    else:
+        from pyUser import FilesBackend, set_backend_factory
+        set_backend_factory(lambda: FilesBackend(directory.name,
+                index = backend != "files-scan"))
+    return directory
+
+def bench_enumerate(users):
+    """
+    @brief bench_enumerate Compares the per-name lookup enumeration against
+    the single pass enumeration of complete entities.
+
+    @param users The number of users in the database
+    """
+    from pyUser import User, Group
+
+    start = time.perf_counter()
+    result = User.enumerate("*", full = False)
+    print_result(inspect.stack()[0][3] + " users per-name", len(result),
+            time.perf_counter() - start)
+
+    start = time.perf_counter()
+    result = User.enumerate("*")
+    print_result(inspect.stack()[0][3] + " users full", len(result),
+            time.perf_counter() - start)
+
+    start = time.perf_counter()
+    result = Group.enumerate("*", full = False)
+    print_result(inspect.stack()[0][3] + " groups per-name", len(result),
+            time.perf_counter() - start)
+
+    start = time.perf_counter()
+    result = Group.enumerate("*")
+    print_result(inspect.stack()[0][3] + " groups full", len(result),
+            time.perf_counter() - start)
+
+def bench_threaded_lookup(users, count = 2000):
+    """
+    @brief bench_threaded_lookup Measures the throughput of User.by_name with
+    1, 2, 4 and 8 threads, each using its own backend instance.
+
+    @param users The number of users in the database
+    @param count The number of lookups per thread
+    """
+    from pyUser import User
+
+    for threads in (1, 2, 4, 8):
+        def lookup():
+            for _ in range(count):
+                User.by_name("user{index}".format(index = random.randrange(users)))
+
+        workers = [threading.Thread(target = lookup) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - start
+        print_result(inspect.stack()[0][3] + " threads {threads}".format(threads = threads),
+                threads * count, seconds)
+        print("    throughput: {rate:.0f} lookups/s".format(rate = threads * count / seconds))
+
+def bench_parallel_enumerate(users):
+    """
+    @brief bench_parallel_enumerate Measures the per-name enumeration in a pool
+    of 1, 2, 4 and 8 worker processes.
+
+    @param users The number of users in the database
+    """
+    from pyUser import User
+
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        result = User.parallel_enumerate("*", workers = workers)
+        print_result(inspect.stack()[0][3] + " workers {workers}".format(workers = workers),
+                len(result), time.perf_counter() - start)
+
+def bench_iter_enumerate(users):
+    """
+    @brief bench_iter_enumerate Measures the latency to the first result and the
+    peak memory of the lazy enumeration compared to the list based one.
+
+    @param users The number of users in the database
+    """
+    import tracemalloc
+    from pyUser import User
+
+    for name, full in (("full", True), ("per-name", False)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        first = None
+        count = 0
+        for user in User.iter_enumerate("*", full = full):
+            if first is None:
+                first = time.perf_counter() - start
+            count += 1
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print_result(inspect.stack()[0][3] + " " + name, count, seconds)
+        print("    first result: {first:.6f}s peak memory: {peak} KiB"
+                .format(first = first or 0, peak = peak // 1024))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = len(User.list())
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print_result(inspect.stack()[0][3] + " list", count, seconds)
+    print("    peak memory: {peak} KiB".format(peak = peak // 1024))
+
+def bench_lookup(users, count = 1000):
+    """
+    @brief bench_lookup Measures the lookups by name and by id.
+
+    @param users The number of users in the database
+    @param count The number of lookups
+    """
+    from pyUser import User
+
+    indexes = [random.randrange(users) for _ in range(count)]
+    start = time.perf_counter()
+    for index in indexes:
+        User.by_name("user{index}".format(index = index))
+    print_result(inspect.stack()[0][3] + " by_name", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for index in indexes:
+        User.by_id(10000 + index)
+    print_result(inspect.stack()[0][3] + " by_id", count, time.perf_counter() - start)
+
+def bench_records(users):
+    """
+    @brief bench_records Compares the memory held by User instances and by
+    compact UserRecord instances for all users.
+
+    @param users The number of users in the database
+    """
+    import gc
+    import tracemalloc
+    from pyUser import User
+
+    for name, create in (("User", User.list), ("UserRecord", User.records)):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = create()
+        seconds = time.perf_counter() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print_result(inspect.stack()[0][3] + " " + name, len(result), seconds)
+        print("    retained memory: {size} KiB, {per} bytes per entry".format(
+                size = size // 1024, per = size // max(len(result), 1)))
+        del result
+
+def bench_import(count = 20):
+    """
+    @brief bench_import Measures the time to start python and import the package
+    compared to starting python only.
+
+    @param count The number of interpreter starts
+    """
+    for name, script in (("python", "pass"),
+            ("import pyUser", "import sys; sys.path.append({path!r}); import pyUser"),
+            ("from pyUser import User", "import sys; sys.path.append({path!r}); "
+                "from pyUser import User")):
+        script = script.format(path = path)
+        start = time.perf_counter()
+        for _ in range(count):
+            subprocess.check_call([sys.executable, "-c", script])
+        print_result(inspect.stack()[0][3] + " " + name, count,
+                (time.perf_counter() - start) / count)
+
+def bench_snapshot(users, directory):
+    """
+    @brief bench_snapshot Measures taking, loading and reading a snapshot
+    compared to listing all users.
+
+    @param users The number of users in the database
+    @param directory The temporary directory to store the snapshot in
+    """
+    from pyUser import User, Snapshot, snapshot
+
+    path = str(Path(directory) / "snapshot")
+    start = time.perf_counter()
+    snapshot(path)
+    print_result(inspect.stack()[0][3] + " capture", users, time.perf_counter() - start)
+    start = time.perf_counter()
+    with Snapshot.load(path) as loaded:
+        print_result(inspect.stack()[0][3] + " load", loaded.user_count(),
+                time.perf_counter() - start)
+        start = time.perf_counter()
+        result = loaded.users()
+        print_result(inspect.stack()[0][3] + " users", len(result), time.perf_counter() - start)
+    start = time.perf_counter()
+    result = User.list()
+    print_result(inspect.stack()[0][3] + " User.list", len(result), time.perf_counter() - start)
+
+def bench_query(users, count = 100):
+    """
+    @brief bench_query Measures filtering users with the columnar index
+    compared to listing and filtering all users.
+
+    @param users The number of users in the database
+    @param count The number of queries per predicate
+    """
+    from pyUser import User
+
+    first = 10000 + users // 2
+    start = time.perf_counter()
+    matches = [user for user in User.list() if first <= user._uid < first + 1000]
+    print_result(inspect.stack()[0][3] + " list and filter", len(matches),
+            time.perf_counter() - start)
+    start = time.perf_counter()
+    User.query(records = True, uid_range = (0, -1))
+    print_result(inspect.stack()[0][3] + " build", users, time.perf_counter() - start)
+    for name, predicates in (("uid_range", {"uid_range": (first, first + 999)}),
+            ("home_prefix", {"home_prefix": "/home/user99"}),
+            ("shell and uid_range", {"shell": "/bin/bash", "uid_range": (first, first + 999)}),
+            ("name_prefix", {"name_prefix": "user1234"})):
+        start = time.perf_counter()
+        for _ in range(count):
+            matches = User.query(records = True, **predicates)
+        print_result(inspect.stack()[0][3] + " " + name + " x" + str(len(matches)), count,
+                time.perf_counter() - start)
+    start = time.perf_counter()
+    matches = User.query(uid_range = (first, first + 999))
+    print_result(inspect.stack()[0][3] + " uid_range instances", len(matches),
+            time.perf_counter() - start)
+
+def bench_watcher(users, count = 100):
+    """
+    @brief bench_watcher Measures checking for changes with the watcher
+    compared to listing all users.
+
+    @param users The number of users in the database
+    @param count The number of checks
+    """
+    from pyUser import User, Watcher
+
+    start = time.perf_counter()
+    with Watcher() as watcher:
+        print_result(inspect.stack()[0][3] + " start", users, time.perf_counter() - start)
+        start = time.perf_counter()
+        for _ in range(count):
+            watcher.poll()
+        print_result(inspect.stack()[0][3] + " poll", count, time.perf_counter() - start)
+    start = time.perf_counter()
+    User.list()
+    print_result(inspect.stack()[0][3] + " User.list", users, time.perf_counter() - start)
+
+def bench_allocator(users, count = 200):
+    """
+    @brief bench_allocator Measures creating users with ids picked by the
+    backend compared to the id allocator.
+
+    @param users The number of users in the database
+    @param count The number of users to create in each run
+    """
+    from pyUser import User
+
+    start = time.perf_counter()
+    for index in range(count):
+        User.create("backend{index}".format(index = index), create_home = False)
+    print_result(inspect.stack()[0][3] + " backend", count, time.perf_counter() - start)
+    start = time.perf_counter()
+    User.enable_allocator(1000, 1 << 31)
+    print_result(inspect.stack()[0][3] + " build", users, time.perf_counter() - start)
+    start = time.perf_counter()
+    for index in range(count):
+        User.create("allocator{index}".format(index = index), create_home = False)
+    print_result(inspect.stack()[0][3] + " allocator", count, time.perf_counter() - start)
+    User.disable_allocator()
+
+    # every other id in use, the worst case for a list of free ranges
+    from pyUser import Allocator
+    allocator = Allocator(range(1000, 1000 + 2 * users, 2), 1000, 1 << 31)
+    ids = [1000 + 2 * index for index in range(0, users, max(1, users // count))]
+    start = time.perf_counter()
+    for id in ids:
+        allocator.release(id)
+        allocator.allocate()
+    print_result(inspect.stack()[0][3] + " release/allocate", len(ids),
+            time.perf_counter() - start)
+
+def bench_provision(directory, count = 500, workers = 8):
+    """
+    @brief bench_provision Measures creating home folders one after another
+    compared to the provisioner.
+
+    Only run with the files backend, which creates the folders below the
+    temporary root.
+
+    @param directory The temporary root of the database
+    @param count The number of home folders to create in each run
+    @param workers The number of threads of the provisioner
+    """
+    from pyUser import User, Provisioner
+
+    skeleton = Path(directory) / "etc" / "skel"
+    for folder in ("", ".config", ".local/share"):
+        (skeleton / folder).mkdir(parents = True, exist_ok = True)
+        for index in range(4):
+            (skeleton / folder / "file{index}".format(index = index)).write_bytes(
+                    os.urandom(4096))
+    users = [User.by_name("user{index}".format(index = index)) for index in range(2 * count)]
+    start = time.perf_counter()
+    for user in users[:count]:
+        user.create_home()
+    print_result(inspect.stack()[0][3] + " create_home", count, time.perf_counter() - start)
+    start = time.perf_counter()
+    with Provisioner(workers) as provisioner:
+        provisioner.provision(users[count:], wait = True)
+    print_result(inspect.stack()[0][3] + " provisioner", count, time.perf_counter() - start)
+
+def bench_deferred_delete(directory, users, files = 5000):
+    """
+    @brief bench_deferred_delete Measures the latency of deleting a user with
+    a large home folder, removing it inline compared to in the background.
+
+    Only run with the files backend, which keeps the home folders below the
+    temporary root.
+
+    @param directory The temporary root of the database
+    @param users The number of users in the database
+    @param files The number of files in each home folder
+    """
+    from pyUser import User, Cleaner
+
+    names = ["user{index}".format(index = users - 1), "user{index}".format(index = users - 2)]
+    for name in names:
+        home = Path(directory) / "home" / name / "data"
+        home.mkdir(parents = True, exist_ok = True)
+        for index in range(files):
+            (home / str(index)).write_bytes(b"\0" * 1024)
+    start = time.perf_counter()
+    User.by_name(names[0]).delete()
+    print_result(inspect.stack()[0][3] + " inline", files, time.perf_counter() - start)
+    with Cleaner() as cleaner:
+        start = time.perf_counter()
+        User.by_name(names[1]).delete(deferred = cleaner)
+        print_result(inspect.stack()[0][3] + " deferred", files, time.perf_counter() - start)
+        cleaner.wait()
+        print_result(inspect.stack()[0][3] + " background", files, time.perf_counter() - start)
+
+def bench_add_members(users, count = 1000):
+    """
+    @brief bench_add_members Measures adding users to a group one by one
+    compared to adding them at once.
+
+    @param users The number of users in the database
+    @param count The number of users to add in each run
+    """
+    from pyUser import Group
+
+    count = min(count, users // 2)
+    names = ["user{index}".format(index = index) for index in range(2 * count)]
+    group = Group.by_name("group0")
+    start = time.perf_counter()
+    for name in names[:count]:
+        group.add_member(name)
+    print_result(inspect.stack()[0][3] + " add_member", count, time.perf_counter() - start)
+    group = Group.by_name("group1")
+    start = time.perf_counter()
+    group.add_members(names[count:])
+    print_result(inspect.stack()[0][3] + " add_members", count, time.perf_counter() - start)
+
+def bench_bulk_update(users, count = 200):
+    """
+    @brief bench_bulk_update Measures changing the loginshell of users one by
+    one compared to a bulk update.
+
+    @param users The number of users in the database
+    @param count The number of users to change in each run
+    """
+    from pyUser import User
+
+    count = min(count, users // 2)
+    start = time.perf_counter()
+    for index in range(count):
+        user = User.by_name("user{index}".format(index = index))
+        user._loginshell = "/bin/zsh"
+        user.update()
+    print_result(inspect.stack()[0][3] + " update", count, time.perf_counter() - start)
+    names = ["user{index}".format(index = index) for index in range(count, 2 * count)]
+    start = time.perf_counter()
+    result = User.bulk_update(names, loginshell = "/bin/zsh")
+    print_result(inspect.stack()[0][3] + " bulk_update", result["changed"],
+            time.perf_counter() - start)
+
+def bench_lock_many(users, count = 200):
+    """
+    @brief bench_lock_many Measures locking accounts one by one compared to
+    locking them at once.
+
+    @param users The number of users in the database
+    @param count The number of accounts to lock in each run
+    """
+    from pyUser import User
+
+    count = min(count, users // 2)
+    start = time.perf_counter()
+    for index in range(count):
+        User.lock(User._by_name("user{index}".format(index = index)))
+    print_result(inspect.stack()[0][3] + " lock", count, time.perf_counter() - start)
+    names = ["user{index}".format(index = index) for index in range(count, 2 * count)]
+    start = time.perf_counter()
+    result = User.lock_many(names)
+    print_result(inspect.stack()[0][3] + " lock_many", len(result), time.perf_counter() - start)
+
+def bench_metrics(users, count = 2000):
+    """
+    @brief bench_metrics Measures lookups by name without and with metrics set.
+
+    @param users The number of users in the database
+    @param count The number of lookups in each run
+    """
+    from pyUser import User, Metrics, set_metrics
+
+    names = ["user{index}".format(index = random.randrange(users)) for _ in range(count)]
+    start = time.perf_counter()
+    for name in names:
+        User._by_name(name)
+    print_result(inspect.stack()[0][3] + " disabled", count, time.perf_counter() - start)
+    set_metrics(Metrics())
+    try:
+        start = time.perf_counter()
+        for name in names:
+            User._by_name(name)
+        print_result(inspect.stack()[0][3] + " enabled", count, time.perf_counter() - start)
+    finally:
+        set_metrics(None)
+
+def bench_reconcile(users, changes = 100):
+    """
+    @brief bench_reconcile Measures planning and applying a desired state
+    differing from the database in a few login shells.
+
+    @param users The number of users in the database
+    @param changes The number of users to change
+    """
+    from pyUser import plan
+
+    desired = {}
+    for index in range(users):
+        loginshell = "/bin/sh" if index % (users // changes or 1) == 0 else "/bin/bash"
+        desired["user{index}".format(index = index)] = {"loginshell": loginshell}
+    result = plan(desired)
+    print_result(inspect.stack()[0][3] + " plan", users, result.plan_seconds)
+    result.apply()
+    print_result(inspect.stack()[0][3] + " apply", len(result), result.apply_seconds)
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    backend = sys.argv[2] if len(sys.argv) > 2 else "libuser"
+    bench_import()
+    directory = setup(users, backend)
+    bench_lookup(users)
+    bench_threaded_lookup(users)
+    bench_enumerate(users)
+    bench_parallel_enumerate(users)
+    bench_iter_enumerate(users)
+    bench_records(users)
+    bench_snapshot(users, directory.name)
+    bench_query(users)
+    bench_watcher(users)
+    bench_allocator(users)
+    bench_add_members(users)
+    bench_bulk_update(users)
+    bench_lock_many(users)
+    bench_metrics(users)
+    if backend != "libuser":
+        bench_provision(directory.name, min(users // 2, 500))
+        bench_deferred_delete(directory.name, users)
+    bench_reconcile(users)
+    directory.cleanup()
+
+if __name__ == "__main__":
+    main()
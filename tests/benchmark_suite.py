@@ -0,0 +1,220 @@
+#!/usr/bin/python3
+
+"""
+@brief benchmark_suite Reproducible benchmarks of the lookup, enumerate and
+mutation paths against synthetic account databases.
+
+For every size a database is written to a temporary root and the files
+backend is pointed at it, the system database is never touched. Every
+operation is timed on its own, the results report the throughput and the
+median and 99th percentile latency and are stored as JSON. Passing the JSON
+of an earlier run with --compare reports the operations that got slower.
+The results are only stored if --output is given.
+
+Usage: benchmark_suite.py [--sizes 1000,10000,100000] [--backend files]
+        [--output results.json] [--compare baseline.json] [--threshold 0.25]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+
+path = Path(__file__)
+path = str(Path(str(path).replace(str(path.name), "")).parent) + "/src/"
+sys.path.append(path)
+
+from pyUser import User, Group, FilesBackend, set_backend_factory
+from benchmark import write_database, print_result
+
+SEED = 1234
+LOOKUPS = 2000
+ENUMERATIONS = 5
+PATTERNS = ("user1*", "user12*", "*7", "group*")
+
+def groups_for(users):
+    """
+    @brief groups_for Returns the number of shared groups for a database size.
+
+    @param users The number of users
+    @return Returns a number between 1000 and 10000
+    """
+    return max(1000, min(10000, users // 10))
+
+def writes_for(users):
+    """
+    @brief writes_for Returns the number of writes per mutating operation.
+
+    Every write rewrites the account files, so fewer writes are timed on
+    larger databases to keep the run time of the suite bounded.
+
+    @param users The number of users
+    @return Returns the number of writes
+    """
+    return max(20, min(200, 2000000 // users))
+
+def percentile(latencies, fraction):
+    """
+    @brief percentile Returns the nearest-rank percentile of sorted latencies.
+
+    @param latencies The sorted latencies in seconds
+    @param fraction The percentile between 0 and 1
+    @return Returns the latency in seconds
+    """
+    return latencies[min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))]
+
+def summarize(operation, users, latencies):
+    """
+    @brief summarize Returns the result of an operation.
+
+    @param operation The name of the operation
+    @param users The number of users in the database
+    @param latencies The latency of every call in seconds
+    @return Returns a dict with the number of calls, the total seconds, ops/s,
+    p50 and p99
+    """
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "operation": operation,
+        "users": users,
+        "count": len(latencies),
+        "seconds": total,
+        "ops_per_second": len(latencies) / total if total else float("inf"),
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+    }
+
+def timed(function, arguments):
+    """
+    @brief timed Calls the function once per argument, timing every call.
+
+    @param function The function to call
+    @param arguments The arguments of the calls
+    @return Returns the list of latencies in seconds
+    """
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run_size(users, backend, seed = SEED):
+    """
+    @brief run_size Runs all operations against a database of the given size.
+
+    @param users The number of users
+    @param backend "files" for the indexed files backend, "files-scan" without index
+    @param seed The seed of the database and the picked entries
+    @return Returns the list of results
+    """
+    groups = groups_for(users)
+    writes = writes_for(users)
+    generator = random.Random(seed)
+    directory = tempfile.TemporaryDirectory(prefix = "pyUser-bench-")
+    write_database(directory.name, users, groups, seed, first_gid = 1000000)
+    set_backend_factory(lambda: FilesBackend(directory.name, index = backend != "files-scan"))
+    Group.reset_membership()
+    results = []
+
+    def record(operation, latencies):
+        result = summarize(operation, users, latencies)
+        print_result("{operation} users: {users}".format(operation = operation, users = users),
+                result["count"], result["seconds"], result)
+        results.append(result)
+
+    try:
+        indexes = [generator.randrange(users) for _ in range(LOOKUPS)]
+        User.by_name("user0")
+        record("User.by_name", timed(User.by_name,
+                ["user{index}".format(index = index) for index in indexes]))
+        record("User.by_id", timed(User.by_id, [10000 + index for index in indexes]))
+        record("Group.by_name", timed(Group.by_name,
+                ["group{index}".format(index = generator.randrange(groups))
+                for _ in range(LOOKUPS)]))
+        record("User.list", timed(lambda _: User.list(), range(ENUMERATIONS)))
+        record("Group.list", timed(lambda _: Group.list(), range(ENUMERATIONS)))
+        for pattern in PATTERNS:
+            kind = Group if pattern.startswith("group") else User
+            record("{kind}.enumerate {pattern}".format(kind = kind.__name__, pattern = pattern),
+                    timed(lambda _: kind.enumerate(pattern), range(ENUMERATIONS)))
+
+        names = ["bench{index}".format(index = index) for index in range(writes)]
+        record("User.create", timed(lambda name: User.create(name, create_home = False), names))
+        created = [User.by_name(name) for name in names]
+        for user in created:
+            user._loginshell = "/bin/zsh"
+        record("User.update", timed(lambda user: user.update(), created))
+        group = Group.by_name("group{index}".format(index = groups - 1))
+        record("Group.add_member", timed(group.add_member, names))
+        created = [User.by_name(name) for name in names]
+        record("User.delete", timed(lambda user: user.delete(), created))
+    finally:
+        set_backend_factory(None)
+        directory.cleanup()
+    return results
+
+def compare(results, baseline, threshold):
+    """
+    @brief compare Prints the change of every operation against a previous run.
+
+    @param results The results of this run
+    @param baseline The results of the previous run
+    @param threshold The relative increase of p50 reported as regression
+    @return Returns the list of regressed operations
+    """
+    previous = {(result["operation"], result["users"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["operation"], result["users"]))
+        if before is None or not before["p50"]:
+            continue
+        change = result["p50"] / before["p50"] - 1
+        regressed = change > threshold
+        print("Compare: '{operation}' users: {users} p50: {before:.3f}ms -> {after:.3f}ms "
+                "({change:+.0%}){regressed}".format(operation = result["operation"],
+                users = result["users"], before = before["p50"] * 1000,
+                after = result["p50"] * 1000, change = change,
+                regressed = " REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(result)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmarks the pyUser lookup, "
+            "enumerate and mutation paths against synthetic account databases.")
+    parser.add_argument("--sizes", default = "1000,10000,100000",
+            help = "comma separated numbers of users")
+    parser.add_argument("--backend", default = "files", choices = ("files", "files-scan"))
+    parser.add_argument("--seed", type = int, default = SEED)
+    parser.add_argument("--output", help = "file the results are stored in")
+    parser.add_argument("--compare", help = "results of an earlier run to compare against")
+    parser.add_argument("--threshold", type = float, default = 0.25,
+            help = "relative increase of p50 reported as regression")
+    arguments = parser.parse_args()
+
+    results = []
+    for users in (int(size) for size in arguments.sizes.split(",")):
+        results += run_size(users, arguments.backend, arguments.seed)
+    if arguments.output:
+        Path(arguments.output).write_text(json.dumps({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": arguments.backend,
+            "seed": arguments.seed,
+            "results": results,
+        }, indent = 2) + "\n")
+        print("Results stored in {output}".format(output = arguments.output))
+    if arguments.compare:
+        baseline = json.loads(Path(arguments.compare).read_text())["results"]
+        if compare(results, baseline, arguments.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ path = Path(__file__)
 path = str(Path(str(path).replace(str(path.name), "")).parent) + "/src/"
 sys.path.append(path)
 
-from pyUser import User, Group
+from pyUser import User, Group, batch
 
 def print_success(method):
     """
@@ -95,6 +95,28 @@ def test_list_users():
             count += 1
     expect_eq(len(users), count)
 
+def test_list_users_full():
+    """
+    @brief test_list_users_full Verify that the single pass enumeration matches
+    the per-name lookup.
+    """
+    users = User.enumerate("*", full = False)
+    full = User.enumerate("*")
+    expect_eq([user._name for user in users], [user._name for user in full])
+    expect_eq([user._home for user in users], [user._home for user in full])
+    print_success(inspect.stack()[0][3])
+
+def test_iter_list_users():
+    """
+    @brief test_iter_list_users Verify that the lazy enumeration yields all users.
+    """
+    users = User.list()
+    expect_eq([user._name for user in users], [user._name for user in User.iter_list()])
+    chunks = list(User.iter_list(chunk_size = 2))
+    expect_true(all(len(chunk) <= 2 for chunk in chunks))
+    expect_eq(len(users), sum(len(chunk) for chunk in chunks))
+    print_success(inspect.stack()[0][3])
+
 def test_create_user():
     """
     @brief test_create_user Verify that a new user can be created.
@@ -241,6 +263,28 @@ def test_create_user_home_replace():
     user.delete()
     print_success(inspect.stack()[0][3])
 
+def test_user_cache():
+    """
+    @brief test_user_cache Verify that cached lookups are served and invalidated.
+    """
+    User.enable_cache()
+    user = User.by_name("__piraidbay")
+    if user.is_valid():
+        user.delete()
+
+    expect_false(User.by_name("__piraidbay").is_valid())
+    expect_false(User.by_name("__piraidbay").is_valid())
+    expect_eq(1, User.cache_stats()["hits"])
+    user = User.create("__piraidbay", create_home = False)
+    expect_true(User.by_name("__piraidbay").is_valid())
+    expect_true(User.by_id(user._uid).is_valid())
+    user.delete()
+    expect_false(User.by_name("__piraidbay").is_valid())
+    expect_false(User.by_id(user._uid).is_valid())
+    User.disable_cache()
+    expect_eq(None, User.cache_stats())
+    print_success(inspect.stack()[0][3])
+
 def test_delete_user_not_exists():
     """
     @brief test_delete_user_not_exists Verify that trying to remove a nonexistent user
@@ -276,6 +320,26 @@ def test_change_user_name():
     user.delete()
     print_success(inspect.stack()[0][3])
 
+def test_refresh_user():
+    """
+    @brief test_refresh_user Verify that local changes are discarded on refresh.
+    """
+    user = User.by_name("__piraidbay")
+    if user.is_valid():
+        user.delete()
+
+    user = User.create("__piraidbay", create_home = False)
+    loginshell = user._loginshell
+    user._loginshell = "/bin/false"
+    expect_true(user.refresh())
+    expect_eq(loginshell, user._loginshell)
+    user._loginshell = "/bin/false"
+    expect_true(user.update())
+    expect_eq("/bin/false", User.by_name("__piraidbay")._loginshell)
+    user.delete()
+    expect_false(user.refresh())
+    print_success(inspect.stack()[0][3])
+
 def test_find_group():
     """
     @brief test_find_group Verify that an existing group can be found.
@@ -300,6 +364,17 @@ def test_list_groups():
     expect_eq(len(groups), count)
     print_success(inspect.stack()[0][3])
 
+def test_list_groups_full():
+    """
+    @brief test_list_groups_full Verify that the single pass enumeration matches
+    the per-name lookup.
+    """
+    groups = Group.enumerate("*", full = False)
+    full = Group.enumerate("*")
+    expect_eq([group._name for group in groups], [group._name for group in full])
+    expect_eq([group._members for group in groups], [group._members for group in full])
+    print_success(inspect.stack()[0][3])
+
 def test_create_group():
     """
     @brief test_create_group Verify that a new group can be created.
@@ -358,6 +433,37 @@ def test_add_member():
     user.delete()
     print_success(inspect.stack()[0][3])
 
+def test_batch():
+    """
+    @brief test_batch Verify that batched changes are coalesced and written.
+    """
+    names = ["__piraidbay1", "__piraidbay2"]
+    for name in names:
+        user = User.by_name(name)
+        if user.is_valid():
+            user.delete()
+    group = Group.by_name("__piraidbay_members")
+    if group.is_valid():
+        group.delete()
+
+    with batch() as changes:
+        changes.create_group("__piraidbay_members")
+        for name in names:
+            changes.create_user(name, create_home = False)
+            changes.add_member("__piraidbay_members", name)
+    expect_eq(3, changes.writes)
+    expect_eq([], changes.failed)
+    group = Group.by_name("__piraidbay_members")
+    expect_eq(names, group._members)
+
+    with batch() as changes:
+        changes.delete(group)
+        for name in names:
+            changes.delete(User.by_name(name))
+    expect_eq(3, len(changes.succeeded))
+    expect_false(Group.by_name("__piraidbay_members").is_valid())
+    print_success(inspect.stack()[0][3])
+
 def test_change_group_name():
     """
     @brief test_create_group Verify that a group name can be changed.
@@ -379,6 +485,8 @@ def test_change_group_name():
 def main():
     test_find_user()
     test_list_users()
+    test_list_users_full()
+    test_iter_list_users()
     test_create_user()
     test_create_user_no_home()
     test_create_user_home()
@@ -388,16 +496,20 @@ def main():
     test_remove_home()
     test_add_user_home()
     test_delete_user_not_exists()
+    test_user_cache()
     test_change_user_name()
+    test_refresh_user()
 
     # Group tests.
     test_find_group()
     test_list_groups()
+    test_list_groups_full()
     test_list_members()
     test_create_group()
     test_delete_group()
     test_add_member()
     test_change_group_name()
+    test_batch()
 
 if __name__ == "__main__":
     main()
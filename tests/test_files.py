@@ -0,0 +1,796 @@
+#!/usr/bin/python3
+
+import sys
+import asyncio
+import inspect
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+path = Path(__file__)
+path = str(Path(str(path).replace(str(path.name), "")).parent) + "/src/"
+sys.path.append(path)
+
+from pyUser import User, Group, FilesBackend, set_backend, set_backend_factory, batch
+from pyUser import Snapshot, snapshot, plan, reconcile, Watcher, Allocator
+from pyUser import Provisioner, Cleaner, Metrics, set_metrics, Attributes
+
+PASSWD = """root:x:0:0:root:/root:/bin/bash
+daemon:x:1:1:daemon:/usr/sbin:/usr/sbin/nologin
+pi:x:1000:1000::/home/pi:/bin/bash
+nobody:x:65534:65534::/nonexistent:/usr/sbin/nologin
+"""
+
+SHADOW = """root:*:19000:0:99999:7:::
+daemon:*:19000:0:99999:7:::
+pi:!:19000:0:99999:7:::
+nobody:*:19000:0:99999:7:::
+"""
+
+GROUP = """root:x:0:
+daemon:x:1:
+sudo:x:27:pi
+pi:x:1000:
+nogroup:x:65534:
+"""
+
+GSHADOW = """root:*::
+daemon:*::
+sudo:*::pi
+pi:!::
+nogroup:*::
+"""
+
+ROOT = None
+
+def print_success(method):
+    """
+    @brief print_success Prints success messages for successful tests.
+    """
+    print("Test: '{method}' report: 'success'".format(method = method))
+
+def expect_eq(expected, actual):
+    """
+    @brief expect_eq Raises an exception if the given values do not match.
+
+    @param expected The expected value
+    @param actual The actual value
+    """
+    if not expected == actual:
+        raise Exception("Expected '{actual}' to be equal to '{expected}'"
+                .format(actual = actual, expected = expected))
+
+def expect_true(actual):
+    """
+    @brief expect_true Expects the given value to be True.
+
+    @param actual The value to be verified
+    """
+    expect_eq(True, actual)
+
+def expect_false(actual):
+    """
+    @brief expect_false Expects the given value to be False.
+
+    @param actual The value to be verified
+    """
+    expect_eq(False, actual)
+
+def host(path):
+    """
+    @brief host Returns the path below the temporary root.
+
+    @param path The path inside the root
+    @return Returns the Path on the host
+    """
+    return Path(ROOT.name) / path.lstrip("/")
+
+def setup_function(function = None):
+    """
+    @brief setup_function Creates a fresh account database in a temporary root
+    and selects the files backend for it.
+    """
+    global ROOT
+    ROOT = tempfile.TemporaryDirectory(prefix = "pyUser-test-")
+    etc = host("/etc")
+    (etc / "skel").mkdir(parents = True)
+    (etc / "skel" / ".profile").write_text("# profile\n")
+    (etc / "passwd").write_text(PASSWD)
+    (etc / "shadow").write_text(SHADOW)
+    (etc / "group").write_text(GROUP)
+    (etc / "gshadow").write_text(GSHADOW)
+    host("/home/pi").mkdir(parents = True)
+    host("/var/spool/mail").mkdir(parents = True)
+    set_backend(FilesBackend(ROOT.name))
+
+def teardown_function(function = None):
+    """
+    @brief teardown_function Removes the temporary root.
+    """
+    set_backend(None)
+    ROOT.cleanup()
+
+def count_lines(path, name):
+    """
+    @brief count_lines Returns the number of lines of the entry in an account file.
+
+    @param path The path of the account file inside the root
+    @param name The name of the entry
+    @return Returns the number of lines
+    """
+    return sum(1 for line in host(path).read_text().splitlines()
+            if line.split(":")[0] == name)
+
+def does_user_exist(user):
+    """
+    @brief does_user_exist Verifies that the given user does exist.
+
+    @return Returns true if the user exists
+    """
+    with host("/etc/passwd").open("r") as file:
+        for line in file:
+            if line.startswith(user.get_name() + ":"):
+                return True
+    return False
+
+def test_lazy_import():
+    """
+    @brief test_lazy_import Verify that importing the package loads neither the
+    submodules nor libuser.
+    """
+    script = ("import sys; sys.path.append({path!r}); import pyUser; "
+            "print(sorted(name for name in sys.modules "
+            "if name.startswith('pyUser.') or name == 'libuser'))").format(path = path)
+    output = subprocess.check_output([sys.executable, "-c", script], text = True)
+    expect_eq("[]", output.strip())
+    import pyUser.Batch
+    import pyUser
+    expect_true(pyUser.User is User)
+    print_success(inspect.stack()[0][3])
+
+def test_find_user():
+    """
+    @brief test_find_user Verify that an existing user can be found.
+    """
+    user = User.by_name("root")
+    expect_eq("root", user._name)
+    expect_eq(0, user._uid)
+    expect_eq(0, user._gid)
+    expect_eq("/root", user._home)
+    expect_eq("/bin/bash", user._loginshell)
+    expect_eq("pi", User.by_id(1000)._name)
+    expect_false(User.by_name("__piraidbay").is_valid())
+    print_success(inspect.stack()[0][3])
+
+def test_find_user_changed():
+    """
+    @brief test_find_user_changed Verify that lookups see changes made by other tools.
+    """
+    expect_false(User.by_name("__piraidbay").is_valid())
+    with host("/etc/passwd").open("a") as file:
+        file.write("__piraidbay:x:1500:1500::/home/__piraidbay:/bin/sh\n")
+    expect_eq(1500, User.by_name("__piraidbay")._uid)
+    expect_eq("__piraidbay", User.by_id(1500)._name)
+    host("/etc/passwd").write_text(PASSWD)
+    expect_false(User.by_id(1500).is_valid())
+    print_success(inspect.stack()[0][3])
+
+def test_threaded_lookup():
+    """
+    @brief test_threaded_lookup Verify that every thread gets its own backend
+    from the factory and concurrent lookups succeed.
+    """
+    backends = []
+    results = []
+    set_backend_factory(lambda: FilesBackend(ROOT.name))
+
+    def lookup():
+        backends.append(User._get_admin())
+        for _ in range(50):
+            results.append(User.by_name("pi")._uid)
+
+    threads = [threading.Thread(target = lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expect_eq(4, len({id(backend) for backend in backends}))
+    expect_eq([1000] * 200, results)
+    print_success(inspect.stack()[0][3])
+
+def test_list_users():
+    """
+    @brief test_list_users Verify that all users are listed in both modes.
+    """
+    expect_eq(["root", "daemon", "pi", "nobody"], [user._name for user in User.list()])
+    expect_eq(["root", "daemon", "pi", "nobody"],
+            [user._name for user in User.enumerate("*", full = False)])
+    expect_eq(["daemon"], [user._name for user in User.enumerate("d*")])
+    expect_true(inspect.isgenerator(User._get_admin().iterateUsersFull("*")))
+    users = User.iter_enumerate("*")
+    expect_eq("root", next(users)._name)
+    expect_eq(["daemon", "pi", "nobody"], [user._name for user in users])
+    expect_eq([["root", "daemon"], ["pi", "nobody"]],
+            [[user._name for user in chunk] for chunk in User.iter_list(2)])
+    expect_eq(["pi"], [group._name for group in Group.iter_enumerate("p*")])
+    print_success(inspect.stack()[0][3])
+
+def test_user_records():
+    """
+    @brief test_user_records Verify that the compact records match the users.
+    """
+    users = User.list()
+    records = User.records()
+    expect_eq([user._name for user in users], [record.get_name() for record in records])
+    expect_eq([user._home for user in users], [record.get_home() for record in records])
+    expect_eq(records[0], users[0].to_record())
+    expect_false(hasattr(records[0], "__dict__"))
+    expect_eq(("pi",), Group.records("sudo")[0].get_members())
+    print_success(inspect.stack()[0][3])
+
+def test_parallel_enumerate():
+    """
+    @brief test_parallel_enumerate Verify that the parallel enumeration returns
+    the records in order.
+    """
+    for count in range(20):
+        User.create("__piraidbay{count}".format(count = count), create_home = False)
+    records = User.parallel_enumerate("*", workers = 3, chunk_size = 4)
+    expect_eq(User.records(), records)
+    expect_eq(24, len(records))
+    print_success(inspect.stack()[0][3])
+
+def test_create_user():
+    """
+    @brief test_create_user Verify that a new user can be created.
+    """
+    user = User.create("__piraidbay")
+    expect_eq("__piraidbay", user._name)
+    expect_eq("/home/__piraidbay", user._home)
+    expect_eq(1001, user._uid)
+    expect_true(does_user_exist(user))
+    expect_true(user.has_home())
+    expect_true(host("/home/__piraidbay/.profile").exists())
+    expect_true(host("/var/spool/mail/__piraidbay").exists())
+    expect_true(user.delete())
+    expect_false(does_user_exist(user))
+    expect_false(host("/home/__piraidbay").exists())
+    expect_false(host("/var/spool/mail/__piraidbay").exists())
+    print_success(inspect.stack()[0][3])
+
+def test_create_user_home():
+    """
+    @brief test_create_user_home Verifies that a home folder can be added and removed.
+    """
+    user = User.create("__piraidbay", create_home = False)
+    expect_false(user.has_home())
+    expect_true(user.create_home())
+    expect_true(user.has_home())
+    expect_true(user.remove_home())
+    expect_false(user.has_home())
+    user.delete()
+    print_success(inspect.stack()[0][3])
+
+def test_change_user_name():
+    """
+    @brief test_change_user_name Verify that a user can be renamed.
+    """
+    user = User.create("__piraidbay", create_home = False)
+    user._name = "__pyraidbay"
+    user._loginshell = "/bin/false"
+    expect_true(user.update())
+    expect_false(User.by_name("__piraidbay").is_valid())
+    renamed = User.by_name("__pyraidbay")
+    expect_eq("/bin/false", renamed._loginshell)
+    expect_eq(1, count_lines("/etc/shadow", "__pyraidbay"))
+    expect_eq(0, count_lines("/etc/shadow", "__piraidbay"))
+    expect_true(user.delete())
+    print_success(inspect.stack()[0][3])
+
+def test_change_group_name():
+    """
+    @brief test_change_group_name Verify that a group can be renamed and that
+    writing a group without gshadow line adds none.
+    """
+    group = Group.create("__piraidbay")
+    group._name = "__pyraidbay"
+    expect_true(group.update())
+    expect_false(Group.by_name("__piraidbay").is_valid())
+    expect_true(Group.by_name("__pyraidbay").is_valid())
+    expect_eq(1, count_lines("/etc/gshadow", "__pyraidbay"))
+    expect_eq(0, count_lines("/etc/gshadow", "__piraidbay"))
+    host("/etc/gshadow").write_text(GSHADOW.replace("daemon:*::\n", ""))
+    daemon = Group.by_name("daemon")
+    daemon._members = ["pi"]
+    expect_true(daemon.update())
+    expect_eq(0, count_lines("/etc/gshadow", "daemon"))
+    print_success(inspect.stack()[0][3])
+
+def test_lock_user():
+    """
+    @brief test_lock_user Verify that the shadow password is locked and unlocked.
+    """
+    user = User.by_name("daemon")
+    expect_true(User.lock(user._get_entity()))
+    expect_true("daemon:!*:" in host("/etc/shadow").read_text())
+    expect_true(User.unlock(user._get_entity()))
+    expect_true("daemon:*:" in host("/etc/shadow").read_text())
+    try:
+        User.unlock(User.by_name("pi")._get_entity())
+        raise Exception("Expected unlocking an empty password to be refused")
+    except RuntimeError:
+        pass
+    expect_true("pi:!:" in host("/etc/shadow").read_text())
+    print_success(inspect.stack()[0][3])
+
+def test_find_group():
+    """
+    @brief test_find_group Verify that an existing group can be found.
+    """
+    group = Group.by_name("root")
+    expect_eq("root", group._name)
+    expect_eq(0, group._gid)
+    expect_eq([], group._admin)
+    expect_eq([], group._members)
+    expect_eq(["pi"], Group.by_id(27)._members)
+    print_success(inspect.stack()[0][3])
+
+def test_list_members():
+    """
+    @brief test_list_members Verify that members and primary users are listed.
+    """
+    expect_eq(["pi"], Group.by_name("sudo").get_user_names())
+    expect_eq(["pi"], Group.by_name("pi").get_user_names())
+    print_success(inspect.stack()[0][3])
+
+def test_add_member():
+    """
+    @brief test_add_member Verify that a member can be added to a group.
+    """
+    group = Group.create("__piraidbay_members")
+    expect_eq(1001, group._gid)
+    user = User.create("__piraidbay1", create_home = False)
+    expect_true(group.add_member(user))
+    expect_eq(["__piraidbay1"], Group.by_name("__piraidbay_members")._members)
+    expect_true("__piraidbay_members:!!::__piraidbay1" in host("/etc/gshadow").read_text())
+    expect_true(group.delete())
+    expect_false(Group.by_name("__piraidbay_members").is_valid())
+    user.delete()
+    print_success(inspect.stack()[0][3])
+
+def test_get_groups():
+    """
+    @brief test_get_groups Verify that the groups of a user are found and kept up to date.
+    """
+    user = User.by_name("pi")
+    expect_eq(["pi", "sudo"], user.get_group_names())
+    expect_eq([1000, 27], [group._gid for group in user.get_groups()])
+    group = Group.create("__piraidbay_members")
+    group.add_member(user)
+    expect_eq(["pi", "sudo", "__piraidbay_members"], user.get_group_names())
+    group.delete()
+    expect_eq(["pi", "sudo"], user.get_group_names())
+    # groups sharing a gid, written by another tool
+    with host("/etc/group").open("a") as file:
+        file.write("admin:x:27:pi\n")
+    expect_eq(["pi", "admin", "sudo"], user.get_group_names())
+    other = tempfile.TemporaryDirectory(prefix = "pyUser-test-")
+    try:
+        etc = Path(other.name) / "etc"
+        etc.mkdir()
+        for name, text in (("passwd", PASSWD), ("shadow", SHADOW),
+                ("group", GROUP.replace("sudo:x:27:pi", "sudo:x:27:")), ("gshadow", GSHADOW)):
+            (etc / name).write_text(text)
+        set_backend(FilesBackend(other.name))
+        expect_eq(["pi"], User.by_name("pi").get_group_names())
+    finally:
+        set_backend(FilesBackend(ROOT.name))
+        other.cleanup()
+    expect_eq(["pi", "admin", "sudo"], user.get_group_names())
+    print_success(inspect.stack()[0][3])
+
+def test_snapshot():
+    """
+    @brief test_snapshot Verify that a saved snapshot loads the same records
+    and that changes are found by comparing snapshots.
+    """
+    path = host("/snapshot")
+    before = snapshot(str(path))
+    expect_eq(User.records(), before.users())
+    expect_eq(Group.records(), before.groups())
+    user = User.create("__piraidbay", create_home = False)
+    user._loginshell = "/bin/false"
+    group = Group.by_name("sudo")
+    group.add_member(user)
+    user.update()
+    with Snapshot.load(str(path)) as loaded:
+        expect_eq(before.users(), loaded.users())
+        expect_eq(4, loaded.user_count())
+        changes = snapshot().diff(loaded)
+        expect_eq((["__piraidbay"], [], []), changes["users"])
+        expect_eq(([], [], ["sudo"]), changes["groups"])
+    print_success(inspect.stack()[0][3])
+
+def test_aio():
+    """
+    @brief test_aio Verify that the coroutine API mirrors the blocking one.
+    """
+    from pyUser import aio
+
+    async def run():
+        users = await asyncio.gather(aio.User.by_name("root"), aio.User.by_id(1000))
+        expect_eq(["root", "pi"], [user._name for user in users])
+        user = await aio.User.create("__piraidbay", create_home = False)
+        user._loginshell = "/bin/false"
+        expect_true(await aio.User.write(user.update))
+        names = [user._name async for user in aio.User.iter_enumerate("*", 2)]
+        expect_eq(["root", "daemon", "pi", "nobody", "__piraidbay"], names)
+        expect_true(await aio.User.delete(user))
+        expect_eq(4, len(await aio.User.list()))
+        expect_eq(["pi"], (await aio.Group.by_name("sudo"))._members)
+        group = await aio.Group.create("__piraidbay_members")
+        expect_true(await aio.Group.delete(group._get_entity()))
+
+    asyncio.run(run())
+    aio.shutdown()
+    print_success(inspect.stack()[0][3])
+
+def test_batch():
+    """
+    @brief test_batch Verify that batched changes are coalesced and written.
+    """
+    names = ["__piraidbay1", "__piraidbay2"]
+    metrics = Metrics()
+    set_metrics(metrics)
+    try:
+        with batch() as changes:
+            changes.create_group("__piraidbay_members")
+            for name in names:
+                changes.create_user(name, create_home = False)
+                changes.add_member("__piraidbay_members", name)
+                changes.add_member("sudo", name)
+                changes.add_member("sudo", name)
+        # the failing bulk add is retried one user at a time
+        with batch() as failing:
+            failing.create_user("__piraidbay3", create_home = False)
+            failing.create_user("pi")
+    finally:
+        set_metrics(None)
+    expect_eq(3, changes.writes)
+    expect_eq([], changes.failed)
+    expect_eq(3, failing.writes)
+    expect_eq([("create_user", "pi")], [(result.action, result.name)
+            for result in failing.failed])
+    expect_eq(2, metrics.stats()["addUsers"]["calls"])
+    expect_eq(2, metrics.stats()["addUser"]["calls"])
+    expect_eq([1001, 1002], [User.by_name(name)._uid for name in names])
+    expect_eq(names, Group.by_name("__piraidbay_members")._members)
+    expect_eq(["pi"] + names, Group.by_name("sudo")._members)
+    print_success(inspect.stack()[0][3])
+
+def test_user_cache():
+    """
+    @brief test_user_cache Verify that cached lookups are served and invalidated.
+    """
+    User.enable_cache()
+    expect_false(User.by_name("__piraidbay").is_valid())
+    expect_false(User.by_name("__piraidbay").is_valid())
+    expect_eq(1, User.cache_stats()["hits"])
+    user = User.create("__piraidbay", create_home = False)
+    expect_true(User.by_name("__piraidbay").is_valid())
+    user._name = "__pyraidbay"
+    user.update()
+    expect_false(User.by_name("__piraidbay").is_valid())
+    expect_eq("__pyraidbay", User.by_id(user._uid)._name)
+    user.delete()
+    expect_false(User.by_id(user._uid).is_valid())
+    first, second = User.by_name("pi"), User.by_name("pi")
+    expect_true(first._get_entity() is not second._get_entity())
+    first._name = "root"
+    first._loginshell = "/bin/false"
+    try:
+        first.update()
+    except RuntimeError:
+        pass
+    expect_eq("/bin/bash", User(first._get_entity())._loginshell)
+    expect_eq("/bin/bash", User.by_name("pi")._loginshell)
+    first._name = "pi"
+    expect_true(first.update())
+    expect_eq("/bin/false", User(first._get_entity())._loginshell)
+    expect_eq("/bin/false", User.by_name("pi")._loginshell)
+    User.disable_cache()
+    print_success(inspect.stack()[0][3])
+
+def test_reconcile():
+    """
+    @brief test_reconcile Verify that only the differences to the desired state are written.
+    """
+    users = {"pi": {"loginshell": "/bin/bash"}, "__piraidbay": {"loginshell": "/bin/sh"}}
+    groups = {"sudo": {"members": ["pi", "__piraidbay"]}, "pi": {"members": []}}
+    changes = plan(users, groups)
+    expect_eq(["~ group sudo members: ['pi'] -> ['pi', '__piraidbay']",
+            "+ user __piraidbay loginshell=/bin/sh"], [str(change) for change in changes.changes])
+    expect_false(User.by_name("__piraidbay").is_valid())
+    reconcile(users, groups, create_home = False)
+    expect_eq("/bin/sh", User.by_name("__piraidbay")._loginshell)
+    expect_eq(["pi", "__piraidbay"], Group.by_name("sudo")._members)
+    expect_eq(0, len(plan(users, groups)))
+    changes = plan({"pi": {}}, groups, prune = True)
+    expect_eq(["- user __piraidbay"], [str(change) for change in changes.changes])
+    changes = plan({"pi": {}}, groups, prune = True, max_id = 65534)
+    expect_eq(["- group nogroup", "- user nobody", "- user __piraidbay"],
+            [str(change) for change in changes.changes])
+    print_success(inspect.stack()[0][3])
+
+def test_watcher():
+    """
+    @brief test_watcher Verify that changes made outside of the library are reported.
+    """
+    for inotify in (True, False):
+        host("/etc/passwd").write_text(PASSWD)
+        host("/etc/group").write_text(GROUP)
+        User.enable_cache()
+        expect_false(User.by_name("__piraidbay").is_valid())
+        with Watcher(inotify = inotify) as watcher:
+            expect_eq(inotify, watcher.uses_inotify())
+            expect_eq([], watcher.poll())
+            with host("/etc/passwd").open("a") as file:
+                file.write("__piraidbay:x:1001:1001::/home/__piraidbay:/bin/sh\n")
+            host("/etc/group").write_text(GROUP.replace("sudo:x:27:pi", "sudo:x:27:"))
+            events = watcher.poll(2)
+            expect_eq([("user", "added", "__piraidbay"), ("group", "modified", "sudo")],
+                    [(event.kind, event.action, event.name) for event in events])
+            expect_eq(("pi",), events[1].before.get_members())
+            expect_eq([], watcher.poll())
+        expect_true(User.by_name("__piraidbay").is_valid())
+        User.disable_cache()
+    print_success(inspect.stack()[0][3])
+
+def test_allocator():
+    """
+    @brief test_allocator Verify that the lowest free id outside reserved blocks is assigned.
+    """
+    allocator = Allocator([1000, 1003, 1004], 1000, 1010, [(1001, 1001)])
+    expect_eq([1002, 1005, 1006], [allocator.allocate() for _ in range(3)])
+    expect_true(allocator.release(1003))
+    expect_false(allocator.release(1001))
+    expect_eq(1003, allocator.next())
+    expect_eq(5, allocator.free_count())
+    User.enable_allocator(1000, 1010, [(1001, 1002)])
+    Group.enable_allocator(1000, 1010)
+    user = User.create("__piraidbay", create_home = False)
+    expect_eq(1003, user._uid)
+    expect_eq(1003, user._gid)
+    expect_eq(1001, Group.create("__piraidbay")._gid)
+    expect_eq(1004, User.create("__pyraidbay", create_home = False)._uid)
+    user.delete()
+    expect_eq(1003, User.create("__piraidbay2", create_home = False)._uid)
+    entity = User._by_name("__pyraidbay")
+    entity[Attributes.UIDNUMBER] = 1006
+    expect_true(User.modify(entity))
+    expect_eq(1004, User.create("__piraidbay3", create_home = False)._uid)
+    expect_eq(1005, User.create("__piraidbay4", create_home = False)._uid)
+    User.disable_allocator()
+    Group.disable_allocator()
+    print_success(inspect.stack()[0][3])
+
+def test_provisioner():
+    """
+    @brief test_provisioner Verify that home folders are created after the batch commit.
+    """
+    (host("/etc/skel") / ".config").mkdir()
+    (host("/etc/skel") / ".config" / "settings").write_text("# settings\n")
+    (host("/etc/skel") / ".bashrc").symlink_to(".profile")
+    names = ["__piraidbay1", "__piraidbay2"]
+    with Provisioner(workers = 2) as provisioner:
+        with batch(provisioner) as changes:
+            for name in names:
+                changes.create_user(name)
+        expect_true(provisioner.wait())
+        expect_eq({name: "done" for name in names}, provisioner.statuses())
+        expect_eq({"pi": "failed"}, provisioner.provision([User.by_name("pi")], wait = True))
+        expect_true(isinstance(provisioner.error("pi"), RuntimeError))
+    for name in names:
+        expect_eq("# settings\n", (host("/home/" + name) / ".config" / "settings").read_text())
+        expect_eq(".profile", (host("/home/" + name) / ".bashrc").readlink().name)
+        expect_true(User.by_name(name).has_home())
+    print_success(inspect.stack()[0][3])
+
+def test_deferred_delete():
+    """
+    @brief test_deferred_delete Verify that the home folder is moved away and
+    removed in the background.
+    """
+    user = User.create("__piraidbay")
+    (host("/home/__piraidbay") / "data").mkdir()
+    (host("/home/__piraidbay") / "data" / "file").write_bytes(b"\0" * 4096)
+    expect_true(host("/var/spool/mail/__piraidbay").exists())
+    with Cleaner(files_per_second = 100) as cleaner:
+        expect_true(user.delete(deferred = cleaner))
+        expect_false(host("/home/__piraidbay").exists())
+        expect_false(User.by_name("__piraidbay").is_valid())
+        expect_true(cleaner.wait())
+        status = cleaner.status()
+        expect_eq(([], None, 2, []), (status["pending"], status["running"],
+                status["removed"], status["failed"]))
+        expect_eq(4096 + len("# profile\n"), status["bytes"])
+    expect_eq([], list(host("/home/.pyUser-trash").iterdir()))
+    expect_false(host("/var/spool/mail/__piraidbay").exists())
+    # a home folder that cannot be moved to the trash is removed in place
+    user = User.create("__piraidbay")
+    host("/home/.pyUser-trash").rmdir()
+    host("/home/.pyUser-trash").write_text("")
+    with Cleaner(files_per_second = 100) as cleaner:
+        expect_true(user.delete(deferred = cleaner))
+        expect_false(User.by_name("__piraidbay").is_valid())
+        expect_true(cleaner.wait())
+        expect_eq(2, cleaner.status()["removed"])
+    expect_false(host("/home/__piraidbay").exists())
+    host("/home/.pyUser-trash").unlink()
+    # a home folder left when the cleaner stops is not counted as removed
+    user = User.create("__piraidbay")
+    for index in range(5):
+        (host("/home/__piraidbay") / str(index)).write_text("")
+    cleaner = Cleaner(files_per_second = 1)
+    expect_true(user.delete(deferred = cleaner))
+    cleaner.stop(wait = False)
+    expect_eq(0, cleaner.status()["removed"])
+    expect_eq(1, len(list(host("/home/.pyUser-trash").iterdir())))
+    with Cleaner() as cleaner:
+        cleaner.collect(host("/home"))
+        expect_true(cleaner.wait())
+    expect_eq([], list(host("/home/.pyUser-trash").iterdir()))
+    print_success(inspect.stack()[0][3])
+
+def test_bulk_members():
+    """
+    @brief test_bulk_members Verify that members are added, removed and replaced at once.
+    """
+    users = [User.create(name, create_home = False) for name in ("__piraidbay1", "__piraidbay2")]
+    group = Group.by_name("sudo")
+    expect_true(group.add_members(users + ["pi", "__piraidbay1", "root"]))
+    expect_eq(["pi", "__piraidbay1", "__piraidbay2", "root"], Group.by_name("sudo")._members)
+    expect_true(group.remove_members(["root", users[0], "__unknown"]))
+    expect_eq(["pi", "__piraidbay2"], Group.by_name("sudo")._members)
+    expect_true(group.set_members([users[1], "daemon", "daemon"]))
+    expect_eq(["__piraidbay2", "daemon"], Group.by_name("sudo")._members)
+    expect_eq(["sudo"], User.by_name("daemon").get_group_names()[1:])
+    print_success(inspect.stack()[0][3])
+
+def test_query():
+    """
+    @brief test_query Verify that users and groups are filtered by their attributes.
+    """
+    expect_eq(["root", "pi"], [user.get_name() for user in User.query(shell = "/bin/bash")])
+    expect_eq(["pi"], [user.get_name() for user in
+            User.query(shell = "/bin/bash", uid_range = (1, 1000))])
+    expect_eq(["daemon"], [record.get_name() for record in
+            User.query(records = True, home_prefix = "/usr/")])
+    expect_eq([], User.query(gid = 1000, name_prefix = "ro"))
+    User.create("__piraidbay", loginshell = "/bin/sh", create_home = False)
+    expect_eq(["__piraidbay"], [user.get_name() for user in
+            User.query(uid_range = range(1001, 2000))])
+    expect_eq(["sudo"], [group.get_name() for group in Group.query(member = "pi")])
+    expect_eq(["root", "daemon"], [record.get_name() for record in
+            Group.query(records = True, gid_range = (0, 26))])
+    print_success(inspect.stack()[0][3])
+
+def test_bulk_update():
+    """
+    @brief test_bulk_update Verify that many users are changed with a single write.
+    """
+    for name in ("__piraidbay1", "__piraidbay2"):
+        User.create(name, create_home = False)
+    inode = host("/etc/passwd").stat().st_ino
+    result = User.bulk_update({"uid_range": (1000, 2000)}, loginshell = "/bin/sh",
+            home = lambda user: "/srv/home/" + user.get_name())
+    expect_eq({"changed": 3, "unchanged": 0, "missing": 0, "failed": 0}, result)
+    expect_eq("/bin/sh", User.by_name("__piraidbay2")._loginshell)
+    expect_eq("/srv/home/pi", User.by_name("pi")._home)
+    expect_eq("/bin/bash", User.by_name("root")._loginshell)
+    expect_eq("!", host("/etc/shadow").read_text().splitlines()[2].split(":")[1])
+    expect_true(host("/etc/passwd").stat().st_ino != inode)
+    expect_eq({"changed": 2, "unchanged": 1, "missing": 1, "failed": 0},
+            User.bulk_update(["root", "pi", "__unknown", "daemon"], loginshell = lambda user:
+            "/bin/sh" if user.get_id() < 1000 else user._loginshell))
+    expect_eq(["root", "daemon", "pi", "__piraidbay1", "__piraidbay2"],
+            [user.get_name() for user in User.query(shell = "/bin/sh")])
+    stale = User.by_name("__piraidbay1")
+    User.by_name("__piraidbay1").delete()
+    try:
+        User.bulk_update([stale, "pi"], loginshell = "/bin/zsh")
+        raise Exception("Expected writing a deleted user to fail")
+    except RuntimeError:
+        pass
+    expect_eq("/bin/sh", User(stale._get_entity())._loginshell)
+    expect_eq("/bin/sh", User.by_name("pi")._loginshell)
+    print_success(inspect.stack()[0][3])
+
+def test_lock_many():
+    """
+    @brief test_lock_many Verify that many accounts are locked with a single shadow rewrite.
+    """
+    user = User.create("__piraidbay", create_home = False)
+    passwd = host("/etc/passwd").stat().st_ino
+    shadow = host("/etc/shadow").stat().st_ino
+    result = User.lock_many(["root", user, "__unknown", "root"])
+    expect_eq({"root": True, "__piraidbay": True, "__unknown": False}, result)
+    expect_eq(passwd, host("/etc/passwd").stat().st_ino)
+    expect_true(host("/etc/shadow").stat().st_ino != shadow)
+    expect_eq(["!*", "*", "!", "*", "!!"], [line.split(":")[1] for line in
+            host("/etc/shadow").read_text().splitlines()])
+    expect_eq({"root": True, "__piraidbay": True}, User.unlock_many(["root", "__piraidbay"]))
+    expect_eq(["*", "*", "!", "*", "!"], [line.split(":")[1] for line in
+            host("/etc/shadow").read_text().splitlines()])
+    expect_eq({"sudo": True, "pi": True}, Group.lock_many(["sudo", Group.by_name("pi")]))
+    expect_eq(["*", "*", "!*", "!", "*"], [line.split(":")[1] for line in
+            host("/etc/gshadow").read_text().splitlines()])
+    gone = User.create("__gone", create_home = False)
+    entity = gone._get_entity()
+    gone.delete()
+    shadow = host("/etc/shadow")
+    shadow.write_text(shadow.read_text().replace("root:*:", "root:!!hash:"))
+    result = User.unlock_many(["root", entity, "__unknown", "pi"])
+    expect_eq(True, result["root"])
+    expect_eq(False, result["__unknown"])
+    expect_true(isinstance(result["__gone"], RuntimeError))
+    expect_true(isinstance(result["pi"], RuntimeError))
+    expect_eq(["!hash", "*", "!", "*", "!"], [line.split(":")[1] for line in
+            shadow.read_text().splitlines()])
+    pending = User.by_name("daemon")
+    pending._name = "__renamed"
+    expect_eq({"daemon": True}, User.lock_many(["daemon", pending]))
+    expect_eq(["!hash", "!*", "!", "*", "!"], [line.split(":")[1] for line in
+            shadow.read_text().splitlines()])
+    print_success(inspect.stack()[0][3])
+
+def test_metrics():
+    """
+    @brief test_metrics Verify that backend calls are counted and timed while metrics are set.
+    """
+    calls = []
+    metrics = Metrics(callback = lambda operation, seconds, error: calls.append((operation, error)))
+    set_metrics(metrics)
+    try:
+        expect_true(User.by_name("pi").is_valid())
+        expect_false(User.by_name("__unknown").is_valid())
+        try:
+            User._get_admin().deleteUser(None)
+        except Exception:
+            pass
+    finally:
+        set_metrics(None)
+    User.by_name("root")
+    stats = metrics.stats()
+    expect_eq(2, stats["lookupUserByName"]["calls"])
+    expect_eq(0, stats["lookupUserByName"]["errors"])
+    expect_eq(1, stats["deleteUser"]["errors"])
+    expect_eq(("lookupUserByName", None), calls[0])
+    expect_eq(float("inf"), stats["lookupUserByName"]["buckets"][-1][0])
+    expect_eq(2, stats["lookupUserByName"]["buckets"][-1][1])
+    text = metrics.prometheus()
+    expect_true('pyuser_backend_calls_total{operation="lookupUserByName"} 2' in text)
+    expect_true('pyuser_backend_errors_total{operation="deleteUser"} 1' in text)
+    expect_true('pyuser_backend_seconds_bucket{operation="lookupUserByName",le="+Inf"} 2' in text)
+    metrics.reset()
+    expect_eq({}, metrics.stats())
+    print_success(inspect.stack()[0][3])
+
+def main():
+    for test in [test_lazy_import, test_find_user, test_find_user_changed, test_threaded_lookup, test_list_users,
+            test_user_records, test_parallel_enumerate, test_create_user,
+            test_create_user_home, test_change_user_name, test_change_group_name,
+            test_lock_user,
+            test_find_group, test_list_members, test_add_member, test_get_groups, test_snapshot, test_aio, test_batch,
+            test_user_cache, test_reconcile, test_watcher, test_allocator,
+            test_provisioner, test_deferred_delete, test_bulk_members,
+            test_query, test_bulk_update, test_lock_many, test_metrics]:
+        setup_function()
+        try:
+            test()
+        finally:
+            teardown_function()
+
+if __name__ == "__main__":
+    main()